@@ -0,0 +1,73 @@
+# backend/bench_excel_readers.py
+#
+# Time each installed .xlsx engine on the sample workbooks and check that
+# they parse them to the same frame read_one would build.
+#
+#   cd backend
+#   python bench_excel_readers.py [workbook.xlsx ...] [--repeat N]
+
+import argparse
+import glob
+import importlib.util
+import os
+import time
+
+import pandas as pd
+
+from converter import EXCEL_ENGINES, EXCEL_ENGINE_MODULES, UPLOAD_FOLDER
+
+
+def installed_engines() -> list:
+    return [e for e in EXCEL_ENGINES if importlib.util.find_spec(EXCEL_ENGINE_MODULES[e])]
+
+
+def best_time(path: str, engine: str, repeat: int):
+    best, df = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        df = pd.read_excel(path, engine=engine)
+        best = min(best, time.perf_counter() - t0)
+    return best, df
+
+
+def cleaned(df: pd.DataFrame) -> pd.DataFrame:
+    # read_one's post-processing; blank cells and whitespace-only cells both
+    # end up as "" once the builders strip them
+    df = df.rename(columns=lambda c: str(c).strip()).fillna("")
+    return df.map(lambda v: v.strip() if isinstance(v, str) else v)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare .xlsx reader engines.")
+    ap.add_argument("paths", nargs="*")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    paths = args.paths or sorted(glob.glob(os.path.join(UPLOAD_FOLDER, "*.xlsx")))
+    engines = installed_engines()
+    if not paths:
+        raise SystemExit(f"No .xlsx files found in {UPLOAD_FOLDER}/")
+    print(f"engines: {', '.join(engines)}   workbooks: {len(paths)}   best of {args.repeat}\n")
+
+    totals = {e: 0.0 for e in engines}
+    print(f"{'workbook':48} {'rows':>7}" + "".join(f"{e:>12}" for e in engines) + "  same")
+    for path in paths:
+        times, frames = {}, {}
+        for e in engines:
+            times[e], frames[e] = best_time(path, e, args.repeat)
+            totals[e] += times[e]
+        base = cleaned(frames[engines[-1]])
+        same = all(cleaned(frames[e]).equals(base) for e in engines)
+        print(f"{os.path.basename(path)[:48]:48} {len(base):>7}"
+              + "".join(f"{times[e] * 1000:>10.1f}ms" for e in engines)
+              + f"  {'yes' if same else 'NO'}")
+
+    print(f"\n{'total':56}" + "".join(f"{totals[e] * 1000:>10.1f}ms" for e in engines))
+    if len(engines) > 1:
+        slowest = engines[-1]
+        for e in engines[:-1]:
+            print(f"{e} vs {slowest}: {totals[slowest] / totals[e]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
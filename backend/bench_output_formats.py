@@ -0,0 +1,55 @@
+# backend/bench_output_formats.py
+#
+# Compare the output formats convert_many can write - file size and write
+# time of the nodes and edges tables (or the single graph file) - on a
+# synthetic graph:
+#
+#   cd backend
+#   python bench_output_formats.py [--rows 1000000] [--repeat 3]
+
+import argparse
+import os
+import tempfile
+import time
+
+from bench_pipeline import synthetic_responses
+from converter import GRAPH_WRITERS, OUTPUT_FORMATS, build_graph_from_responses, write_graph_atomic, write_table_atomic
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare graph output formats.")
+    ap.add_argument("--rows", type=int, default=1_000_000, help="response rows to build the graph from")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    nodes, edges = build_graph_from_responses(synthetic_responses(args.rows))
+    print(f"graph: {len(nodes):,} nodes, {len(edges):,} edges   best of {args.repeat}\n")
+    print(f"{'format':10}{'nodes':>12}{'edges':>12}{'write':>12}")
+
+    exts = dict.fromkeys(OUTPUT_FORMATS.values())
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = None
+        for ext in exts:
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                if ext in GRAPH_WRITERS:
+                    write_graph_atomic(nodes, edges, os.path.join(tmp, "graph" + ext))
+                else:
+                    for name, df in (("nodes", nodes), ("edges", edges)):
+                        write_table_atomic(df, os.path.join(tmp, name + ext))
+                best = min(best, time.perf_counter() - t0)
+            if ext in GRAPH_WRITERS:
+                total = os.path.getsize(os.path.join(tmp, "graph" + ext))
+                sizes = f"{total / 1e6:>22.2f}MB"
+            else:
+                parts = [os.path.getsize(os.path.join(tmp, name + ext)) for name in ("nodes", "edges")]
+                total = sum(parts)
+                sizes = f"{parts[0] / 1e6:>10.2f}MB{parts[1] / 1e6:>10.2f}MB"
+            baseline = baseline or (total, best)
+            print(f"{ext[1:]:10}{sizes}{best:>11.2f}s"
+                  f"   ({total / baseline[0]:.0%} of CSV size, {baseline[1] / best:.1f}x CSV speed)")
+
+
+if __name__ == "__main__":
+    main()
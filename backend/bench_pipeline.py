@@ -0,0 +1,265 @@
+# backend/bench_pipeline.py
+#
+# Time every stage of a conversion as convert_many runs it - mapping each
+# file to a partial aggregate, combining the partials, laying out the graph
+# (with each section of both graph builders), plus key normalization,
+# connection parsing and CSV writing - on synthetic event-response uploads,
+# and record peak memory:
+#
+#   cd backend
+#   python bench_pipeline.py [--rows 10k,100k,1M] [--connections 0.5] [--out run.json]
+#   python bench_pipeline.py --out after.json --compare before.json
+#
+# Each size runs in a fresh process, so its peak RSS is its own. The JSON
+# keeps the commit and library versions next to the timings; --compare
+# prints the per-stage ratio against an earlier run.
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+SECTORS = ["Education", "Health", "Youth Services", "Faith Based", "Business"]
+CITIES = np.array(["Chicago", "Evanston", "Oak Park", "Skokie", "Cicero"])
+CONNECTION_TYPES = np.array(["partner", "funder", "referral", "member"])
+
+
+def synthetic_responses(rows: int, seed: int = 0, orgs: int = None, events: int = None,
+                        sectors: int = 5, connections: float = 0.0, messy: float = 0.1) -> pd.DataFrame:
+    """
+    Registration-style rows: orgs attending events, with a few attributes.
+
+    `connections` is the mean number of org -> org connections per row (a
+    JSON array in the `connections` column); a `messy` share of the org
+    names is upper-cased or padded with extra whitespace, as in real exports.
+    """
+    rng = np.random.default_rng(seed)
+    n_orgs = orgs or max(rows // 20, 1)
+    n_events = events or max(rows // 500, 1)
+    org = rng.integers(0, n_orgs, rows)
+    event = rng.integers(0, n_events, rows)
+
+    base = pd.Series(np.arange(n_orgs)).map("Organization {}".format)
+    spellings = np.column_stack([base, base.str.upper(), "  " + base.str.replace(" ", "  ") + " "])
+    variant = np.where(rng.random(rows) < messy, rng.integers(1, 3, rows), 0)
+    sector_names = np.array((SECTORS + [f"Sector {i}" for i in range(len(SECTORS), sectors)])[:sectors])
+
+    df = pd.DataFrame({
+        "orgName": spellings[org, variant],
+        "sector": sector_names[org % len(sector_names)],
+        "addressCity": CITIES[org % len(CITIES)],
+        "addressState": "IL",
+        "addressCountry": "USA",
+        "eventId": pd.Series(event).map("EVT-{:05d}".format),
+        "eventName": pd.Series(event).map("Conference {}".format),
+        "eventDate": pd.Series(event % 28 + 1).map("2024-05-{:02d}".format),
+    })
+    if connections:
+        df["connections"] = connection_cells(rng, rows, n_orgs, connections)
+    return df
+
+
+def connection_cells(rng, rows: int, n_orgs: int, mean: float) -> np.ndarray:
+    """Poisson(mean) connections per row, as the JSON arrays the upload form writes."""
+    per_row = rng.poisson(mean, rows)
+    total = int(per_row.sum())
+    cells = np.full(rows, "", dtype=object)
+    if not total:
+        return cells
+    target = pd.Series(rng.integers(0, n_orgs, total)).map('{{"organization": "Organization {}", '.format)
+    kind = pd.Series(CONNECTION_TYPES[rng.integers(0, len(CONNECTION_TYPES), total)]).map('"connectionType": "{}"}}'.format)
+    entries = (target + kind).to_numpy()
+
+    # join each row's entries: ", " before all but the first, then one
+    # string concatenation per row
+    has = np.flatnonzero(per_row)
+    starts = np.cumsum(per_row[has]) - per_row[has]
+    sep = np.full(total, ", ", dtype=object)
+    sep[starts] = ""
+    cells[has] = "[" + np.add.reduceat(sep + entries, starts) + "]"
+    return cells
+
+
+def parse_rows(text: str) -> list:
+    scale = {"k": 1_000, "m": 1_000_000}
+    out = []
+    for part in text.split(","):
+        part = part.strip().lower()
+        mult = scale.get(part[-1:], 1)
+        out.append(int(float(part[:-1] if mult > 1 else part) * mult))
+    return out
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def run_size(rows: int, args: dict) -> dict:
+    """All stages for one input size (runs in its own process)."""
+    from converter import (canonical_keys, extract_connections, key_ids, map_files, norm_strs,
+                           record_sections, resolve_aggregate, shutdown_pools, union_columns,
+                           write_table_atomic)
+
+    stages, sections, rss = {}, {}, {}
+
+    def timed(stage, fn):
+        best, out, laps = float("inf"), None, {}
+        for _ in range(args["repeat"]):
+            out = None
+            with record_sections() as recorded:
+                t0 = time.perf_counter()
+                out = fn()
+                took = time.perf_counter() - t0
+            if took < best:
+                best, laps = took, dict(recorded)
+        stages[stage] = round(best, 4)
+        sections.update({k: round(v, 4) for k, v in laps.items()})
+        rss[stage] = peak_rss_mb()
+        return out
+
+    t0 = time.perf_counter()
+    df = synthetic_responses(rows, seed=args["seed"], orgs=args["orgs"], events=args["events"],
+                             sectors=args["sectors"], connections=args["connections"])
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i, part in enumerate(np.array_split(np.arange(rows), args["files"])):
+            paths.append(os.path.join(tmp, f"responses_{i}.csv"))
+            df.iloc[part].to_csv(paths[-1], index=False)
+        orgs, connections = df["orgName"], df.get("connections")
+        del df
+        setup = time.perf_counter() - t0
+
+        timed("normalize_keys", lambda: key_ids(canonical_keys(norm_strs(orgs)), "org"))
+        if connections is not None:
+            timed("extract_connections", lambda: extract_connections(connections))
+        del orgs, connections
+
+        header = union_columns(paths)
+        for name, mode in (("responses", {}), ("custom", {"graph_mode": "custom_ab", "src_col": "orgName",
+                                                          "dst_col": "eventName", "edge_label_col": "sector"})):
+            aggregate, resolved, needed = resolve_aggregate(header, **mode)
+            parts = timed(f"{name}.map_files",
+                          lambda: map_files(paths, aggregate, resolved, needed, workers=args["workers"])[0])
+            total = timed(f"{name}.combine", lambda: aggregate(resolved, aggregate.combine(parts).tables))
+            del parts
+            graph = timed(f"{name}.to_graph", total.to_graph)
+            if name == "responses":
+                nodes, edges = graph
+            del total, graph
+
+        def write_csv():
+            for name, frame in (("nodes", nodes), ("edges", edges)):
+                write_table_atomic(frame, os.path.join(tmp, f"{name}.csv"))
+
+        timed("write_csv", write_csv)
+        # --workers started a reader pool; this process can't exit while it runs
+        shutdown_pools()
+
+    return {
+        "rows": rows,
+        "files": args["files"],
+        "nodes": len(nodes),
+        "edges": len(edges),
+        "setup_seconds": round(setup, 2),
+        "stages": stages,
+        "sections": sections,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_after_mb": rss,
+    }
+
+
+def run_meta(args) -> dict:
+    def git(*cmd):
+        try:
+            return subprocess.run(["git", *cmd], capture_output=True, text=True, timeout=30,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+
+    import pyarrow
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": pyarrow.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+    }
+
+
+def compare(results: list, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {r["rows"]: r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path} (new / old time; < 1 is faster)")
+    for r in results:
+        old = baseline.get(r["rows"])
+        if not old:
+            print(f"  {r['rows']:,} rows: not in baseline")
+            continue
+        print(f"  {r['rows']:,} rows")
+        for group in ("stages", "sections"):
+            for name, t in r[group].items():
+                if old[group].get(name):
+                    print(f"    {name:44}{old[group][name]:>10.3f}s{t:>10.3f}s{t / old[group][name]:>8.2f}x")
+        print(f"    {'peak RSS':44}{old['peak_rss_mb']:>9.0f}MB{r['peak_rss_mb']:>9.0f}MB"
+              f"{r['peak_rss_mb'] / old['peak_rss_mb']:>8.2f}x")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the conversion pipeline stage by stage.")
+    ap.add_argument("--rows", default="10k,100k,1M", help="comma-separated sizes, e.g. 10k,100k,1M,5M")
+    ap.add_argument("--orgs", type=int, default=None, help="distinct orgs (default rows / 20)")
+    ap.add_argument("--events", type=int, default=None, help="distinct events (default rows / 500)")
+    ap.add_argument("--sectors", type=int, default=5)
+    ap.add_argument("--connections", type=float, default=0.5, help="mean connections per row")
+    ap.add_argument("--files", type=int, default=1, help="split each input over this many CSV files")
+    ap.add_argument("--workers", type=int, default=1, help="processes mapping the files")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="bench_pipeline.json")
+    ap.add_argument("--compare", metavar="BASELINE_JSON")
+    args = ap.parse_args()
+
+    # measure parsing and mapping, not the parsed-upload or partial caches
+    for var in ("PARSE_CACHE_MB", "PARSE_CACHE_MEM_MB", "PARTIAL_CACHE_MB", "PARTIAL_CACHE_MEM_MB"):
+        os.environ[f"CONVERTER_{var}"] = "0"
+    opts = {k: getattr(args, k) for k in ("orgs", "events", "sectors", "connections", "files", "workers",
+                                          "repeat", "seed")}
+
+    results = []
+    for rows in parse_rows(args.rows):
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            r = pool.submit(run_size, rows, opts).result()
+        results.append(r)
+        print(f"{rows:,} rows -> {r['nodes']:,} nodes, {r['edges']:,} edges   "
+              f"best of {args.repeat}, peak RSS {r['peak_rss_mb']:.0f} MB")
+        for name, t in {**r["stages"], **r["sections"]}.items():
+            print(f"  {name:46}{t:>9.3f}s")
+
+    with open(args.out, "w") as f:
+        json.dump({"meta": run_meta(args), "results": results}, f, indent=2)
+    print(f"\nwrote {args.out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,107 @@
 # backend/converter.py
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Blueprint, Response, request, jsonify, send_file, abort, g
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from werkzeug.sansio.multipart import MultipartDecoder, NeedData, File, Data, Epilogue
 
+import io
 import os
 import re
+import importlib.util
 import json
-from collections import Counter
+import logging
+import hashlib
+import hmac
+import shutil
+import time
+import uuid
+import zlib
+import tarfile
+import zipfile
+import threading
+import multiprocessing
+import cProfile
+import sys
+from collections import Counter, OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
+import numpy as np
 import pandas as pd
 
 # ------------------ app setup ------------------
 
-app = Flask(__name__)
-
-# CORS configuration for development - allow all origins
-CORS(app, 
-     resources={r"/*": {
-         "origins": "*",
-         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-         "allow_headers": ["Content-Type", "Authorization"],
-         "supports_credentials": False
-     }}
-)
+# routes are registered on the app by create_app()
+bp = Blueprint("converter", __name__)
 
 UPLOAD_FOLDER = "uploads"
 OUTPUT_FOLDER = "outputs"
+CACHE_FOLDER = "cache"
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
 ALLOWED_EXT = {".csv", ".xlsx"}
 
+# Worker processes used to parse uploaded files in parallel (.xlsx parsing
+# is CPU-bound). 1 reads everything in-process.
+READ_WORKERS = int(os.environ.get("CONVERTER_READ_WORKERS", "1"))
+
+# Parsed-upload cache budgets in MB (0 turns a layer off).
+PARSE_CACHE_DISK_MB = int(os.environ.get("CONVERTER_PARSE_CACHE_MB", "512"))
+PARSE_CACHE_MEM_MB = int(os.environ.get("CONVERTER_PARSE_CACHE_MEM_MB", "128"))
+
+# Budgets in MB for the per-file partial aggregates of earlier conversions
+# (0 turns a layer off).
+PARTIAL_CACHE_DISK_MB = int(os.environ.get("CONVERTER_PARTIAL_CACHE_MB", "256"))
+PARTIAL_CACHE_MEM_MB = int(os.environ.get("CONVERTER_PARTIAL_CACHE_MEM_MB", "64"))
+
+# Disk budget in MB for memoized conversion results.
+RESULT_CACHE_MB = int(os.environ.get("CONVERTER_RESULT_CACHE_MB", "256"))
+
+# How long a job's output stays downloadable, and how often to sweep.
+JOB_TTL_SECONDS = float(os.environ.get("CONVERTER_JOB_TTL_HOURS", "24")) * 3600
+JANITOR_INTERVAL_SECONDS = 600
+
+# Processes running queued conversions, server-wide: each of the WEB_WORKERS
+# processes serving requests gets an equal share of them (at least one).
+JOB_WORKERS = int(os.environ.get("CONVERTER_JOB_WORKERS", "2"))
+WEB_WORKERS = int(os.environ.get("WEB_CONCURRENCY", "1"))  # gunicorn.conf.py sets it per worker
+# Conversions a job process runs before it is replaced, handing the memory
+# pandas has fragmented back to the OS (0: never).
+JOB_MAX_TASKS = int(os.environ.get("CONVERTER_JOB_MAX_TASKS", "100"))
+
+# Write compressed copies of text outputs at conversion time (0: compress
+# downloads on the fly instead, saving the disk space).
+PRECOMPRESS_DOWNLOADS = os.environ.get("CONVERTER_PRECOMPRESS", "1") != "0"
+
+# Base of the URLs handed back to the frontend.
+PUBLIC_URL = "http://127.0.0.1:5002"
+
+# Admins (requests with "Authorization: Bearer <token>") may ask /upload
+# for a profiled conversion; no token disables profiling. At most
+# PROFILES_PER_HOUR profiled conversions run per hour, server-wide.
+PROFILE_TOKEN = os.environ.get("CONVERTER_PROFILE_TOKEN", "")
+PROFILES_PER_HOUR = int(os.environ.get("CONVERTER_PROFILES_PER_HOUR", "4"))
+
+# Folder the server processes share their /metrics counters through
+# (empty: each process only reports its own).
+METRICS_FOLDER = os.environ.get("CONVERTER_METRICS_DIR", os.path.join(CACHE_FOLDER, "metrics"))
+# How often a server process publishes its counters there.
+METRICS_FLUSH_SECONDS = 5
+
+# Structured (one JSON object per line) logs of every upload and
+# conversion go to stderr; CONVERTER_LOG_LEVEL=WARNING keeps only failures.
+log = logging.getLogger("converter")
+if not log.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_log_handler)
+    log.setLevel(os.environ.get("CONVERTER_LOG_LEVEL", "INFO").upper())
+    log.propagate = False
+
 
 # ------------------ small helpers ------------------
 
@@ -40,14 +109,21 @@ def _allowed(path: str) -> bool:
     return os.path.splitext(path)[1].lower() in ALLOWED_EXT
 
 
-def _unique_path(folder: str, filename: str) -> str:
-    base, ext = os.path.splitext(filename)
-    p = os.path.join(folder, filename)
-    i = 1
-    while os.path.exists(p):
-        p = os.path.join(folder, f"{base}_{i}{ext}")
-        i += 1
-    return p
+def _save_upload(file, folder: str, filename: str) -> str:
+    """
+    Save an uploaded file under the hash of its contents, so uploading the
+    same data again reuses the earlier copy (and its cached parse) instead
+    of writing another one.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    digest = stream_digest(file.stream)
+    path = os.path.join(folder, f"{digest}{ext}")
+    if not os.path.exists(path):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        file.save(tmp)
+        os.replace(tmp, path)
+    remember_digest(path, digest)
+    return path
 
 
 def norm_str(s: str) -> str:
@@ -102,690 +178,3790 @@ def most_common_non_empty(vals):
     return Counter(vals).most_common(1)[0][0] if vals else ""
 
 
-# ------------------ reading & merging many files ------------------
+# ------------------ instrumentation ------------------
+#
+# The graph builders mark the end of each of their sections with a lap();
+# the laps are only kept while a caller records them (StageTimer, the
+# benchmarks), and cost nothing otherwise.
 
-def read_one(path: str) -> pd.DataFrame:
-    ext = os.path.splitext(path)[1].lower()
-    if ext == ".csv":
-        df = pd.read_csv(path)
-    elif ext == ".xlsx":
-        df = pd.read_excel(path)
-    else:
-        raise RuntimeError(f"Unsupported file type: {ext} (only .csv, .xlsx)")
+_recording = threading.local()
 
-    df = df.rename(columns=lambda c: str(c).strip())
-    df.fillna("", inplace=True)
-    df["__source_file__"] = os.path.basename(path)
-    return df
 
+class record_sections:
+    """
+    Context manager collecting the laps made in this thread into a dict of
+    "<prefix>.<section>" -> seconds (summed when a section runs repeatedly,
+    e.g. once per chunk).
+    """
 
-def merge_files(paths):
-    frames = []
-    for p in paths:
-        if not _allowed(p):
-            raise RuntimeError(f"Unsupported extension for '{p}'. Allowed: {sorted(ALLOWED_EXT)}")
-        if not os.path.exists(p):
-            raise RuntimeError(f"File not found: {p}")
-        frames.append(read_one(p))
+    def __enter__(self) -> dict:
+        self.outer = getattr(_recording, "sections", None)
+        _recording.sections = {}
+        return _recording.sections
 
-    if not frames:
-        raise RuntimeError("No readable files given.")
+    def __exit__(self, *exc):
+        _recording.sections = self.outer
 
-    # union of columns
-    all_cols = set()
-    for f in frames:
-        all_cols |= set(f.columns)
-    frames = [f.reindex(columns=sorted(all_cols)).fillna("") for f in frames]
 
-    big = pd.concat(frames, ignore_index=True)
-    return big
+def _no_lap(name):
+    pass
 
 
-# ------------------ graph builder ------------------
+def section_timer(prefix: str):
+    """lap(name): time since the previous lap (or this call) goes to section `name`."""
+    sections = getattr(_recording, "sections", None)
+    if sections is None:
+        return _no_lap
+    last = time.perf_counter()
 
-def build_graph_from_responses(df: pd.DataFrame, mapping=None):
-    """
-    df is the merged DataFrame from one or many event CSVs.
+    def lap(name):
+        nonlocal last
+        now = time.perf_counter()
+        key = f"{prefix}.{name}"
+        sections[key] = sections.get(key, 0.0) + now - last
+        last = now
 
-    Expected (case-insensitive) columns:
+    return lap
 
-      orgName, sector, firstName, lastName, email, socialLink, phone,
-      addressStreet, addressCity, addressState, addressCountry,
-      Role, eventId, eventName, eventDate, connections
 
-    mapping: optional dict mapping logical names to actual CSV column names
-      Example: {"orgName": "Organization", "eventId": "Conference ID"}
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
 
-    We will:
-      - normalize org & event names (case, spaces)
-      - dedupe orgs across all files
-      - produce:
-          nodes_df (events + orgs)
-          edges_df (attendance org→event + connection org→org)
-    """
 
-    mapping = mapping or {}
-    # map lowercase -> actual name
-    cols_lower = {c.lower(): c for c in df.columns}
+def rss_bytes() -> int:
+    """Current resident set size (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if os.uname().sysname == "Darwin" else 1024)
 
-    def col(name, required=False):
-        # 1) Check if user provided a mapping for this logical name
-        user_col = mapping.get(name)
-        if user_col and user_col in df.columns:
-            return df[user_col].astype(str)
-        
-        # 2) Fallback to old behavior (canonical name matching)
-        key = name.lower()
-        if key in cols_lower:
-            return df[cols_lower[key]].astype(str)
-        if required:
-            raise RuntimeError(
-                f"Required column '{name}' not found. "
-                f"Available columns: {list(df.columns)}"
-            )
-        return pd.Series([""] * len(df))
-
-    org_name   = col("orgname",   required=True)
-    sector     = col("sector")
-    city       = col("addresscity")
-    state      = col("addressstate")
-    country    = col("addresscountry")
-
-    event_id   = col("eventid",   required=True)
-    event_name = col("eventname", required=True)
-    event_date = col("eventdate", required=True)
-
-    # optional connections column
-    connections_colname = cols_lower.get("connections")
-
-    # Canonical keys
-    org_key   = org_name.apply(canonical_key)
-    event_key = pd.Series(
-        [
-            canonical_key(eid) or canonical_key(ename)
-            for eid, ename in zip(event_id, event_name)
-        ]
-    )
 
-    # ---------- EVENT NODES ----------
-    event_rows = []
-    for key, group in df.groupby(event_key):
-        if not key:
-            continue
-        any_eid   = first_non_empty(group[cols_lower["eventid"]])
-        any_name  = first_non_empty(group[cols_lower["eventname"]])
-        any_date  = first_non_empty(group[cols_lower["eventdate"]])
-        any_city  = first_non_empty(group[cols_lower.get("addresscity", "")]) if "addresscity" in cols_lower else ""
-        any_state = first_non_empty(group[cols_lower.get("addressstate", "")]) if "addressstate" in cols_lower else ""
-        any_country = first_non_empty(group[cols_lower.get("addresscountry", "")]) if "addresscountry" in cols_lower else ""
-
-        node_id = f"evt_{slug(key)}"
-        label   = pretty_name(any_name or any_eid)
-        event_rows.append(
-            (
-                node_id, label, "event",
-                "", "",                       # org_type, org_sector (blank)
-                any_city, any_state, any_country,
-                any_date, any_eid
-            )
-        )
+class StageTimer:
+    """
+    Per-stage wall time, CPU time (of this thread), rows in / out and RSS
+    change of one pipeline run, plus the builders' section laps made while
+    it runs. start(stage) ends the previous stage (and reports the new one
+    to `progress`); summary() ends the last, and must be called when
+    `sections` are recorded. A stage started again - read and normalize
+    alternate file by file - adds to its first record and is reported to
+    `progress` only once.
 
-    event_df = pd.DataFrame(
-        event_rows,
-        columns=[
-            "Id", "Label", "type",
-            "org_type", "org_sector",
-            "city", "state", "country",
-            "event_date", "event_id",
-        ],
-    )
+    A few clock and /proc reads per stage - cheap enough to leave on.
+    """
 
-    # ---------- SECTOR NODES (NEW 3-LAYER STRUCTURE) ----------
-    # Create sector nodes with CLEAN labels (not slugified)
-    sector_key = sector.apply(lambda s: canonical_key(s) if norm_str(s) else "")
-    
-    sector_rows = []
-    for key, group in df.groupby(sector_key):
-        if not key:  # Skip empty sectors
-            continue
-        
-        # Get the most common sector name (clean, readable)
-        # sector is a Series, so we get values from the original column
-        sector_col_name = cols_lower.get("sector")
-        if sector_col_name:
-            sector_values = group[sector_col_name].apply(norm_str)
-            clean_sector_name = most_common_non_empty(sector_values)
-        else:
-            clean_sector_name = key
-            
-        if not clean_sector_name:
-            continue
-            
-        node_id = f"sector_{slug(key)}"  # ID is slugified
-        label = clean_sector_name  # Label is CLEAN (e.g., "Robotics", "NLP")
-        
-        sector_rows.append((
-            node_id, label, "sector",
-            "", "",  # org_type, org_sector blank
-            "", "", "",  # city, state, country blank
-            "", ""  # event_date, event_id blank
-        ))
-    
-    sector_df = pd.DataFrame(
-        sector_rows,
-        columns=[
-            "Id", "Label", "type",
-            "org_type", "org_sector",
-            "city", "state", "country",
-            "event_date", "event_id",
-        ],
-    )
+    def __init__(self, progress=None, sections=True):
+        self.progress = progress or _no_progress
+        self.stages = []
+        self.current = None
+        self.started = time.perf_counter()
+        self.cpu_started = time.thread_time()
+        self._recording = record_sections() if sections else None
+        self.sections = self._recording.__enter__() if sections else {}
+        self.notes = {}
 
-    # ---------- ORG NODES ----------
-    org_rows = []
-    
-    # Get extra attributes from mapping if provided
-    extra_attrs = mapping.get("extraAttrs", []) if mapping else []
+    def start(self, stage: str, rows_in: int = None):
+        self._end()
+        if not any(s["stage"] == stage for s in self.stages):
+            self.progress(stage)
+        self.current = {
+            "stage": stage, "rows_in": rows_in, "rows_out": None,
+            "_t": time.perf_counter(), "_cpu": time.thread_time(), "_rss": rss_bytes(),
+        }
 
-    for key, group in df.groupby(org_key):
-        if not key:
-            continue
-        labels  = group[cols_lower["orgname"]]
-        sectors = group[cols_lower.get("sector", "")] if "sector" in cols_lower else ""
-        cities  = group[cols_lower.get("addresscity", "")] if "addresscity" in cols_lower else ""
-        states  = group[cols_lower.get("addressstate", "")] if "addressstate" in cols_lower else ""
-        countries = group[cols_lower.get("addresscountry", "")] if "addresscountry" in cols_lower else ""
-
-        label   = pretty_name(most_common_non_empty(labels) or key)
-        sector_ = most_common_non_empty(sectors) if isinstance(sectors, pd.Series) else ""
-        city_   = most_common_non_empty(cities) if isinstance(cities, pd.Series) else ""
-        state_  = most_common_non_empty(states) if isinstance(states, pd.Series) else ""
-        country_ = most_common_non_empty(countries) if isinstance(countries, pd.Series) else ""
-
-        node_id = f"org_{slug(key)}"
-        
-        # Build base row data
-        row_data = [
-            node_id, label, "org",
-            "", sector_,
-            city_, state_, country_,
-            "", ""      # event_date, event_id
-        ]
-        
-        # Add extra attributes
-        for attr in extra_attrs:
-            if attr in df.columns:
-                attr_values = group[attr]
-                row_data.append(most_common_non_empty(attr_values) if len(attr_values) > 0 else "")
-            else:
-                row_data.append("")
-        
-        org_rows.append(tuple(row_data))
-
-    # ---------- ATTENDANCE EDGES (org -> event) ----------
-    att_edges = []
-    for ok, ek, eid, ename, edate in zip(
-        org_key, event_key, event_id, event_name, event_date
-    ):
-        if not ok or not ek:
-            continue
-        org_id = f"org_{slug(ok)}"
-        ev_id  = f"evt_{slug(ek)}"
-        att_edges.append(
-            {
-                "Source": org_id,
-                "Target": ev_id,
-                "edge_type": "attendance",
-                "event_id": norm_str(eid),
-                "event_date": norm_str(edate),
-                "connection_type": "",
-                "description": "",
-                "weight": 1,
-            }
-        )
+    def rows_out(self, n: int):
+        self.current["rows_out"] = int(n)
 
-    if att_edges:
-        att_df = pd.DataFrame(att_edges)
-        grouped = (
-            att_df.groupby(
-                ["Source", "Target", "edge_type", "event_id", "event_date"],
-                dropna=False,
-            )["weight"]
-            .sum()
-            .reset_index()
-        )
-        grouped["connection_type"] = ""
-        grouped["description"] = ""
-        attendance_df = grouped
-    else:
-        attendance_df = pd.DataFrame(
-            columns=[
-                "Source", "Target", "edge_type",
-                "event_id", "event_date",
-                "connection_type", "description",
-                "weight",
-            ]
-        )
+    def note(self, **fields):
+        """Extra fields for the summary, e.g. which reader parsed each file."""
+        self.notes.update(fields)
 
-    # ---------- EVENT→SECTOR EDGES (NEW 3-LAYER STRUCTURE) ----------
-    event_sector_edges = []
-    for (ek, sk), group in df.groupby([event_key, sector_key]):
-        if not ek or not sk:
-            continue
-        ev_id = f"evt_{slug(ek)}"
-        sec_id = f"sector_{slug(sk)}"
-        
-        # Get event_id and event_date from the group using column names
-        eid_col = cols_lower.get("eventid")
-        date_col = cols_lower.get("eventdate")
-        
-        any_eid = first_non_empty(group[eid_col]) if eid_col else ""
-        any_date = first_non_empty(group[date_col]) if date_col else ""
-        
-        # Weight = number of unique orgs in this sector at this event
-        # org_key is a Series, so we get the subset for this group by index
-        group_org_keys = org_key.loc[group.index]
-        weight = len(group_org_keys.unique())
-        
-        event_sector_edges.append({
-            "Source": ev_id,
-            "Target": sec_id,
-            "edge_type": "event_sector",
-            "event_id": any_eid,
-            "event_date": any_date,
-            "connection_type": "",
-            "description": "",
-            "weight": weight,
-        })
-    
-    event_sector_df = pd.DataFrame(event_sector_edges) if event_sector_edges else pd.DataFrame(
-        columns=["Source", "Target", "edge_type", "event_id", "event_date", "connection_type", "description", "weight"]
-    )
+    def add(self, summary: dict):
+        """
+        Fold in another timer's summary, e.g. of a file mapped in a reader
+        process: stage times, rows and sections add up.
+        """
+        self._end()
+        for record in summary["stages"]:
+            if not any(s["stage"] == record["stage"] for s in self.stages):
+                self.progress(record["stage"])
+            self._record(record)
+        for name, took in summary["sections"].items():
+            self.sections[name] = self.sections.get(name, 0.0) + took
 
-    # ---------- SECTOR→ORG EDGES (NEW 3-LAYER STRUCTURE) ----------
-    sector_org_edges = []
-    for (sk, ok), group in df.groupby([sector_key, org_key]):
-        if not sk or not ok:
-            continue
-        sec_id = f"sector_{slug(sk)}"
-        org_id = f"org_{slug(ok)}"
-        
-        # Get event_id and event_date from the group using column names
-        eid_col = cols_lower.get("eventid")
-        date_col = cols_lower.get("eventdate")
-        
-        any_eid = first_non_empty(group[eid_col]) if eid_col else ""
-        any_date = first_non_empty(group[date_col]) if date_col else ""
-        
-        # Weight = number of participants from this org in this sector
-        weight = len(group)
-        
-        sector_org_edges.append({
-            "Source": sec_id,
-            "Target": org_id,
-            "edge_type": "sector_org",
-            "event_id": any_eid,
-            "event_date": any_date,
-            "connection_type": "",
-            "description": "",
-            "weight": weight,
+    def stop(self):
+        """End the current stage without starting another."""
+        self._end()
+
+    def _end(self):
+        cur, self.current = self.current, None
+        if cur is None:
+            return
+        rss = rss_bytes()
+        self._record({
+            "stage": cur["stage"],
+            "wall_s": time.perf_counter() - cur["_t"],
+            "cpu_s": time.thread_time() - cur["_cpu"],
+            "rows_in": cur["rows_in"],
+            "rows_out": cur["rows_out"],
+            "rss_mb": rss / (1 << 20),
+            "rss_delta_mb": (rss - cur["_rss"]) / (1 << 20),
         })
-    
-    sector_org_df = pd.DataFrame(sector_org_edges) if sector_org_edges else pd.DataFrame(
-        columns=["Source", "Target", "edge_type", "event_id", "event_date", "connection_type", "description", "weight"]
-    )
 
-    # ---------- CONNECTION EDGES (org -> org) ----------
-    conn_edges = []
-    if connections_colname:
-        for _, row in df.iterrows():
-            base_ok = canonical_key(row.get(cols_lower["orgname"], ""))
-            if not base_ok:
-                continue
-            base_id   = f"org_{slug(base_ok)}"
-            eid_val   = norm_str(row.get(cols_lower["eventid"], ""))
-            edate_val = norm_str(row.get(cols_lower["eventdate"], ""))
-            raw       = norm_str(row.get(connections_colname, ""))
+    def _record(self, record: dict):
+        prev = next((s for s in self.stages if s["stage"] == record["stage"]), None)
+        if prev is None:
+            prev = dict.fromkeys(record, None)
+            prev.update(stage=record["stage"], wall_s=0.0, cpu_s=0.0, rss_mb=0.0, rss_delta_mb=0.0)
+            self.stages.append(prev)
+        for field, digits in (("wall_s", 4), ("cpu_s", 4), ("rss_delta_mb", 1)):
+            prev[field] = round(prev[field] + record[field], digits)
+        for field in ("rows_in", "rows_out"):
+            if record[field] is not None:
+                prev[field] = (prev[field] or 0) + record[field]
+        prev["rss_mb"] = round(max(prev["rss_mb"], record["rss_mb"]), 1)
 
-            if not raw or raw == "[]":
-                continue
+    def summary(self) -> dict:
+        self._end()
+        if self._recording is not None:
+            self._recording.__exit__(None, None, None)
+            self._recording = None
+        return {
+            "wall_s": round(time.perf_counter() - self.started, 4),
+            "cpu_s": round(time.thread_time() - self.cpu_started, 4),
+            "stages": self.stages,
+            "sections": {k: round(v, 4) for k, v in self.sections.items()},
+            **self.notes,
+        }
+
+
+def log_event(event: str, level=logging.INFO, **fields):
+    """One structured log line: {"event": ..., "ts": ..., **fields}."""
+    if log.isEnabledFor(level):
+        log.log(level, json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, default=str))
+
+
+# ------------------ metrics ------------------
+#
+# Prometheus counters, gauges and histograms. Every process (gunicorn
+# workers, job and read workers) keeps its own values and, on flush(),
+# writes them to <METRICS_FOLDER>/<pid>-<id>.json; /metrics adds up all
+# the files. Requests only count in memory: server processes flush from a
+# background thread every METRICS_FLUSH_SECONDS, job and read workers after
+# each task. Files of exited processes are folded into one archive so
+# counters never go backwards; their gauges are dropped.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CONVERSION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+# name -> (type, help, histogram buckets)
+METRIC_TYPES = {
+    "converter_http_requests_total": ("counter", "HTTP requests by route, method and status.", None),
+    "converter_http_request_duration_seconds": ("histogram", "Time to produce the response, by route.", LATENCY_BUCKETS),
+    "converter_conversions_total": ("counter", "Finished conversions by graph mode, format and outcome.", None),
+    "converter_conversion_duration_seconds": ("histogram", "Conversion run time by graph mode and format.", CONVERSION_BUCKETS),
+    "converter_conversions_in_flight": ("gauge", "Conversions queued or running.", None),
+    "converter_input_rows_total": ("counter", "Rows read by conversions.", None),
+    "converter_input_bytes_total": ("counter", "Bytes of uploaded files converted.", None),
+    "converter_output_nodes_total": ("counter", "Nodes written by conversions.", None),
+    "converter_output_edges_total": ("counter", "Edges written by conversions.", None),
+    "converter_result_cache_requests_total": ("counter", "Result cache lookups by result (hit/miss).", None),
+    "converter_parse_cache_requests_total": ("counter", "Parsed-upload cache lookups by result (hit/miss).", None),
+    "converter_partial_cache_requests_total": ("counter", "Per-file partial aggregate cache lookups by result (hit/miss).", None),
+}
+
+_METRICS_ARCHIVE = "archive.json"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """
+    This process's samples, keyed by (name, sorted label items):
+    counters and gauges hold a number, histograms [bucket counts..., sum,
+    count] (non-cumulative buckets, the last one +Inf).
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.samples = {}
+        self.dirty = False
+        self.path = os.path.join(self.folder, f"{self.pid}-{uuid.uuid4().hex[:8]}.json") if self.folder else None
 
-            # Try to parse JSON (stringified array)
+    def _sample(self, name, labels):
+        if os.getpid() != self.pid:
+            # forked (gunicorn worker): start this process's own file
+            self._reset()
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        if key not in self.samples:
+            buckets = METRIC_TYPES[name][2]
+            self.samples[key] = [0] * (len(buckets) + 3) if buckets else 0
+        return key
+
+    def inc(self, name: str, value=1, **labels):
+        with self._lock:
+            key = self._sample(name, labels)
+            self.samples[key] += value
+            self.dirty = True
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            key = self._sample(name, labels)
+            h = self.samples[key]
+            h[int(np.searchsorted(METRIC_TYPES[name][2], value))] += 1
+            h[-2] += value
+            h[-1] += 1
+            self.dirty = True
+
+    def flush(self):
+        """Publish this process's samples for /metrics in other processes."""
+        if not self.path:
+            return
+        with self._lock:
+            if os.getpid() != self.pid:
+                self._reset()
+            if not self.dirty:
+                return
+            self.dirty = False
+            data = {"pid": self.pid, "samples": [[n, dict(l), v] for (n, l), v in self.samples.items()]}
             try:
-                data = json.loads(raw)
-            except Exception:
-                try:
-                    data = json.loads(json.loads(raw))
-                except Exception:
-                    continue
+                os.makedirs(self.folder, exist_ok=True)
+                tmp = f"{self.path}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp, self.path)
+            except OSError:
+                pass
 
-            if isinstance(data, dict):
-                data = [data]
-            if not isinstance(data, list):
-                continue
+    def start_flusher(self, interval=METRICS_FLUSH_SECONDS):
+        """
+        Flush every `interval` seconds from a daemon thread, once per
+        process. Called from the request path, like start_janitor(), so
+        that each forked gunicorn worker gets its own thread.
+        """
+        with self._lock:
+            if self._flusher is not None and self._flusher[0] == os.getpid():
+                return
+            thread = threading.Thread(target=self._flush_loop, args=(interval,), name="metrics-flusher", daemon=True)
+            self._flusher = (os.getpid(), thread)
+        thread.start()
+
+    def _flush_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            self.flush()
 
-            for conn in data:
+    def _load(self) -> list:
+        """Every process's [name, labels, value] samples; gauges only from live ones."""
+        if not self.path:
+            with self._lock:
+                return [[n, dict(l), v] for (n, l), v in self.samples.items()]
+        self.flush()
+        import fcntl
+        samples, dead = [], []
+        with open(os.path.join(self.folder, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            for entry in os.scandir(self.folder):
+                if not entry.name.endswith(".json"):
+                    continue
                 try:
-                    org2 = (
-                        conn.get("organization")
-                        or conn.get("orgName")
-                        or conn.get("connectionOrg")
-                        or conn.get("connectionOrganization")
-                        or conn.get("connection_organization")
-                    )
-                    if not org2:
-                        continue
-                    org2_label = pretty_name(org2)
-                    ok2 = canonical_key(org2)
-                    if not ok2:
-                        continue
-                    target_id = f"org_{slug(ok2)}"
-
-                    ctype = conn.get("connectionType") or conn.get("type") or ""
-                    desc  = conn.get("description")   or conn.get("notes") or ""
-
-                    # ensure target org exists as a node (minimal info)
-                    org_rows.append(
-                        (
-                            target_id,
-                            org2_label,
-                            "org",
-                            "", "",
-                            "", "", "",
-                            "", ""
-                        )
-                    )
-
-                    conn_edges.append(
-                        {
-                            "Source": base_id,
-                            "Target": target_id,
-                            "edge_type": "connection",
-                            "event_id": eid_val,
-                            "event_date": edate_val,
-                            "connection_type": norm_str(ctype),
-                            "description": norm_str(desc),
-                            "weight": 1,
-                        }
-                    )
-                except Exception:
+                    with open(entry.path) as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
                     continue
+                if entry.name == _METRICS_ARCHIVE:
+                    samples += data["samples"]
+                elif _pid_alive(data["pid"]):
+                    samples += data["samples"]
+                else:
+                    kept = [x for x in data["samples"] if METRIC_TYPES[x[0]][0] != "gauge"]
+                    samples += kept
+                    dead.append((entry.path, kept))
+            if dead:
+                # fold exited processes into the archive
+                archive = os.path.join(self.folder, _METRICS_ARCHIVE)
+                try:
+                    with open(archive) as f:
+                        kept = json.load(f)["samples"]
+                except (OSError, ValueError):
+                    kept = []
+                for _, part in dead:
+                    kept += part
+                tmp = f"{archive}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump({"samples": _sum_samples(kept)}, f)
+                os.replace(tmp, archive)
+                for path, _ in dead:
+                    os.remove(path)
+        return samples
 
-    if conn_edges:
-        conn_df = pd.DataFrame(conn_edges)
-        grouped = (
-            conn_df.groupby(
-                [
-                    "Source", "Target", "edge_type",
-                    "event_id", "event_date",
-                    "connection_type", "description",
-                ],
-                dropna=False,
-            )["weight"]
-            .sum()
-            .reset_index()
-        )
-        connection_df = grouped
-    else:
-        connection_df = pd.DataFrame(
-            columns=[
-                "Source", "Target", "edge_type",
-                "event_id", "event_date",
-                "connection_type", "description", "weight",
-            ]
-        )
+    def render(self) -> str:
+        """All processes' metrics in the Prometheus text exposition format."""
+        totals = {}
+        for name, labels, value in _sum_samples(self._load()):
+            totals.setdefault(name, []).append((labels, value))
+        lines = []
+        for name, (kind, help_text, buckets) in METRIC_TYPES.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for labels, value in sorted(totals.get(name, []), key=lambda x: sorted(x[0].items())):
+                if kind != "histogram":
+                    lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+                    continue
+                cumulative = np.cumsum(value[:-2])
+                for le, n in zip([*map(_number, buckets), "+Inf"], cumulative):
+                    lines.append(f"{name}_bucket{_label_text(dict(labels, le=le))} {int(n)}")
+                lines.append(f"{name}_sum{_label_text(labels)} {_number(value[-2])}")
+                lines.append(f"{name}_count{_label_text(labels)} {int(value[-1])}")
+        return "\n".join(lines) + "\n"
 
-    # ---------- FINAL NODES & EDGES ----------
 
-    if org_rows:
-        # Build column list dynamically
-        base_columns = [
-            "Id", "Label", "type",
-            "org_type", "org_sector",
-            "city", "state", "country",
-            "event_date", "event_id",
-        ]
-        
-        # Add extra attribute columns
-        all_columns = base_columns + extra_attrs
-        
-        org_df = pd.DataFrame(
-            org_rows,
-            columns=all_columns,
-        )
-        
-        # Build aggregation dict dynamically
-        agg_dict = {
-            "Label": first_non_empty,
-            "type": "first",
-            "org_type": first_non_empty,
-            "org_sector": first_non_empty,
-            "city": first_non_empty,
-            "state": first_non_empty,
-            "country": first_non_empty,
-            "event_date": first_non_empty,
-            "event_id": first_non_empty,
-        }
-        
-        # Add extra attrs to aggregation
-        for attr in extra_attrs:
-            agg_dict[attr] = first_non_empty
-        
-        org_df = org_df.groupby("Id", as_index=False).agg(agg_dict)
-    else:
-        org_df = pd.DataFrame(
-            columns=[
-                "Id", "Label", "type",
-                "org_type", "org_sector",
-                "city", "state", "country",
-                "event_date", "event_id",
-            ]
-        )
+def _sum_samples(samples) -> list:
+    out = {}
+    for name, labels, value in samples:
+        if name not in METRIC_TYPES:
+            continue
+        key = (name, tuple(sorted(labels.items())))
+        if key not in out:
+            out[key] = value
+        elif isinstance(value, list):
+            out[key] = [a + b for a, b in zip(out[key], value)]
+        else:
+            out[key] += value
+    return [[n, dict(l), v] for (n, l), v in out.items()]
+
 
-    # Include sector nodes in the output
-    nodes_df = pd.concat([event_df, sector_df, org_df], ignore_index=True)
+def _label_text(labels: dict) -> str:
+    if not labels:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels.items()) + "}"
 
-    # Include all edge types: attendance, event→sector, sector→org, and connections
-    edges_df = pd.concat([attendance_df, event_sector_df, sector_org_df, connection_df], ignore_index=True)
 
-    return nodes_df, edges_df
+def _number(v) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
 
 
-def build_custom_edge_graph(df: pd.DataFrame, src_col: str, dst_col: str, edge_label_col: str = None, mapping=None):
+METRICS = MetricsRegistry(METRICS_FOLDER)
+
+
+# ------------------ vectorized keys ------------------
+#
+# Column-level versions of canonical_key / slug. Each distinct value is
+# normalized once and the result is broadcast back through integer codes,
+# so a 500k-row column with a few thousand orgs only runs the regex work a
+# few thousand times. Output is identical to the scalar helpers above.
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_WS_RE = re.compile(r"\s+")
+
+
+def _per_distinct(values, fn) -> pd.Series:
+    """Apply a Series -> Series transform once per distinct value of `values`."""
+    values = values if isinstance(values, pd.Series) else pd.Series(values)
+    codes, uniques = pd.factorize(values.astype(str), sort=False)
+    out = fn(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+    return pd.Series(out.take(codes), index=values.index, dtype=object)
+
+
+def norm_strs(values) -> pd.Series:
+    """Vectorized norm_str."""
+    return _per_distinct(values, lambda u: u.str.strip().str.replace(_WS_RE, " ", regex=True))
+
+
+def canonical_keys(values) -> pd.Series:
+    """Vectorized canonical_key."""
+    # lowercase, then every run of non [a-z0-9] (whitespace included) becomes
+    # one space - the same thing canonical_key gets to in three passes
+    return _per_distinct(
+        values,
+        lambda u: u.str.lower().str.replace(_NON_ALNUM_RE, " ", regex=True).str.strip(),
+    )
+
+
+def key_ids(keys: pd.Series, prefix: str) -> pd.Series:
     """
-    Build a simple A→B graph from custom columns.
-    
-    Args:
-        df: merged DataFrame
-        src_col: column name for source nodes
-        dst_col: column name for target nodes
-        edge_label_col: optional column for edge labels/types
-        mapping: optional mapping for extra attributes
-    
-    Returns:
-        nodes_df, edges_df
+    Node IDs for a Series of canonical keys: f"{prefix}_{slug(key)}".
+    Empty keys map to "" (callers drop those rows anyway).
     """
-    mapping = mapping or {}
-    
-    # Get source and target values
-    sources = df[src_col].astype(str).apply(norm_str)
-    targets = df[dst_col].astype(str).apply(norm_str)
-    
-    # Get edge labels if specified
-    edge_labels = df[edge_label_col].astype(str).apply(norm_str) if edge_label_col and edge_label_col in df.columns else pd.Series([""] * len(df))
-    
-    # Build nodes from unique values in both columns
-    all_node_names = pd.concat([sources, targets]).unique()
-    all_node_names = [n for n in all_node_names if n]  # filter empty
-    
-    # Get extra attributes if specified
-    extra_attrs = mapping.get("extraAttrs", [])
-    
-    node_rows = []
-    for name in all_node_names:
-        node_id = f"node_{slug(canonical_key(name))}"
-        label = pretty_name(name)
-        
-        # Determine type based on which column(s) it appears in
-        is_source = name in sources.values
-        is_target = name in targets.values
-        if is_source and is_target:
-            node_type = "both"
-        elif is_source:
-            node_type = "source"
-        else:
-            node_type = "target"
-        
-        row_data = {
-            "Id": node_id,
-            "Label": label,
-            "type": node_type,
-        }
-        
-        # Add extra attributes if any
-        for attr in extra_attrs:
-            if attr in df.columns:
-                # Find first non-empty value for this node
-                matches = df[(sources == name) | (targets == name)][attr]
-                row_data[attr] = first_non_empty(matches) if len(matches) > 0 else ""
-        
-        node_rows.append(row_data)
-    
-    nodes_df = pd.DataFrame(node_rows)
-    
-    # Build edges
-    edge_rows = []
-    for src, dst, label in zip(sources, targets, edge_labels):
-        if not src or not dst:
-            continue
-        
-        src_id = f"node_{slug(canonical_key(src))}"
-        dst_id = f"node_{slug(canonical_key(dst))}"
-        
-        edge_rows.append({
-            "Source": src_id,
-            "Target": dst_id,
-            "edge_type": norm_str(label) if label else "connection",
-            "weight": 1,
-        })
-    
-    if edge_rows:
-        edges_df = pd.DataFrame(edge_rows)
-        # Aggregate by source, target, edge_type
-        edges_df = edges_df.groupby(["Source", "Target", "edge_type"], dropna=False)["weight"].sum().reset_index()
-    else:
-        edges_df = pd.DataFrame(columns=["Source", "Target", "edge_type", "weight"])
-    
-    return nodes_df, edges_df
+    def _ids(u):
+        return (prefix + "_" + u.str.replace(" ", "_", regex=False)).where(u != "", "")
 
+    return _per_distinct(keys, _ids)
+
+
+def pretty_names(values) -> pd.Series:
+    """Vectorized pretty_name."""
+    return _per_distinct(values, lambda u: u.map(pretty_name))
 
-# ------------------ top-level conversion ------------------
 
-def convert_many(infiles, outdir=OUTPUT_FOLDER, fmt="gephi", mapping=None, graph_mode="org_event", src_col=None, dst_col=None, edge_label_col=None):
+# ------------------ grouped aggregation ------------------
+
+class GroupIndex:
     """
-    Convert files to graph format.
-    
-    Args:
-        infiles: list of file paths
-        outdir: output directory
-        fmt: output format ("gephi" or "kumu")
-        mapping: optional column mapping dict
-        graph_mode: "org_event", "org_org", or "custom_ab"
-        src_col: source column for custom_ab mode
-        dst_col: target column for custom_ab mode
-        edge_label_col: edge label column for custom_ab mode
+    Rows grouped by one or more key columns, factorized once into dense
+    integer codes. Group order matches df.groupby(keys) (sorted keys), and
+    the aggregations below give the same answers as first_non_empty /
+    most_common_non_empty applied group by group, without a Python loop
+    over the groups.
     """
-    df = merge_files(infiles)
-    
-    # Choose graph builder based on mode
-    if graph_mode == "custom_ab":
-        if not src_col or not dst_col:
-            raise RuntimeError("custom_ab mode requires src_col and dst_col")
-        nodes_df, edges_df = build_custom_edge_graph(df, src_col, dst_col, edge_label_col, mapping)
-    elif graph_mode == "org_org":
-        # For org-org mode, we still use the same builder but might want to filter out event nodes
-        # For now, use the same logic - we can refine this later
-        nodes_df, edges_df = build_graph_from_responses(df, mapping)
-        # Filter to only org nodes and org-org edges
-        nodes_df = nodes_df[nodes_df["type"] == "org"]
-        edges_df = edges_df[edges_df["edge_type"] == "connection"]
-    else:  # org_event (default)
-        nodes_df, edges_df = build_graph_from_responses(df, mapping)
 
-    os.makedirs(outdir, exist_ok=True)
+    def __init__(self, codes: np.ndarray, keys):
+        self.codes = codes          # group code per row
+        self.keys = keys            # one array of key values per level
+        self.n = len(keys[0])
 
-    if fmt.lower() == "kumu":
-        nodes_out = nodes_df.rename(columns={"Id": "id"})
-        edges_out = edges_df.rename(columns={"Source": "from", "Target": "to"})
-        nodes_name, edges_name = "nodes_kumu.csv", "edges_kumu.csv"
-    else:
-        nodes_out, edges_out = nodes_df, edges_df
-        nodes_name, edges_name = "nodes_gephi.csv", "edges_gephi.csv"
+    @classmethod
+    def of(cls, key):
+        codes, uniques = pd.factorize(np.asarray(key, dtype=object), sort=True)
+        return cls(codes, [np.asarray(uniques, dtype=object)])
 
-    nodes_path = os.path.join(outdir, nodes_name)
-    edges_path = os.path.join(outdir, edges_name)
-    nodes_out.to_csv(nodes_path, index=False)
-    edges_out.to_csv(edges_path, index=False)
+    def cross(self, other: "GroupIndex") -> "GroupIndex":
+        """Group by (self keys..., other keys...) reusing both sets of codes."""
+        pair = self.codes.astype(np.int64) * max(other.n, 1) + other.codes
+        codes, uniques = pd.factorize(pair, sort=True)
+        left, right = np.divmod(uniques, max(other.n, 1))
+        keys = [k[left] for k in self.keys] + [k[right] for k in other.keys]
+        return GroupIndex(codes, keys)
 
-    return nodes_name, edges_name, len(nodes_out), len(edges_out)
+    def size(self) -> np.ndarray:
+        return np.bincount(self.codes, minlength=self.n)
 
+    def first_non_empty(self, values, return_rows=False):
+        """
+        First non-empty (norm_str'd) value per group. With return_rows, also
+        the row it came from (-1 where the group has none).
+        """
+        vals = norm_strs(values).to_numpy()
+        out = np.full(self.n, "", dtype=object)
+        at = np.full(self.n, -1, dtype=np.int64)
+        rows = np.flatnonzero(vals != "")
+        groups, first = np.unique(self.codes[rows], return_index=True)
+        out[groups] = vals[rows[first]]
+        at[groups] = rows[first]
+        return (out, at) if return_rows else out
 
-# ------------------ Flask routes ------------------
+    def value_counts_non_empty(self, values):
+        """
+        Every (group, non-empty value) pair with its count and first row,
+        as four parallel arrays: group, value, count, first_row.
+        """
+        vals = norm_strs(values).to_numpy()
+        rows = np.flatnonzero(vals != "")
+        if not len(rows):
+            empty = np.array([], dtype=np.int64)
+            return empty, np.array([], dtype=object), empty, empty
 
-@app.route("/download/<path:filename>")
-def download(filename):
-    return send_from_directory(OUTPUT_FOLDER, filename, as_attachment=True)
+        vcodes, vuniq = pd.factorize(vals[rows])
+        pairs, first, counts = np.unique(
+            self.codes[rows].astype(np.int64) * len(vuniq) + vcodes,
+            return_index=True,
+            return_counts=True,
+        )
+        return pairs // len(vuniq), vals[rows[first]], counts, rows[first]
 
+    def most_common_non_empty(self, values) -> np.ndarray:
+        groups, vals, counts, first = self.value_counts_non_empty(values)
+        out = np.full(self.n, "", dtype=object)
+        if not len(groups):
+            return out
 
-@app.route("/inspect", methods=["POST"])
-def inspect():
+        # Counter.most_common: highest count, ties go to the value seen first
+        order = np.lexsort((first, -counts, groups))
+        lead = order[np.r_[True, groups[order][1:] != groups[order][:-1]]]
+        out[groups[lead]] = vals[lead]
+        return out
+
+
+# ------------------ connections column ------------------
+
+# keys a connection object may use for the other organization, in priority order
+CONNECTION_ORG_FIELDS = (
+    "organization",
+    "orgName",
+    "connectionOrg",
+    "connectionOrganization",
+    "connection_organization",
+)
+
+
+def parse_connections(raw: str):
     """
-    Inspect uploaded file and return column headers.
-    Allows frontend to build mapping UI dynamically.
+    Parse one (already norm_str'd) `connections` cell.
+    Returns a list of (organization, connection_type, description) tuples;
+    cells that are not a JSON object/array yield [].
     """
+    # Try to parse JSON (stringified array)
     try:
-        file = request.files.get("file")
-        if not file or not getattr(file, "filename", ""):
-            return jsonify({"error": "No file uploaded."}), 400
-        
-        filename = secure_filename(file.filename or "temp.csv")
-        ext = os.path.splitext(filename)[1].lower()
-        
-        if ext not in ALLOWED_EXT:
-            return jsonify({"error": f"Unsupported extension '{ext}'. Allowed: {sorted(ALLOWED_EXT)}"}), 415
-        
-        # Save temporarily
-        temp_path = os.path.join(UPLOAD_FOLDER, f"temp_{filename}")
-        file.save(temp_path)
-        
-        # Read headers
+        data = json.loads(raw)
+    except Exception:
         try:
-            df = read_one(temp_path)
-            columns = [c for c in df.columns if c != "__source_file__"]
-            
-            # Clean up
-            os.remove(temp_path)
-            
-            return jsonify({
-                "columns": columns,
-                "row_count": len(df)
-            }), 200
-        except Exception as e:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise e
-            
-    except Exception as e:
-        import traceback, sys
+            data = json.loads(json.loads(raw))
+        except Exception:
+            return []
+
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        return []
+
+    out = []
+    for conn in data:
+        try:
+            org2 = next((conn.get(k) for k in CONNECTION_ORG_FIELDS if conn.get(k)), None)
+            if not org2:
+                continue
+            ctype = conn.get("connectionType") or conn.get("type") or ""
+            desc  = conn.get("description")   or conn.get("notes") or ""
+            out.append((str(org2), norm_str(ctype), norm_str(desc)))
+        except Exception:
+            continue
+    return out
+
+
+def extract_connections(raw) -> pd.DataFrame:
+    """
+    Column-level connections parser.
+
+    Only non-empty cells are looked at, and each distinct cell string is
+    json-parsed once. Returns one row per connection, in cell order:
+
+      row              position of the source row in `raw`
+      organization     raw organization name of the target
+      connection_type  normalized
+      description      normalized
+    """
+    cells = norm_strs(raw).to_numpy()
+    rows = np.flatnonzero((cells != "") & (cells != "[]"))
+    codes, uniques = pd.factorize(cells[rows], sort=False)
+
+    parsed = [parse_connections(u) for u in uniques]
+    counts = np.fromiter((len(p) for p in parsed), dtype=np.intp, count=len(parsed))
+    starts = np.cumsum(counts) - counts
+
+    # explode: row i with code c gets flat entries starts[c] .. starts[c] + counts[c]
+    per_row = counts[codes]
+    total = int(per_row.sum())
+    offset_in_row = np.arange(total) - np.repeat(np.cumsum(per_row) - per_row, per_row)
+    take = np.repeat(starts[codes], per_row) + offset_in_row
+
+    flat = [conn for p in parsed for conn in p]
+    cols = list(zip(*flat)) if flat else [(), (), ()]
+    return pd.DataFrame(
+        {
+            "row": np.repeat(rows, per_row),
+            "organization": np.array(cols[0], dtype=object)[take],
+            "connection_type": np.array(cols[1], dtype=object)[take],
+            "description": np.array(cols[2], dtype=object)[take],
+        }
+    )
+
+
+# ------------------ parsed-upload cache ------------------
+#
+# The same export gets uploaded again and again. Parsed frames are cached by
+# the SHA-256 of the file's bytes: an in-memory LRU in front of an on-disk
+# LRU of Feather (Arrow IPC) files, which load far faster than re-parsing
+# CSV or .xlsx. The cached frame is the sheet, or the projection of it that
+# was parsed, with stripped column names but before fillna("") (which would
+# turn every numeric column with gaps into mixed objects); read_one fills
+# it like a fresh parse.
+
+PARSE_CACHE_VERSION = 1
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's bytes, remembered while its size and mtime hold."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _digests_lock:
+        if key in _digests:
+            return _digests[key]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return remember_digest(path, h.hexdigest())
+
+
+def remember_digest(path: str, digest: str) -> str:
+    """Record a digest computed elsewhere (e.g. while receiving the upload)."""
+    st = os.stat(path)
+    with _digests_lock:
+        _digests[(os.path.abspath(path), st.st_size, st.st_mtime_ns)] = digest
+    return digest
+
+
+def stream_digest(stream) -> str:
+    """SHA-256 of a seekable stream's contents; leaves it rewound."""
+    h = hashlib.sha256()
+    for block in iter(lambda: stream.read(1 << 20), b""):
+        h.update(block)
+    stream.seek(0)
+    return h.hexdigest()
+
+
+class ParseCache:
+    """
+    Size-bounded two-level LRU of parsed upload frames, keyed by
+    "<sha256><ext>[.<columns digest>]" (see parse_key). Memory holds the most recent frames; disk keeps copies
+    (touched on every hit, oldest mtime evicted first) that survive
+    restarts and are shared by the reader processes. Disk copies are
+    Feather files; frames Arrow can't type - hand-edited workbooks often mix
+    numbers and text in one column - are pickled instead. Nothing but the
+    converter writes to the folder, so loading its pickles is safe.
+    """
+
+    FORMATS = (".feather", ".pkl")
+
+    def __init__(self, folder: str, disk_bytes: int, mem_bytes: int):
+        self.folder = folder
+        self.disk_bytes = disk_bytes
+        self.mem_bytes = mem_bytes
+        self._feather = importlib.util.find_spec("pyarrow") is not None
+        self._mem = OrderedDict()
+        self._mem_used = 0
+        self._lock = threading.Lock()
+        if self.disk_bytes:
+            os.makedirs(folder, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.disk_bytes or self.mem_bytes)
+
+    def _disk_path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.folder, f"{key}.v{PARSE_CACHE_VERSION}{fmt}")
+
+    def get(self, key: str):
+        """The cached frame for `key`, or None. Callers must not mutate it."""
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                return self._mem[key][0]
+        if not self.disk_bytes:
+            return None
+        for fmt in self.FORMATS:
+            path = self._disk_path(key, fmt)
+            try:
+                df = pd.read_feather(path) if fmt == ".feather" else pd.read_pickle(path)
+                os.utime(path)
+            except FileNotFoundError:
+                continue
+            except Exception:
+                # truncated, or written by an incompatible version: re-parse
+                self._remove(path)
+                continue
+            self._remember(key, df)
+            return df
+        return None
+
+    def put(self, key: str, df: pd.DataFrame):
+        self._remember(key, df)
+        if self.disk_bytes:
+            self._write(key, df)
+
+    @staticmethod
+    def _size(df) -> int:
+        return int(df.memory_usage(index=True, deep=True).sum())
+
+    def _remember(self, key, df):
+        if not self.mem_bytes:
+            return
+        size = self._size(df)
+        if size > self.mem_bytes:
+            return
+        with self._lock:
+            if key in self._mem:
+                self._mem_used -= self._mem.pop(key)[1]
+            self._mem[key] = (df, size)
+            self._mem_used += size
+            while self._mem_used > self.mem_bytes:
+                self._mem_used -= self._mem.popitem(last=False)[1][1]
+
+    def _write(self, key, df):
+        for fmt in (f for f in self.FORMATS if self._feather or f != ".feather"):
+            path = self._disk_path(key, fmt)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                if fmt == ".feather":
+                    df.to_feather(tmp)
+                else:
+                    # also takes the PartialCache's (partial, rows) entries
+                    pd.to_pickle(df, tmp)
+                os.replace(tmp, path)
+            except Exception:
+                self._remove(tmp)
+                continue
+            self._evict_disk()
+            return
+
+    def _evict_disk(self):
+        entries = []
+        with os.scandir(self.folder) as it:
+            for e in it:
+                if e.name.endswith(self.FORMATS):
+                    try:
+                        st = e.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime_ns, st.st_size, e.path))
+        used = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if used <= self.disk_bytes:
+                break
+            self._remove(path)
+            used -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+PARSE_CACHE = ParseCache(
+    os.path.join(CACHE_FOLDER, "parsed"),
+    disk_bytes=PARSE_CACHE_DISK_MB << 20,
+    mem_bytes=PARSE_CACHE_MEM_MB << 20,
+)
+
+
+class PartialCache(ParseCache):
+    """
+    The same two-level LRU for per-file partial aggregates (see map_files),
+    pickled as (partial, rows read), keyed by partial_key().
+    """
+
+    FORMATS = (".pkl",)
+
+    @staticmethod
+    def _size(entry) -> int:
+        return sum(int(t.memory_usage(index=True, deep=True).sum()) for t in entry[0].tables.values())
+
+
+PARTIAL_CACHE = PartialCache(
+    os.path.join(CACHE_FOLDER, "partials"),
+    disk_bytes=PARTIAL_CACHE_DISK_MB << 20,
+    mem_bytes=PARTIAL_CACHE_MEM_MB << 20,
+)
+
+
+# ------------------ reading files ------------------
+
+# .xlsx engines in order of preference. calamine (pip install python-calamine)
+# parses workbooks several times faster than openpyxl; openpyxl is always
+# there as the fallback.
+EXCEL_ENGINES = ("calamine", "openpyxl")
+EXCEL_ENGINE_MODULES = {"calamine": "python_calamine", "openpyxl": "openpyxl"}
+
+_excel_engines = None
+
+
+def excel_engines() -> list:
+    """
+    Installed .xlsx engines to try, best first. CONVERTER_EXCEL_ENGINE pins
+    one engine (e.g. "openpyxl" to rule out a reader difference).
+    """
+    global _excel_engines
+    if _excel_engines is None:
+        pinned = os.environ.get("CONVERTER_EXCEL_ENGINE", "").lower().strip()
+        names = [pinned] if pinned else EXCEL_ENGINES
+        _excel_engines = [
+            e for e in names
+            if e in EXCEL_ENGINE_MODULES and importlib.util.find_spec(EXCEL_ENGINE_MODULES[e])
+        ]
+        if not _excel_engines:
+            raise RuntimeError(f"No .xlsx reader available (tried {list(names)}); install openpyxl.")
+    return _excel_engines
+
+
+def read_excel(path, usecols=None, nrows=None):
+    """
+    (frame, engine) for a workbook (a path or file object), trying each
+    engine in excel_engines(). A workbook the fast engine can't handle is
+    retried with the next one.
+    """
+    engines = excel_engines()
+    for i, engine in enumerate(engines):
+        try:
+            if hasattr(path, "seek"):
+                path.seek(0)
+            return pd.read_excel(path, usecols=usecols, nrows=nrows, engine=engine), engine
+        except Exception:
+            if i == len(engines) - 1:
+                raise
+
+
+def _parse(path: str, ext: str, usecols=None):
+    if ext == ".csv":
+        return pd.read_csv(path, usecols=usecols), "csv"
+    if ext == ".xlsx":
+        return read_excel(path, usecols=usecols)
+    raise RuntimeError(f"Unsupported file type: {ext} (only .csv, .xlsx)")
+
+
+def parse_key(path: str, usecols=None) -> str:
+    """
+    PARSE_CACHE key of read_one(path, usecols): the file's contents, plus
+    the set of column names asked for when the parse is projected.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    key = file_digest(path) + ext
+    if usecols is None:
+        return key
+    names = "\0".join(sorted({str(c).strip() for c in usecols}))
+    return f"{key}.{hashlib.sha256(names.encode()).hexdigest()[:16]}"
+
+
+def _project(df: pd.DataFrame, keep) -> pd.DataFrame:
+    mask = [bool(keep(c)) for c in df.columns]
+    # like pandas, a projection that keeps no column keeps no rows
+    return df.loc[:, mask] if any(mask) else df.iloc[:0, :0]
+
+
+def read_one(path: str, usecols=None) -> pd.DataFrame:
+    """
+    One upload as a frame with stripped column names and gaps filled with
+    "". `usecols` (column names, compared stripped) limits which columns
+    are parsed at all; a projected parse is cached under its own key.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in (".csv", ".xlsx"):
+        raise RuntimeError(f"Unsupported file type: {ext} (only .csv, .xlsx)")
+    keep = None
+    if usecols is not None:
+        wanted = {str(c).strip() for c in usecols}
+        keep = lambda c: str(c).strip() in wanted
+
+    if not PARSE_CACHE.enabled:
+        df, reader = _parse(path, ext, keep)
+        df = df.rename(columns=lambda c: str(c).strip())
+    else:
+        key = parse_key(path, usecols)
+        df, reader = PARSE_CACHE.get(key), "cache"
+        if df is None and keep is not None:
+            # a whole sheet cached earlier (read_header's fallback for a
+            # workbook without a used range) covers every projection
+            df = PARSE_CACHE.get(parse_key(path))
+            df = None if df is None else _project(df, keep)
+        METRICS.inc("converter_parse_cache_requests_total", result="miss" if df is None else "hit")
+        if df is None:
+            df, reader = _parse(path, ext, keep)
+            df = df.rename(columns=lambda c: str(c).strip())
+            PARSE_CACHE.put(key, df)
+
+    df = df.fillna("")
+    df["__source_file__"] = os.path.basename(path)
+    # which parser produced the frame, reported per file by map_files
+    df.attrs["reader"] = reader
+    return df
+
+
+def _check_paths(paths):
+    for p in paths:
+        if not _allowed(p):
+            raise RuntimeError(f"Unsupported extension for '{p}'. Allowed: {sorted(ALLOWED_EXT)}")
+        if not os.path.exists(p):
+            raise RuntimeError(f"File not found: {p}")
+    if not paths:
+        raise RuntimeError("No readable files given.")
+
+
+_read_pool = None
+_read_pool_workers = 0
+_read_pool_lock = threading.Lock()
+
+
+def _get_read_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    One shared pool per server process, so concurrent requests can't fork
+    more than `workers` readers between them. Spawned rather than forked:
+    the Flask server may be running other threads.
+    """
+    global _read_pool, _read_pool_workers
+    with _read_pool_lock:
+        if _read_pool is None or _read_pool_workers != workers:
+            if _read_pool is not None:
+                _read_pool.shutdown(wait=False)
+            _read_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _read_pool_workers = workers
+        return _read_pool
+
+
+def _drop_read_pool():
+    global _read_pool
+    with _read_pool_lock:
+        _read_pool = None
+
+
+# ------------------ chunked reading ------------------
+#
+# Conversions never build one merged frame. They need the merged header up
+# front, then read each file on its own (streaming: a block of rows at a
+# time).
+
+CSV_CHUNK_ROWS = 100_000
+
+
+def read_header(path: str) -> list:
+    """
+    Column names read_one(path) would produce, without reading the rows.
+
+    A workbook's header row comes from openpyxl, which streams the sheet
+    and stops after it (calamine parses the whole sheet first). Data cells
+    past the header's last name add "Unnamed: n" columns, so the header is
+    padded to the sheet's used range; this may name a few more columns than
+    the rows fill, which is harmless as nothing maps them unasked.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext != ".xlsx":
+        cols = pd.read_csv(path, nrows=0).columns
+        return [str(c).strip() for c in cols] + ["__source_file__"]
+    width = xlsx_width(path)
+    if width is None:
+        # no used range recorded: only the rows tell
+        return list(read_one(path).columns)
+    cols = [str(c).strip() for c in pd.read_excel(path, nrows=0, engine="openpyxl").columns]
+    cols += [f"Unnamed: {i}" for i in range(len(cols), width)]
+    return cols + ["__source_file__"]
+
+
+def union_columns(paths) -> list:
+    """The union of the files' headers, sorted: what column resolution sees."""
+    all_cols = set()
+    for p in paths:
+        all_cols |= set(read_header(p))
+    return sorted(all_cols)
+
+
+def _chunk_kind(s: pd.Series) -> str:
+    if s.isna().all():
+        return "empty"
+    if s.dtype == object:
+        return "b" if pd.api.types.infer_dtype(s, skipna=True) == "boolean" else "O"
+    return s.dtype.kind
+
+
+def _whole_file_dtype(kinds: set):
+    """
+    The dtype pd.read_csv would have inferred for a whole column, given the
+    kinds inferred chunk by chunk. None means per-chunk inference already
+    gives the same strings.
+    """
+    seen = kinds - {"empty"}
+    if not seen or seen == {"b"}:
+        return None
+    if seen <= {"i", "f"}:
+        return "int64" if seen == {"i"} and "empty" not in kinds else "float64"
+    # anything that failed numeric inference somewhere is text everywhere
+    return str
+
+
+def iter_chunks(path: str, usecols=None, chunksize=CSV_CHUNK_ROWS):
+    """
+    Yield (row_offset, frame) blocks of one upload. Concatenated, the frames
+    equal read_one(path) restricted to `usecols` (stripped names).
+
+    .xlsx files can't be read in pieces and come back as a single block.
+    CSVs that span several chunks are read twice: a first pass settles each
+    column's dtype over the whole file (so "1" doesn't come out as "1" in one
+    chunk and "1.0" in the next), the second pass reads with those dtypes.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    name = os.path.basename(path)
+
+    def finish(df):
+        df = df.rename(columns=lambda c: str(c).strip())
+        df.fillna("", inplace=True)
+        df["__source_file__"] = name
+        return df
+
+    if ext != ".csv":
+        yield 0, read_one(path, usecols=usecols)
+        return
+
+    header = pd.read_csv(path, nrows=0).columns
+    wanted = [c for c in header if usecols is None or str(c).strip() in usecols]
+
+    reader = pd.read_csv(path, usecols=wanted, chunksize=chunksize)
+    first = next(reader, None)
+    second = next(reader, None)
+    if second is None:
+        # fits in one chunk: this already is the whole-file read
+        yield 0, finish(first if first is not None else pd.read_csv(path, usecols=wanted))
+        return
+
+    kinds = {c: set() for c in wanted}
+    for chunk in (first, second, *reader):
+        for c in wanted:
+            kinds[c].add(_chunk_kind(chunk[c]))
+    dtypes = {c: dt for c, dt in ((c, _whole_file_dtype(k)) for c, k in kinds.items()) if dt is not None}
+
+    offset = 0
+    for chunk in pd.read_csv(path, usecols=wanted, dtype=dtypes, chunksize=chunksize):
+        yield offset, finish(chunk)
+        offset += len(chunk)
+
+
+# ------------------ column profiling ------------------
+#
+# What /inspect tells the mapping UI about each column, from a bounded
+# sample of the rows: distinct values (HyperLogLog), null rate, most common
+# values and the kind of data. Memory per column is fixed however many rows
+# are profiled.
+
+PROFILE_TOP_K = 5
+# values remembered per column for the type guess
+PROFILE_TYPE_SAMPLE = 200
+# distinct values tracked per column for the top-k before pruning
+PROFILE_TOP_TRACK = 5000
+
+
+class HyperLogLog:
+    """Distinct-count sketch: 2**p one-byte registers, about 1.04 / sqrt(2**p) error."""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def add(self, values: pd.Series):
+        if not len(values):
+            return
+        h = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        bucket = (h >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = h & np.uint64((1 << (64 - self.p)) - 1)
+        # rank = position of the leftmost 1 bit in the remaining 64 - p bits
+        rank = (64 - self.p + 1 - np.frexp(rest.astype(np.float64))[1]).astype(np.uint8)
+        np.maximum.at(self.registers, bucket, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * np.log(m / zeros)))  # small range: linear counting
+        return int(round(raw))
+
+
+def infer_type(values: pd.Series) -> str:
+    """integer / number / boolean / date / text (or empty) for a sample of non-null values."""
+    if not len(values):
+        return "empty"
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    if kind in ("datetime", "datetime64", "date"):
+        return "date"
+    if kind == "boolean":
+        return "boolean"
+    if kind not in ("integer", "floating", "mixed-integer-float", "decimal"):
+        text = values.astype(str).str.strip()
+        if text.str.lower().isin({"true", "false", "yes", "no"}).all():
+            return "boolean"
+        numbers = pd.to_numeric(text, errors="coerce")
+        if numbers.notna().all():
+            values = numbers
+        elif pd.to_datetime(text, errors="coerce", format="mixed").notna().mean() >= 0.9:
+            return "date"
+        else:
+            return "text"
+    numbers = pd.to_numeric(values, errors="coerce")
+    return "integer" if (numbers % 1 == 0).all() else "number"
+
+
+class ColumnProfile:
+    """Running profile of one column, fed a batch of rows at a time."""
+
+    def __init__(self):
+        self.rows = 0
+        self.nulls = 0
+        self.hll = HyperLogLog()
+        self.top = Counter()
+        self.type_sample = []
+
+    def add(self, values: pd.Series):
+        # everything below only needs each distinct value once
+        counts = values.value_counts()
+        # unnamed: groupby(level=0) would look an integer name up as a position
+        counts.index = counts.index.astype(str).str.strip().rename(None)
+        counts = counts[counts.index != ""].groupby(level=0).sum()
+        self.rows += len(values)
+        self.nulls += len(values) - int(counts.sum())
+        self.hll.add(counts.index.to_series())
+        self.top.update(counts.to_dict())
+        if len(self.top) > PROFILE_TOP_TRACK:
+            self.top = Counter(dict(self.top.most_common(PROFILE_TOP_TRACK // 5)))
+        if len(self.type_sample) < PROFILE_TYPE_SAMPLE:
+            self.type_sample += counts.index[:PROFILE_TYPE_SAMPLE - len(self.type_sample)].tolist()
+
+    def result(self, name: str) -> dict:
+        return {
+            "column": name,
+            "type": infer_type(pd.Series(self.type_sample, dtype=object)),
+            "null_rate": round(self.nulls / self.rows, 4) if self.rows else None,
+            "distinct_estimate": self.hll.estimate(),
+            "top": [{"value": v, "count": n} for v, n in self.top.most_common(PROFILE_TOP_K)],
+        }
+
+
+# Logical names the mapping UI offers (build_graph_from_responses' inputs)
+# and header words that suggest them, strongest first.
+MAPPING_HINTS = {
+    "orgName": ("orgname", "organization", "organisation", "company", "org"),
+    "eventId": ("eventid", "conferenceid", "event_id"),
+    "eventName": ("eventname", "conferencename", "event", "conference"),
+    "eventDate": ("eventdate", "conferencedate", "date"),
+    "sector": ("sector", "industry", "category"),
+    "addressCity": ("addresscity", "city", "town"),
+    "addressState": ("addressstate", "state", "province"),
+    "addressCountry": ("addresscountry", "country"),
+}
+
+
+def suggest_mapping(profile: list) -> dict:
+    """
+    Logical name -> column, from header names and the profile: an exact
+    name beats a hint word in the name, date columns are preferred for
+    eventDate, and a column is suggested for one logical name at most.
+    """
+    candidates = []
+    for col in profile:
+        if col["type"] == "empty":
+            continue
+        key = re.sub(r"[^a-z0-9]", "", col["column"].lower())
+        for logical, hints in MAPPING_HINTS.items():
+            if key == logical.lower():
+                score = 10
+            elif len(key) > 30:
+                score = 0  # a sentence (e.g. a title row read as the header), not a field name
+            else:
+                score = max((len(hints) - i for i, h in enumerate(hints) if h.replace("_", "") in key), default=0)
+            if logical == "eventDate" and col["type"] == "date":
+                score += 2
+            elif logical == "eventDate" and score and col["type"] in ("integer", "number", "boolean"):
+                score = 0
+            if score:
+                candidates.append((score, logical, col["column"]))
+
+    mapping = {}
+    for score, logical, column in sorted(candidates, key=lambda c: -c[0]):
+        if logical not in mapping and column not in mapping.values():
+            mapping[logical] = column
+    return {logical: mapping[logical] for logical in MAPPING_HINTS if logical in mapping}
+
+
+class FrameProfiler:
+    """Column profiles of a table seen in batches (columns by position)."""
+
+    def __init__(self):
+        self.columns = []
+        self.rows = 0
+
+    def add(self, df: pd.DataFrame):
+        while len(self.columns) < df.shape[1]:
+            self.columns.append(ColumnProfile())
+        for i in range(df.shape[1]):
+            self.columns[i].add(df.iloc[:, i])
+        self.rows += len(df)
+
+    def result(self, names) -> list:
+        return [
+            (self.columns[i] if i < len(self.columns) else ColumnProfile()).result(name)
+            for i, name in enumerate(names)
+        ]
+
+
+# ------------------ upload inspection ------------------
+#
+# /inspect only needs the header, a few sample rows and a row count, so it
+# reads them straight off the request body as it arrives instead of saving
+# and parsing the whole upload.
+
+INSPECT_SAMPLE_ROWS = 5
+# most of a CSV kept for the header and sample rows
+INSPECT_HEAD_BYTES = 1 << 20
+# CSV bytes parsed for the column profile, in blocks spread over the file
+PROFILE_CSV_BYTES = 8 << 20
+# workbook rows parsed for the column profile
+PROFILE_XLSX_ROWS = 50_000
+# sampled CSV records are parsed in batches of about this many bytes
+PROFILE_BATCH_BYTES = 1 << 20
+
+
+# bytes a line may consist of and still be skipped as blank by pd.read_csv
+_BLANK_BYTES = np.zeros(256, dtype=bool)
+_BLANK_BYTES[list(b" \t\r\n")] = True
+
+
+def _unquoted_newlines(data: bytes, in_quotes: bool) -> np.ndarray:
+    """Positions of the newlines in data that end a CSV record (not inside quotes)."""
+    buf = np.frombuffer(data, np.uint8)
+    inside = (np.cumsum(buf == ord('"')) + in_quotes) % 2 == 1
+    return np.flatnonzero((buf == ord("\n")) & ~inside)
+
+
+class CsvScan:
+    """
+    One pass over a CSV's bytes: keeps the first records, counts all of
+    them (except blank lines, which pandas skips too), and profiles the
+    records of blocks sampled evenly over the file (all of them when it is
+    under PROFILE_CSV_BYTES; `size` is the expected length, if known).
+    """
+
+    def __init__(self, size=None):
+        self.size = size
+        self.head = bytearray()
+        self.records = 0
+        self.in_quotes = False
+        self.filled = False  # the unfinished record has a non-blank byte
+        self.pos = 0
+        self.ncols = None
+        self.profiler = FrameProfiler()
+        self.profiled = 0
+        self.pending = []  # sampled records not parsed yet
+        self.carry = None  # unfinished last record of the previous block, if profiled
+
+    def feed(self, data: bytes):
+        if not data:
+            return
+        if len(self.head) < INSPECT_HEAD_BYTES:
+            self.head += data[:INSPECT_HEAD_BYTES - len(self.head)]
+        if self.ncols is None:
+            self._read_header()
+
+        quotes = data.count(b'"')
+        if self._wants():
+            ends = _unquoted_newlines(data, self.in_quotes)
+            self._profile(data, ends)
+        else:
+            self.carry = None
+            if not quotes and not self.in_quotes:
+                ends = np.flatnonzero(np.frombuffer(data, np.uint8) == ord("\n"))
+            else:
+                ends = _unquoted_newlines(data, self.in_quotes)
+        self._count(data, ends)
+        self.in_quotes ^= quotes % 2 == 1
+        self.pos += len(data)
+
+    def _count(self, data: bytes, ends: np.ndarray):
+        # non-blank bytes up to each position; a record ending here counts
+        # if it has any (the first one also if its start, in an earlier
+        # block, had some)
+        filled = np.cumsum(~_BLANK_BYTES[np.frombuffer(data, np.uint8)])
+        per_record = np.diff(filled[ends], prepend=0)
+        if len(ends):
+            per_record[0] += self.filled
+            self.filled = bool(filled[-1] > filled[ends[-1]])
+        else:
+            self.filled = self.filled or bool(filled[-1])
+        self.records += int(np.count_nonzero(per_record))
+
+    def _read_header(self):
+        ends = _unquoted_newlines(bytes(self.head), False)
+        if len(ends):
+            self.ncols = len(pd.read_csv(io.BytesIO(bytes(self.head[:ends[0] + 1])), nrows=0).columns)
+
+    def _wants(self) -> bool:
+        """Profile the next block? Keeps the profiled share of what was read even."""
+        if self.ncols is None:
+            return False
+        if not self.size or self.size <= PROFILE_CSV_BYTES:
+            return self.profiled < PROFILE_CSV_BYTES
+        return self.profiled * self.size <= self.pos * PROFILE_CSV_BYTES
+
+    def _profile(self, data: bytes, ends: np.ndarray):
+        # whole records only: continue the previous block's last record, or
+        # start after the first record end (which skips the header too)
+        if self.carry is not None:
+            data, ends = self.carry + data, ends + len(self.carry)
+            start = 0
+        else:
+            start = ends[0] + 1 if len(ends) else len(data)
+        stop = ends[-1] + 1 if len(ends) else start
+        self.carry = data[max(start, stop):]
+        self._parse(data[start:stop])
+
+    def _parse(self, piece: bytes, flush=False):
+        if piece.strip():
+            self.profiled += len(piece)
+            self.pending.append(piece)
+        if not self.pending or (not flush and sum(map(len, self.pending)) < PROFILE_BATCH_BYTES):
+            return
+        batch, self.pending = b"".join(self.pending), []
+        try:
+            rows = pd.read_csv(io.BytesIO(batch), header=None, names=range(self.ncols), dtype=str, index_col=False)
+        except (pd.errors.ParserError, UnicodeDecodeError, ValueError):
+            return  # a malformed batch doesn't spoil the rest of the profile
+        self.profiler.add(rows)
+
+    def result(self) -> dict:
+        # the last line may lack a line break
+        self._parse(self.carry or b"", flush=True)
+        head = bytes(self.head)
+        ends = _unquoted_newlines(head, False)
+        if len(ends) > INSPECT_SAMPLE_ROWS:
+            head = head[:ends[INSPECT_SAMPLE_ROWS] + 1]
+        sample = pd.read_csv(io.BytesIO(head), nrows=INSPECT_SAMPLE_ROWS)
+        # records = non-blank lines, plus an unterminated last line; minus the header
+        records = self.records + self.filled
+        return _inspection(sample, max(records - 1, 0), "csv", self.profiler)
+
+
+class XlsxScan:
+    """
+    Collects a workbook in memory; its size comes from the sheet metadata,
+    the profile from its first PROFILE_XLSX_ROWS rows.
+    """
+
+    def __init__(self, size=None):
+        self.data = io.BytesIO()
+
+    def feed(self, data: bytes):
+        self.data.write(data)
+
+    def result(self) -> dict:
+        rows, engine = read_excel(self.data, nrows=PROFILE_XLSX_ROWS)
+        profiler = FrameProfiler()
+        profiler.add(rows)
+        first, last = xlsx_row_span(self.data)
+        return _inspection(rows.head(INSPECT_SAMPLE_ROWS), max(last - first, 0), engine, profiler)
+
+
+def _inspection(sample: pd.DataFrame, row_count: int, reader: str, profiler: FrameProfiler) -> dict:
+    sample = sample.rename(columns=lambda c: str(c).strip()).fillna("")
+    columns = list(sample.columns)
+    profile = profiler.result(columns)
+    return {
+        "columns": columns,
+        "row_count": row_count,
+        "reader": reader,
+        "sample": sample.astype(str).to_dict("records"),
+        "profile": profile,
+        "profiled_rows": profiler.rows,
+        "suggested_mapping": suggest_mapping(profile),
+    }
+
+
+def _xlsx_first_sheet(zf: zipfile.ZipFile) -> str:
+    """Path inside the package of the workbook's first sheet (the one pandas reads)."""
+    import xml.etree.ElementTree as ET
+
+    ns = {
+        "m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+        "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+        "p": "http://schemas.openxmlformats.org/package/2006/relationships",
+    }
+    sheet = ET.fromstring(zf.read("xl/workbook.xml")).find("m:sheets/m:sheet", ns)
+    rel_id = sheet.get(f"{{{ns['r']}}}id")
+    for rel in ET.fromstring(zf.read("xl/_rels/workbook.xml.rels")).findall("p:Relationship", ns):
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target")
+            return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+    raise KeyError(rel_id)
+
+
+_XLSX_DIMENSION_RE = re.compile(rb'<(?:\w+:)?dimension ref="[A-Z]*(\d+)(?::[A-Z]*(\d+))?"')
+_XLSX_ROW_RE = re.compile(rb"<(?:\w+:)?row[ >]")
+
+
+def xlsx_row_span(data) -> tuple:
+    """
+    (first, last) row numbers of the first sheet's used range, from the
+    <dimension> element at the top of the sheet. Without one, the <row>
+    elements are counted instead - still without parsing any cells.
+    """
+    with zipfile.ZipFile(data) as zf, zf.open(_xlsx_first_sheet(zf)) as f:
+        head = f.read(1 << 12)
+        m = _XLSX_DIMENSION_RE.search(head)
+        if m:
+            first = int(m.group(1))
+            return first, int(m.group(2) or first)
+        # count tags across block edges once: the overlap was counted already
+        rows, tail = len(_XLSX_ROW_RE.findall(head)), head[-64:]
+        for block in iter(lambda: f.read(1 << 20), b""):
+            chunk = tail + block
+            rows += len(_XLSX_ROW_RE.findall(chunk)) - len(_XLSX_ROW_RE.findall(tail))
+            tail = chunk[-64:]
+        return 1, rows
+
+
+_XLSX_LAST_COLUMN_RE = re.compile(rb'<(?:\w+:)?dimension ref="(?:[A-Z]+\d+:)?([A-Z]+)\d+"')
+
+
+def xlsx_width(data):
+    """
+    Columns from A to the last one of the first sheet's used range, from
+    its <dimension> element; None if the sheet has none.
+    """
+    with zipfile.ZipFile(data) as zf, zf.open(_xlsx_first_sheet(zf)) as f:
+        m = _XLSX_LAST_COLUMN_RE.search(f.read(1 << 12))
+    if not m:
+        return None
+    width = 0
+    for letter in m.group(1):
+        width = width * 26 + letter - ord("A") + 1
+    return width
+
+
+INSPECT_SCANNERS = {".csv": CsvScan, ".xlsx": XlsxScan}
+
+
+def scan_upload(stream, boundary: bytes, field: str = "file", size=None):
+    """
+    Read a multipart/form-data body from `stream` (about `size` bytes) and
+    feed the first file part named `field` to the scanner for its
+    extension, as it arrives.
+    Returns (filename, scanner); scanner is None if there is no such part
+    or its type isn't supported (the rest of the body is then not read).
+    """
+    decoder = MultipartDecoder(boundary)
+    filename = scanner = None
+    current = eof = False
+    while True:
+        event = decoder.next_event()
+        if isinstance(event, NeedData):
+            if eof:
+                break  # body ended early
+            chunk = stream.read(1 << 16)
+            eof = not chunk
+            decoder.receive_data(chunk or None)
+            continue
+        if isinstance(event, File):
+            current = scanner is None and event.name == field and bool(event.filename)
+            if current:
+                filename = secure_filename(event.filename) or "upload.csv"
+                make = INSPECT_SCANNERS.get(os.path.splitext(filename)[1].lower())
+                if make is None:
+                    return filename, None
+                scanner = make(size)
+        elif isinstance(event, Data):
+            if current:
+                scanner.feed(event.data)
+        elif isinstance(event, Epilogue):
+            break
+        else:
+            current = False
+    return filename, scanner
+
+
+# ------------------ graph builder ------------------
+
+NODE_COLUMNS = [
+    "Id", "Label", "type",
+    "org_type", "org_sector",
+    "city", "state", "country",
+    "event_date", "event_id",
+]
+
+EDGE_COLUMNS = [
+    "Source", "Target", "edge_type",
+    "event_id", "event_date",
+    "connection_type", "description",
+    "weight",
+]
+
+# Partial aggregates remember where each value was first seen so that they
+# can be merged in any grouping and still agree with a single pass over the
+# merged frame. A position is (file number << FILE_POS_SHIFT) + row in file.
+FILE_POS_SHIFT = 40
+NO_POS = np.iinfo(np.int64).max
+
+# columns the labels, first values and modes come from, resolved like the
+# key columns: through `mapping`, else case-insensitively
+RAW_FIELDS = (
+    "orgname", "sector",
+    "eventid", "eventname", "eventdate",
+    "addresscity", "addressstate", "addresscountry",
+    "connections",
+)
+
+# first non-empty value per group
+FIRST_FIELDS = {
+    "event": ("eventid", "eventname", "eventdate", "addresscity", "addressstate", "addresscountry"),
+    "event_sector": ("eventid", "eventdate"),
+    "sector_org": ("eventid", "eventdate"),
+}
+
+# most common non-empty value per org
+ORG_MODE_FIELDS = ("orgname", "sector", "addresscity", "addressstate", "addresscountry")
+
+
+def _sum_weights(edges: pd.DataFrame, keys) -> pd.DataFrame:
+    return edges.groupby(keys, dropna=False)["weight"].sum().reset_index()
+
+
+def _table(parts, columns) -> pd.DataFrame:
+    """Concatenate partial tables; int columns stay int64 even when empty."""
+    parts = [p for p in parts if len(p)]
+    frame = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+    return frame.astype({c: "int64" for c in ("count", "pos", "src_pos", "dst_pos", "weight") if c in frame.columns})
+
+
+def mapping_fields(mapping) -> dict:
+    """
+    Logical name -> column from a `mapping`, with the logical names
+    lowercased: the upload panel and suggest_mapping send orgName, eventId,
+    addressCity, ..., the resolvers look up orgname, eventid, addresscity.
+    """
+    return {
+        str(name).lower(): column for name, column in (mapping or {}).items()
+        if name != "extraAttrs" and isinstance(column, str)
+    }
+
+
+def resolve_response_columns(columns, mapping=None) -> dict:
+    """
+    Work out, from a header alone, which columns build_graph_from_responses
+    reads:
+
+      mapped       orgname / sector / eventid / eventname / eventdate, taken
+                   from `mapping` when it names an existing column, else
+                   matched case-insensitively
+      raw          RAW_FIELDS, resolved the same way (None if absent)
+      extra_attrs  mapping["extraAttrs"]
+      columns      the full header
+    """
+    mapping = mapping or {}
+    fields = mapping_fields(mapping)
+    columns = list(columns)
+    # map lowercase -> actual name
+    cols_lower = {c.lower(): c for c in columns}
+
+    def col(name, required=False):
+        # 1) Check if user provided a mapping for this logical name
+        user_col = fields.get(name)
+        if user_col and user_col in columns:
+            return user_col
+
+        # 2) Fallback to old behavior (canonical name matching)
+        key = name.lower()
+        if key in cols_lower:
+            return cols_lower[key]
+        if required:
+            raise RuntimeError(
+                f"Required column '{name}' not found. "
+                f"Available columns: {columns}"
+            )
+        return None
+
+    mapped = {}
+    mapped["orgname"]   = col("orgname",   required=True)
+    mapped["sector"]    = col("sector")
+    mapped["eventid"]   = col("eventid",   required=True)
+    mapped["eventname"] = col("eventname", required=True)
+    mapped["eventdate"] = col("eventdate", required=True)
+
+    return {
+        "mapped": mapped,
+        "raw": {name: col(name) for name in RAW_FIELDS},
+        "extra_attrs": list(mapping.get("extraAttrs", [])),
+        "columns": columns,
+    }
+
+
+def response_columns_needed(cols: dict) -> list:
+    """Every actual column a ResponseAggregate will look at."""
+    needed = list(cols["mapped"].values()) + list(cols["raw"].values())
+    needed += [a for a in cols["extra_attrs"] if a in cols["columns"]]
+    return list(dict.fromkeys(c for c in needed if c is not None))
+
+
+class ResponseAggregate:
+    """
+    Mergeable partial state behind build_graph_from_responses.
+
+    from_frame() reduces a block of rows to the tables below, combine()
+    merges partials (associative; earlier positions win ties), and
+    to_graph() turns the result into nodes_df / edges_df - the same output
+    as one pass over the merged frame.
+
+      sizes    scope, k1, k2 -> count          rows per event / sector / org /
+                                               event_sector / sector_org group
+      firsts   scope, k1, k2, field -> value, pos
+                                               first non-empty value (FIRST_FIELDS),
+                                               plus connection-target stub labels
+      modes    scope, k1, field, value -> count, pos
+                                               value counts for most_common_non_empty
+      members  distinct (event, sector, org) keys, for event_sector weights
+      edges    attendance + connection edges, weight summed
+
+    Empty keys are dropped as soon as they can no longer matter.
+    """
+
+    TABLES = {
+        "sizes": ["scope", "k1", "k2", "count"],
+        "firsts": ["scope", "k1", "k2", "field", "value", "pos"],
+        "modes": ["scope", "k1", "field", "value", "count", "pos"],
+        "members": ["k1", "k2", "k3"],
+        "edges": EDGE_COLUMNS,
+    }
+    # the columns combine() groups each table by
+    KEYS = {
+        "sizes": ["scope", "k1", "k2"],
+        "firsts": ["scope", "k1", "k2", "field"],
+        "modes": ["scope", "k1", "field", "value"],
+        "members": ["k1", "k2", "k3"],
+        "edges": EDGE_COLUMNS[:-1],
+    }
+
+    def __init__(self, cols: dict, tables: dict):
+        self.cols = cols
+        self.tables = tables
+
+    # ---------- map ----------
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, cols: dict, first_pos: int = 0):
+        lap = section_timer("responses.map")
+        n = len(df)
+        pos = first_pos + np.arange(n, dtype=np.int64)
+        blank = pd.Series([""] * n, index=df.index)
+
+        def mapped(name):
+            c = cols["mapped"][name]
+            return df[c] if c is not None else blank
+
+        def raw(name):
+            c = cols["raw"][name]
+            return df[c] if c is not None else None
+
+        # Canonical keys
+        org_key    = canonical_keys(mapped("orgname")).to_numpy()
+        event_key  = canonical_keys(mapped("eventid")).to_numpy()
+        event_key  = np.where(event_key != "", event_key, canonical_keys(mapped("eventname")).to_numpy())
+        sector_key = canonical_keys(mapped("sector")).to_numpy()
+        lap("keys")
+
+        # every grouping below shares these codes: each key column is
+        # factorized once and the pairs are crossed from them
+        by_event  = GroupIndex.of(event_key)
+        by_sector = GroupIndex.of(sector_key)
+        by_org    = GroupIndex.of(org_key)
+        grouped = {
+            "event": by_event,
+            "sector": by_sector,
+            "org": by_org,
+            "event_sector": by_event.cross(by_sector),
+            "sector_org": by_sector.cross(by_org),
+        }
+        lap("factorize")
+
+        sizes, firsts, modes = [], [], []
+        for scope, groups in grouped.items():
+            k1 = groups.keys[0]
+            k2 = groups.keys[1] if len(groups.keys) > 1 else np.full(groups.n, "", dtype=object)
+            named = (k1 != "") & (k2 != "") if len(groups.keys) > 1 else k1 != ""
+
+            sizes.append(pd.DataFrame({"scope": scope, "k1": k1[named], "k2": k2[named], "count": groups.size()[named]}))
+
+            for field in FIRST_FIELDS.get(scope, ()):
+                values = raw(field)
+                if values is None:
+                    continue
+                vals, at = groups.first_non_empty(values, return_rows=True)
+                hit = named & (at >= 0)
+                firsts.append(pd.DataFrame({
+                    "scope": scope, "k1": k1[hit], "k2": k2[hit],
+                    "field": field, "value": vals[hit], "pos": pos[at[hit]],
+                }))
+        lap("group_sizes_firsts")
+
+        mode_inputs = [("sector", by_sector, "sector", raw("sector"))]
+        mode_inputs += [("org", by_org, field, raw(field)) for field in ORG_MODE_FIELDS]
+        mode_inputs += [("org_extra", by_org, attr, df[attr]) for attr in cols["extra_attrs"] if attr in cols["columns"]]
+        for scope, groups, field, values in mode_inputs:
+            if values is None:
+                continue
+            g, vals, counts, at = groups.value_counts_non_empty(values)
+            keys = groups.keys[0][g]
+            named = keys != ""
+            modes.append(pd.DataFrame({
+                "scope": scope, "k1": keys[named], "field": field,
+                "value": vals[named], "count": counts[named], "pos": pos[at[named]],
+            }))
+        lap("group_modes")
+
+        ek, sk, ok = grouped["event_sector"].cross(by_org).keys
+        named = (ek != "") & (sk != "")
+        members = pd.DataFrame({"k1": ek[named], "k2": sk[named], "k3": ok[named]})
+        lap("group_members")
+
+        # ---------- ATTENDANCE EDGES (org -> event) ----------
+        org_ids = key_ids(org_key, "org").to_numpy()
+        event_ids = key_ids(event_key, "evt").to_numpy()
+        has_both = (org_ids != "") & (event_ids != "")
+        att_df = pd.DataFrame(
+            {
+                "Source": org_ids[has_both],
+                "Target": event_ids[has_both],
+                "edge_type": "attendance",
+                "event_id": norm_strs(mapped("eventid")).to_numpy()[has_both],
+                "event_date": norm_strs(mapped("eventdate")).to_numpy()[has_both],
+                "connection_type": "",
+                "description": "",
+                "weight": 1,
+            }
+        )
+        lap("attendance_edges")
+
+        # ---------- CONNECTION EDGES (org -> org) ----------
+        conn_df = pd.DataFrame(columns=EDGE_COLUMNS)
+        if cols["raw"]["connections"] is not None:
+            def raw_or_blank(name):
+                values = raw(name)
+                return values if values is not None else blank
+
+            base_ids = key_ids(canonical_keys(raw_or_blank("orgname")), "org").to_numpy()
+            with_org = np.flatnonzero(base_ids != "")
+            conns = extract_connections(raw("connections").iloc[with_org])
+
+            rows = with_org[conns["row"].to_numpy()]
+            target_keys = canonical_keys(conns["organization"])
+            keep = (target_keys != "").to_numpy()
+            rows = rows[keep]
+            conns = conns[keep]
+
+            target_ids = key_ids(target_keys[keep], "org").to_numpy()
+            conn_df = pd.DataFrame(
+                {
+                    "Source": base_ids[rows],
+                    "Target": target_ids,
+                    "edge_type": "connection",
+                    "event_id": norm_strs(raw_or_blank("eventid")).to_numpy()[rows],
+                    "event_date": norm_strs(raw_or_blank("eventdate")).to_numpy()[rows],
+                    "connection_type": conns["connection_type"].to_numpy(),
+                    "description": conns["description"].to_numpy(),
+                    "weight": 1,
+                }
+            )
+
+            # every target org needs a node (minimal info); an org that only
+            # shows up as a target takes the label of its first mention
+            stubs = pd.DataFrame(
+                {
+                    "scope": "stub",
+                    "k1": target_ids,
+                    "k2": "",
+                    "field": "label",
+                    "value": pretty_names(conns["organization"]).to_numpy(),
+                    "pos": pos[rows],
+                }
+            ).drop_duplicates("k1")
+            firsts.append(stubs)
+        lap("connection_edges")
+
+        edges = _table([att_df, conn_df], EDGE_COLUMNS)
+        tables = {
+            "sizes": _table(sizes, cls.TABLES["sizes"]),
+            "firsts": _table(firsts, cls.TABLES["firsts"]),
+            "modes": _table(modes, cls.TABLES["modes"]),
+            "members": _table([members], cls.TABLES["members"]),
+            "edges": _sum_weights(edges, EDGE_COLUMNS[:-1]) if len(edges) else edges,
+        }
+        lap("tables")
+        return cls(cols, tables)
+
+    # ---------- reduce ----------
+
+    @classmethod
+    def combine(cls, parts):
+        """Merge partial aggregates built with the same resolved columns."""
+        lap = section_timer("responses")
+        parts = list(parts)
+        t = {name: _table([p.tables[name] for p in parts], columns) for name, columns in cls.TABLES.items()}
+        t["sizes"] = t["sizes"].groupby(["scope", "k1", "k2"], as_index=False, sort=False)["count"].sum()
+        t["firsts"] = t["firsts"].sort_values("pos", kind="stable").drop_duplicates(["scope", "k1", "k2", "field"])
+        t["modes"] = (
+            t["modes"]
+            .groupby(["scope", "k1", "field", "value"], as_index=False, sort=False)
+            .agg(count=("count", "sum"), pos=("pos", "min"))
+        )
+        t["members"] = t["members"].drop_duplicates()
+        t["edges"] = _sum_weights(t["edges"], EDGE_COLUMNS[:-1]) if len(t["edges"]) else t["edges"]
+        combined = cls(parts[0].cols, {name: _table([frame], cls.TABLES[name]) for name, frame in t.items()})
+        lap("combine")
+        return combined
+
+    def shifted(self, offset: int) -> "ResponseAggregate":
+        """The same partial, for rows `offset` positions further down the upload."""
+        t = dict(self.tables)
+        for name in ("firsts", "modes"):
+            t[name] = t[name].assign(pos=t[name]["pos"] + offset)
+        return type(self)(self.cols, t)
+
+    def with_tables(self, tables: dict) -> "ResponseAggregate":
+        """The same resolved columns over other tables."""
+        return type(self)(self.cols, tables)
+
+    # ---------- finalize ----------
+
+    def to_graph(self):
+        lap = section_timer("responses.graph")
+        t = self.tables
+        cols = self.cols
+        extra_attrs = cols["extra_attrs"]
+
+        def groups(scope):
+            # same order df.groupby(keys) would visit them in
+            g = t["sizes"][t["sizes"]["scope"] == scope]
+            return g.sort_values(["k1", "k2"]).reset_index(drop=True)
+
+        def lookup(table, scope, field, g, on):
+            hit = table[(table["scope"] == scope) & (table["field"] == field)]
+            return g[on].merge(hit[on + ["value"]], on=on, how="left")["value"].fillna("").to_numpy()
+
+        def first(scope, field, g):
+            return lookup(t["firsts"], scope, field, g, ["k1", "k2"])
+
+        # Counter.most_common: highest count, ties go to the value seen first
+        best = (
+            t["modes"]
+            .sort_values(["count", "pos"], ascending=[False, True], kind="stable")
+            .drop_duplicates(["scope", "k1", "field"])
+        )
+
+        def mode(scope, field, g):
+            return lookup(best, scope, field, g, ["k1"])
+        lap("modes")
+
+        # ---------- EVENT NODES ----------
+        ev = groups("event")
+        any_eid  = first("event", "eventid", ev)
+        any_name = first("event", "eventname", ev)
+        event_df = pd.DataFrame(
+            {
+                "Id": key_ids(ev["k1"], "evt").to_numpy(),
+                "Label": pretty_names(np.where(any_name != "", any_name, any_eid)).to_numpy(),
+                "type": "event",
+                "org_type": "",
+                "org_sector": "",
+                "city": first("event", "addresscity", ev),
+                "state": first("event", "addressstate", ev),
+                "country": first("event", "addresscountry", ev),
+                "event_date": first("event", "eventdate", ev),
+                "event_id": any_eid,
+            },
+            columns=NODE_COLUMNS,
+        )
+        lap("event_nodes")
+
+        # ---------- SECTOR NODES (NEW 3-LAYER STRUCTURE) ----------
+        # Create sector nodes with CLEAN labels (not slugified): the most
+        # common spelling in the sector column, or the key if there is none
+        sec = groups("sector")
+        if cols["raw"]["sector"] is not None:
+            clean_sector_names = mode("sector", "sector", sec)
+        else:
+            clean_sector_names = sec["k1"].to_numpy()
+        sector_df = pd.DataFrame(
+            {
+                "Id": key_ids(sec["k1"], "sector").to_numpy(),  # ID is slugified
+                "Label": clean_sector_names,                     # Label is CLEAN (e.g., "Robotics", "NLP")
+                "type": "sector",
+            },
+            columns=NODE_COLUMNS,
+        ).fillna("")[clean_sector_names != ""].reset_index(drop=True)
+        lap("sector_nodes")
+
+        # ---------- ORG NODES ----------
+        org = groups("org")
+        org_labels = mode("org", "orgname", org)
+        org_attrs = {
+            "Id": key_ids(org["k1"], "org").to_numpy(),
+            "Label": pretty_names(np.where(org_labels != "", org_labels, org["k1"].to_numpy())).to_numpy(),
+            "type": "org",
+            "org_type": "",
+            "org_sector": mode("org", "sector", org),
+            "city": mode("org", "addresscity", org),
+            "state": mode("org", "addressstate", org),
+            "country": mode("org", "addresscountry", org),
+            "event_date": "",
+            "event_id": "",
+        }
+        for attr in extra_attrs:
+            org_attrs[attr] = mode("org_extra", attr, org) if attr in cols["columns"] else ""
+        org_df = pd.DataFrame(org_attrs, columns=NODE_COLUMNS + extra_attrs)
+
+        stubs = t["firsts"][t["firsts"]["scope"] == "stub"]
+        stubs = pd.DataFrame({"Id": stubs["k1"], "Label": stubs["value"], "type": "org"})
+        stubs = stubs[~stubs["Id"].isin(org_df["Id"])]
+        if len(stubs):
+            org_df = pd.concat(
+                [org_df, stubs.reindex(columns=org_df.columns, fill_value="")],
+                ignore_index=True,
+            )
+
+        if len(org_df):
+            org_df = org_df.sort_values("Id").reset_index(drop=True)
+        else:
+            org_df = pd.DataFrame(columns=NODE_COLUMNS)
+        lap("org_nodes")
+
+        # ---------- ATTENDANCE EDGES (org -> event) ----------
+        edges = t["edges"]
+        att = edges[edges["edge_type"] == "attendance"]
+        if len(att):
+            attendance_df = _sum_weights(att, ["Source", "Target", "edge_type", "event_id", "event_date"])
+            attendance_df["connection_type"] = ""
+            attendance_df["description"] = ""
+        else:
+            attendance_df = pd.DataFrame(columns=EDGE_COLUMNS)
+        lap("attendance_edges")
+
+        # ---------- EVENT→SECTOR EDGES (NEW 3-LAYER STRUCTURE) ----------
+        es = groups("event_sector")
+        # Weight = number of unique orgs in this sector at this event
+        orgs_per_pair = t["members"].groupby(["k1", "k2"]).size().rename("orgs").reset_index()
+        event_sector_df = pd.DataFrame(
+            {
+                "Source": key_ids(es["k1"], "evt").to_numpy(),
+                "Target": key_ids(es["k2"], "sector").to_numpy(),
+                "edge_type": "event_sector",
+                "event_id": first("event_sector", "eventid", es),
+                "event_date": first("event_sector", "eventdate", es),
+                "connection_type": "",
+                "description": "",
+                "weight": es[["k1", "k2"]].merge(orgs_per_pair, on=["k1", "k2"], how="left")["orgs"].to_numpy(),
+            },
+            columns=EDGE_COLUMNS,
+        )
+        lap("event_sector_edges")
+
+        # ---------- SECTOR→ORG EDGES (NEW 3-LAYER STRUCTURE) ----------
+        so = groups("sector_org")
+        sector_org_df = pd.DataFrame(
+            {
+                "Source": key_ids(so["k1"], "sector").to_numpy(),
+                "Target": key_ids(so["k2"], "org").to_numpy(),
+                "edge_type": "sector_org",
+                "event_id": first("sector_org", "eventid", so),
+                "event_date": first("sector_org", "eventdate", so),
+                "connection_type": "",
+                "description": "",
+                # Weight = number of participants from this org in this sector
+                "weight": so["count"].to_numpy(),
+            },
+            columns=EDGE_COLUMNS,
+        )
+        lap("sector_org_edges")
+
+        # ---------- CONNECTION EDGES (org -> org) ----------
+        conn = edges[edges["edge_type"] == "connection"]
+        if len(conn):
+            connection_df = _sum_weights(conn, EDGE_COLUMNS[:-1])
+        else:
+            connection_df = pd.DataFrame(columns=EDGE_COLUMNS)
+        lap("connection_edges")
+
+        # ---------- FINAL NODES & EDGES ----------
+
+        # Include sector nodes in the output
+        nodes_df = pd.concat([event_df, sector_df, org_df], ignore_index=True)
+
+        # Include all edge types: attendance, event→sector, sector→org, and connections
+        edges_df = pd.concat([attendance_df, event_sector_df, sector_org_df, connection_df], ignore_index=True)
+        lap("concat")
+
+        return nodes_df, edges_df
+
+
+def build_graph_from_responses(df: pd.DataFrame, mapping=None):
+    """
+    df is the merged DataFrame from one or many event CSVs.
+
+    Expected (case-insensitive) columns:
+
+      orgName, sector, firstName, lastName, email, socialLink, phone,
+      addressStreet, addressCity, addressState, addressCountry,
+      Role, eventId, eventName, eventDate, connections
+
+    mapping: optional dict mapping logical names to actual CSV column names
+      Example: {"orgName": "Organization", "eventId": "Conference ID"}
+
+    We will:
+      - normalize org & event names (case, spaces)
+      - dedupe orgs across all files
+      - produce:
+          nodes_df (events + orgs)
+          edges_df (attendance org→event + connection org→org)
+    """
+    cols = resolve_response_columns(df.columns, mapping)
+    return ResponseAggregate.from_frame(df, cols).to_graph()
+
+
+def resolve_custom_columns(columns, src_col: str, dst_col: str, edge_label_col: str = None, mapping=None) -> dict:
+    """Columns build_custom_edge_graph reads, resolved against a header."""
+    mapping = mapping or {}
+    columns = list(columns)
+    for c in (src_col, dst_col):
+        if c not in columns:
+            raise KeyError(c)
+    return {
+        "src": src_col,
+        "dst": dst_col,
+        "label": edge_label_col if edge_label_col and edge_label_col in columns else None,
+        "extra_attrs": [a for a in mapping.get("extraAttrs", []) if a in columns],
+        "columns": columns,
+    }
+
+
+def custom_columns_needed(spec: dict) -> list:
+    needed = [spec["src"], spec["dst"], spec["label"]] + spec["extra_attrs"]
+    return list(dict.fromkeys(c for c in needed if c is not None))
+
+
+class CustomEdgeAggregate:
+    """
+    Mergeable partial state behind build_custom_edge_graph (see
+    ResponseAggregate for the map / combine / to_graph contract).
+
+      names   name -> first position as a source / as a target (NO_POS if never)
+      firsts  name, field -> first non-empty extra attribute value, pos
+      edges   Source, Target, edge_type with weight summed
+    """
+
+    TABLES = {
+        "names": ["name", "src_pos", "dst_pos"],
+        "firsts": ["name", "field", "value", "pos"],
+        "edges": ["Source", "Target", "edge_type", "weight"],
+    }
+    KEYS = {
+        "names": ["name"],
+        "firsts": ["name", "field"],
+        "edges": ["Source", "Target", "edge_type"],
+    }
+
+    def __init__(self, spec: dict, tables: dict):
+        self.spec = spec
+        self.tables = tables
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, spec: dict, first_pos: int = 0):
+        lap = section_timer("custom.map")
+        n = len(df)
+        pos = first_pos + np.arange(n, dtype=np.int64)
+
+        # Get source and target values
+        sources = norm_strs(df[spec["src"]])
+        targets = norm_strs(df[spec["dst"]])
+
+        # Get edge labels if specified
+        edge_labels = norm_strs(df[spec["label"]]) if spec["label"] else pd.Series([""] * n)
+
+        # One hash pass gives every distinct name (first-appearance order)
+        # and the node code of each cell
+        codes, names = pd.factorize(pd.concat([sources, targets], ignore_index=True), sort=False)
+        src_codes, dst_codes = codes[:n], codes[n:]
+        names = np.asarray(names, dtype=object)
+
+        first_as = {}
+        for role, role_codes in (("src_pos", src_codes), ("dst_pos", dst_codes)):
+            at = np.full(len(names), NO_POS, dtype=np.int64)
+            seen, first = np.unique(role_codes, return_index=True)
+            at[seen] = pos[first]
+            first_as[role] = at
+        lap("names")
+
+        # Extra attributes: first non-empty value over the rows a node appears
+        # in (as source or target), in row order
+        firsts = []
+        if spec["extra_attrs"]:
+            by_node = GroupIndex(np.column_stack([src_codes, dst_codes]).ravel(), [names])
+            for attr in spec["extra_attrs"]:
+                vals, at = by_node.first_non_empty(np.repeat(df[attr].to_numpy(), 2), return_rows=True)
+                hit = at >= 0
+                firsts.append(pd.DataFrame({"name": names[hit], "field": attr, "value": vals[hit], "pos": pos[at[hit] // 2]}))
+        lap("firsts")
+
+        # Build edges
+        keys = canonical_keys(names)
+        node_ids = key_ids(keys.where(keys != "", "unknown"), "node").to_numpy()
+        has_both = ((sources != "") & (targets != "")).to_numpy()
+        labels = edge_labels.to_numpy()[has_both]
+        edges = pd.DataFrame(
+            {
+                "Source": node_ids[src_codes[has_both]],
+                "Target": node_ids[dst_codes[has_both]],
+                "edge_type": np.where(labels != "", labels, "connection"),
+                "weight": 1,
+            }
+        )
+
+        tables = {
+            "names": _table([pd.DataFrame({"name": names, **first_as})], cls.TABLES["names"]),
+            "firsts": _table(firsts, cls.TABLES["firsts"]),
+            "edges": _sum_weights(edges, ["Source", "Target", "edge_type"]) if len(edges) else _table([], cls.TABLES["edges"]),
+        }
+        lap("edges")
+        return cls(spec, tables)
+
+    @classmethod
+    def combine(cls, parts):
+        parts = list(parts)
+        t = {name: _table([p.tables[name] for p in parts], columns) for name, columns in cls.TABLES.items()}
+        t["names"] = t["names"].groupby("name", as_index=False, sort=False).agg(src_pos=("src_pos", "min"), dst_pos=("dst_pos", "min"))
+        t["firsts"] = t["firsts"].sort_values("pos", kind="stable").drop_duplicates(["name", "field"])
+        t["edges"] = _sum_weights(t["edges"], ["Source", "Target", "edge_type"]) if len(t["edges"]) else t["edges"]
+        return cls(parts[0].spec, {name: _table([frame], cls.TABLES[name]) for name, frame in t.items()})
+
+    def shifted(self, offset: int) -> "CustomEdgeAggregate":
+        """The same partial, for rows `offset` positions further down the upload."""
+        t = dict(self.tables)
+        names = t["names"]
+        t["names"] = names.assign(**{
+            c: np.where(names[c] != NO_POS, names[c] + offset, NO_POS) for c in ("src_pos", "dst_pos")
+        })
+        t["firsts"] = t["firsts"].assign(pos=t["firsts"]["pos"] + offset)
+        return type(self)(self.spec, t)
+
+    def with_tables(self, tables: dict) -> "CustomEdgeAggregate":
+        return type(self)(self.spec, tables)
+
+    def to_graph(self):
+        lap = section_timer("custom.graph")
+        t = self.tables
+
+        # Nodes in the order pd.concat([sources, targets]).unique() lists
+        # them: everything seen as a source first, then target-only names
+        names = t["names"][t["names"]["name"] != ""]
+        is_source = (names["src_pos"] != NO_POS).to_numpy()
+        is_target = (names["dst_pos"] != NO_POS).to_numpy()
+        order = np.lexsort((np.where(is_source, names["src_pos"], names["dst_pos"]), ~is_source))
+        names, is_source, is_target = names.iloc[order].reset_index(drop=True), is_source[order], is_target[order]
+
+        if len(names):
+            keys = canonical_keys(names["name"])
+            node_cols = {
+                "Id": key_ids(keys.where(keys != "", "unknown"), "node").to_numpy(),
+                "Label": pretty_names(names["name"]).to_numpy(),
+                # Determine type based on which column(s) it appears in
+                "type": np.where(is_source & is_target, "both", np.where(is_source, "source", "target")).astype(object),
+            }
+            firsts = t["firsts"]
+            for attr in self.spec["extra_attrs"]:
+                hit = firsts[firsts["field"] == attr]
+                node_cols[attr] = names[["name"]].merge(hit, on="name", how="left")["value"].fillna("").to_numpy()
+            nodes_df = pd.DataFrame(node_cols)
+        else:
+            nodes_df = pd.DataFrame()
+        lap("nodes")
+
+        if len(t["edges"]):
+            # Aggregate by source, target, edge_type
+            edges_df = _sum_weights(t["edges"], ["Source", "Target", "edge_type"])
+        else:
+            edges_df = pd.DataFrame(columns=["Source", "Target", "edge_type", "weight"])
+        lap("edges")
+
+        return nodes_df, edges_df
+
+
+def build_custom_edge_graph(df: pd.DataFrame, src_col: str, dst_col: str, edge_label_col: str = None, mapping=None):
+    """
+    Build a simple A→B graph from custom columns.
+    
+    Args:
+        df: merged DataFrame
+        src_col: column name for source nodes
+        dst_col: column name for target nodes
+        edge_label_col: optional column for edge labels/types
+        mapping: optional mapping for extra attributes
+    
+    Returns:
+        nodes_df, edges_df
+    """
+    spec = resolve_custom_columns(df.columns, src_col, dst_col, edge_label_col, mapping)
+    return CustomEdgeAggregate.from_frame(df, spec).to_graph()
+
+
+def resolve_aggregate(columns, graph_mode="org_event", mapping=None, src_col=None, dst_col=None, edge_label_col=None):
+    """(aggregate class, resolved columns, columns it reads) for a graph mode over a header."""
+    if graph_mode == "custom_ab":
+        spec = resolve_custom_columns(columns, src_col, dst_col, edge_label_col, mapping)
+        return CustomEdgeAggregate, spec, custom_columns_needed(spec)
+    cols = resolve_response_columns(columns, mapping)
+    return ResponseAggregate, cols, response_columns_needed(cols)
+
+
+def same_resolution(a: dict, b: dict) -> bool:
+    """Whether two resolutions read the same columns the same way (headers aside)."""
+    strip = lambda r: {k: v for k, v in r.items() if k != "columns"}
+    needed = response_columns_needed if "mapped" in a else custom_columns_needed
+    return strip(a) == strip(b) and needed(a) == needed(b)
+
+
+def state_rows(part) -> int:
+    """Rows of mergeable state in a partial aggregate (all its tables)."""
+    return sum(len(t) for t in part.tables.values())
+
+
+def fold_parts(parts):
+    """
+    Combine partial aggregates as they arrive (None for none). Pending
+    partials are merged into the running total once they hold as many
+    state rows as it does, so merging costs O(rows) overall rather than
+    re-merging the whole total for every chunk, and the pending list never
+    outgrows the total.
+    """
+    total, pending, pending_rows = None, [], 0
+    for part in parts:
+        if total is None:
+            total = part
+            continue
+        pending.append(part)
+        pending_rows += state_rows(part)
+        if pending_rows >= state_rows(total):
+            total = type(total).combine([total, *pending])
+            pending, pending_rows = [], 0
+    return type(total).combine([total, *pending]) if pending else total
+
+
+def merge_into(total, part):
+    """
+    combine([total, part]) for a small `part`: only the rows of `total`
+    in a group that `part` also has are merged again, the others are
+    carried over as they are. Same tables, up to row order.
+    """
+    touched, kept = {}, {}
+    for name, keys in total.KEYS.items():
+        old, new = total.tables[name], part.tables[name]
+        # narrow down to rows whose every key value occurs in `part`, then
+        # keep the exact matches
+        at = np.arange(len(old)) if len(new) else np.arange(0)
+        for c in keys:
+            at = at[old[c].iloc[at].isin(new[c].unique()).to_numpy()]
+        if len(at):
+            found = old[keys].iloc[at].merge(new[keys].drop_duplicates(), how="left", indicator=True)["_merge"]
+            at = at[(found == "both").to_numpy()]
+        hit = np.zeros(len(old), dtype=bool)
+        hit[at] = True
+        touched[name], kept[name] = old[hit], old[~hit]
+    merged = type(total).combine([total.with_tables(touched), part])
+    return merged.with_tables({name: _table([kept[name], merged.tables[name]], total.TABLES[name]) for name in total.TABLES})
+
+
+def map_file(path: str, file_no: int, aggregate, resolved: dict, needed: list, chunksize=CSV_CHUNK_ROWS,
+             timer=None):
+    """
+    (partial aggregate, rows, reader) of one file, the `file_no`-th of the
+    upload, read a chunk at a time (chunksize None: in one piece, through
+    the parse cache). Columns of `needed` the file lacks count as empty.
+    `reader` is the parser that produced the rows (see read_one).
+
+    A StageTimer `timer` records reading each chunk as "read" and reducing
+    it (key canonicalisation, grouping) as "normalize".
+    """
+    if timer is not None:
+        timer.start("read")
+    if chunksize is None:
+        blocks = [(0, read_one(path, usecols=needed))]
+    else:
+        blocks = iter_chunks(path, needed, chunksize)
+    rows, reader = 0, "csv"
+
+    def pieces():
+        nonlocal rows, reader
+        for offset, chunk in blocks:
+            reader = chunk.attrs.get("reader", reader)
+            chunk = chunk.reindex(columns=needed, fill_value="")
+            if timer is not None:
+                timer.rows_out(len(chunk))
+                timer.start("normalize", rows_in=len(chunk))
+            piece = aggregate.from_frame(chunk, resolved, (file_no << FILE_POS_SHIFT) + offset)
+            rows += len(chunk)
+            if timer is not None:
+                timer.rows_out(state_rows(piece))
+            # merged into the file's total (fold_parts) while still in normalize
+            yield piece
+            if timer is not None:
+                timer.start("read")
+
+    part = fold_parts(pieces())
+    return part, rows, reader
+
+
+# Bump when from_frame's output changes; cached partials are then rebuilt.
+PARTIAL_CACHE_VERSION = 2
+
+
+def partial_key(path: str, aggregate, resolved: dict, needed: list) -> str:
+    """
+    PARTIAL_CACHE key of a file's partial: its contents plus everything
+    about the column resolution from_frame depends on (the merged header
+    only matters through `needed`).
+    """
+    how = json.dumps(
+        [PARTIAL_CACHE_VERSION, aggregate.__name__, {k: v for k, v in resolved.items() if k != "columns"}, needed],
+        sort_keys=True, default=str,
+    )
+    ext = os.path.splitext(path)[1].lower()
+    return f"{file_digest(path)}{ext}.{hashlib.sha256(how.encode()).hexdigest()[:16]}"
+
+
+def _map_in_worker(path, aggregate, resolved, needed):
+    timer = StageTimer()
+    try:
+        return (*map_file(path, 0, aggregate, resolved, needed, chunksize=None, timer=timer), timer.summary())
+    finally:
+        METRICS.flush()
+
+
+def map_files(paths, aggregate, resolved: dict, needed: list, workers=None, first_file: int = 0, timer=None):
+    """
+    The map step: one partial aggregate per file, in order, positioned as
+    files first_file, first_file + 1, ... of an upload; plus the rows in
+    the files and each file's reader ("partial" when its partial was
+    cached).
+
+    Partials are built at position 0 and shifted into place, so a file
+    converted before with the same column resolution comes straight from
+    PARTIAL_CACHE, wherever it sits in the upload. The others are mapped
+    in the read pool when workers > 1 (at most one worker per file).
+
+    `timer` gets the "read" and "normalize" stages (see map_file); for
+    files mapped in the pool, those add up the workers' times.
+    """
+    keys = [partial_key(p, aggregate, resolved, needed) if PARTIAL_CACHE.enabled else None for p in paths]
+    cached = [PARTIAL_CACHE.get(k) if k else None for k in keys]
+    todo = [i for i, entry in enumerate(cached) if entry is None]
+    parts = [entry and entry[0] for entry in cached]
+    # a cached file still counts its rows as read
+    rows = sum(entry[1] for entry in cached if entry is not None)
+    if PARTIAL_CACHE.enabled:
+        METRICS.inc("converter_partial_cache_requests_total", len(paths) - len(todo), result="hit")
+        METRICS.inc("converter_partial_cache_requests_total", len(todo), result="miss")
+    if timer is not None and rows:
+        timer.start("read")
+        timer.rows_out(rows)
+
+    workers = min(workers or READ_WORKERS, len(todo))
+    if workers <= 1:
+        mapped = [map_file(paths[i], 0, aggregate, resolved, needed, chunksize=None, timer=timer) for i in todo]
+    else:
+        args = [[paths[i] for i in todo], [aggregate] * len(todo), [resolved] * len(todo), [needed] * len(todo)]
+        if timer is not None:
+            timer.stop()
+        try:
+            mapped = list(_get_read_pool(workers).map(_map_in_worker, *args))
+        except BrokenProcessPool:
+            _drop_read_pool()
+            raise RuntimeError("A file reader process died while parsing the uploads.")
+        for *_, summary in mapped:
+            if timer is not None:
+                timer.add(summary)
+        mapped = [result[:3] for result in mapped]
+
+    readers = ["partial"] * len(paths)
+    for i, (part, n, reader) in zip(todo, mapped):
+        if keys[i]:
+            PARTIAL_CACHE.put(keys[i], (part, n))
+        parts[i], readers[i] = part, reader
+        rows += n
+    return [part.shifted((first_file + i) << FILE_POS_SHIFT) for i, part in enumerate(parts)], rows, readers
+
+
+def stream_graph(paths, mapping=None, graph_mode="org_event", src_col=None, dst_col=None,
+                 edge_label_col=None, chunksize=CSV_CHUNK_ROWS, progress=None, timer=None):
+    """
+    Build nodes_df / edges_df straight from the uploaded files without ever
+    holding the merged frame: each file is read a chunk at a time (only the
+    columns the graph mode uses), every chunk is reduced to a partial
+    aggregate and folded into the running total (fold_parts).
+
+    Same result as convert_many without `stream`. Reading and
+    normalizing are interleaved, so `progress` only hears "read" and "build".
+    A StageTimer `timer` replaces `progress` and times "read" and
+    "normalize" chunk by chunk (see map_file).
+    """
+    progress = timer.start if timer is not None else progress or _no_progress
+    progress("read")
+    _check_paths(paths)
+    aggregate, resolved, needed = resolve_aggregate(union_columns(paths), graph_mode, mapping,
+                                                    src_col, dst_col, edge_label_col)
+
+    readers = []
+
+    def parts():
+        for file_no, path in enumerate(paths):
+            part, _, reader = map_file(path, file_no, aggregate, resolved, needed, chunksize, timer=timer)
+            readers.append(reader)
+            yield part
+
+    total = fold_parts(parts())
+
+    if timer is not None:
+        timer.note(readers=readers)
+    progress("build")
+    return total.to_graph()
+
+
+# ------------------ graph file writers ------------------
+#
+# GEXF and GraphML, for opening a conversion in Gephi (or yEd, Cytoscape,
+# networkx) as a single file with typed attributes. The XML is written as
+# text a chunk of rows at a time - no DOM - so memory stays flat however
+# many edges there are.
+
+GRAPH_XML_CHUNK_ROWS = 50_000
+
+GEXF_NS = "http://www.gexf.net/1.2draft"
+GRAPHML_NS = "http://graphml.graphdrawing.org/xmlns"
+
+_XML_ESCAPES = {
+    ord("&"): "&amp;", ord("<"): "&lt;", ord(">"): "&gt;", ord('"'): "&quot;",
+    # keep line breaks and tabs inside attribute values
+    ord("\n"): "&#10;", ord("\r"): "&#13;", ord("\t"): "&#9;",
+    # characters XML 1.0 does not allow at all
+    **{c: None for c in (*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), 0xFFFE, 0xFFFF)},
+}
+
+
+def xml_escape(s) -> str:
+    """s as text for XML content or a double-quoted attribute value."""
+    return str(s).translate(_XML_ESCAPES)
+
+
+def xml_type(col: pd.Series) -> str:
+    """GEXF / GraphML attribute type of a column (both use these names)."""
+    kind = col.dtype.kind
+    if kind == "O":
+        # raw cells from the uploads ("" when empty), often numbers as text:
+        # typed only if every value agrees
+        values = col[col.ne("") & col.notna()]
+        kind = {"integer": "i", "floating": "f", "mixed-integer-float": "f", "boolean": "b"}.get(
+            pd.api.types.infer_dtype(values), "O")
+        if kind == "O" and len(values):
+            try:
+                kind = pd.to_numeric(values).dtype.kind
+            except (ValueError, TypeError):
+                pass
+    if kind in "iu":
+        return "long"
+    if kind == "f":
+        return "double"
+    if kind == "b":
+        return "boolean"
+    return "string"
+
+
+def _xml_values(col: pd.Series) -> pd.Series:
+    """Escaped text of every cell of col; "" where it is missing."""
+    if col.dtype.kind == "b":
+        return pd.Series(np.where(col.to_numpy(), "true", "false"), index=col.index, dtype=object)
+    if col.dtype.kind in "iuf":
+        # nothing to escape in a number
+        return col.astype(str).astype(object).where(col.notna(), "")
+    text = _per_distinct(col, lambda u: u.map(xml_escape))
+    return text.where(col.notna().to_numpy(), "")
+
+
+def _write_elements(f, tag: str, n: int, attrs: dict, data: list, wrap=None):
+    """
+    Write n `tag` elements, a chunk of rows at a time. `attrs` maps XML
+    attribute names to columns; `data` lists (prefix, column, suffix) child
+    elements, optionally wrapped in `wrap` = (open, close). Empty values are
+    left out.
+    """
+    for start in range(0, n, GRAPH_XML_CHUNK_ROWS):
+        rows = slice(start, min(start + GRAPH_XML_CHUNK_ROWS, n))
+        line = pd.Series(f"<{tag}", index=range(rows.start, rows.stop), dtype=object)
+        for name, col in attrs.items():
+            v = _xml_values(col.iloc[rows]).to_numpy()
+            line += np.where(v != "", f' {name}="' + v + '"', "")
+        body = pd.Series("", index=line.index, dtype=object)
+        for prefix, col, suffix in data:
+            v = _xml_values(col.iloc[rows]).to_numpy()
+            body += np.where(v != "", prefix + v + suffix, "")
+        if wrap:
+            body = (wrap[0] + body + wrap[1]).where(body != "", "")
+        line += np.where(body != "", ">" + body + f"</{tag}>\n", "/>\n")
+        f.write("".join(line))
+
+
+def _attribute_columns(df: pd.DataFrame, skip) -> dict:
+    return {c: xml_type(df[c]) for c in df.columns if c not in skip}
+
+
+def write_gexf(nodes_df: pd.DataFrame, edges_df: pd.DataFrame, f):
+    """
+    Write the graph to text file f as GEXF 1.2: Id / Label as node id and
+    label, weight as the edge weight, every other column as a typed
+    attribute.
+    """
+    node_attrs = _attribute_columns(nodes_df, ("Id", "Label"))
+    edge_attrs = _attribute_columns(edges_df, ("Source", "Target", "weight"))
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<gexf xmlns="{GEXF_NS}" version="1.2">\n'
+            '<graph defaultedgetype="directed" mode="static">\n')
+    for cls, attrs in (("node", node_attrs), ("edge", edge_attrs)):
+        if attrs:
+            f.write(f'<attributes class="{cls}">\n')
+            for i, (name, kind) in enumerate(attrs.items()):
+                f.write(f'<attribute id="{i}" title="{xml_escape(name)}" type="{kind}"/>\n')
+            f.write("</attributes>\n")
+
+    attvalues = ("<attvalues>", "</attvalues>")
+    f.write("<nodes>\n")
+    _write_elements(
+        f, "node", len(nodes_df),
+        {"id": nodes_df.get("Id"), "label": nodes_df.get("Label")},
+        [(f'<attvalue for="{i}" value="', nodes_df[c], '"/>') for i, c in enumerate(node_attrs)],
+        wrap=attvalues,
+    )
+    f.write("</nodes>\n<edges>\n")
+    _write_elements(
+        f, "edge", len(edges_df),
+        {"id": pd.Series(range(len(edges_df))), "source": edges_df.get("Source"),
+         "target": edges_df.get("Target"), "weight": edges_df.get("weight")},
+        [(f'<attvalue for="{i}" value="', edges_df[c], '"/>') for i, c in enumerate(edge_attrs)],
+        wrap=attvalues,
+    )
+    f.write("</edges>\n</graph>\n</gexf>\n")
+
+
+def write_graphml(nodes_df: pd.DataFrame, edges_df: pd.DataFrame, f):
+    """
+    Write the graph to text file f as GraphML: Id as the node id, Label and
+    weight under the "label" / "weight" keys Gephi looks for, every other
+    column as a typed key.
+    """
+    node_attrs = _attribute_columns(nodes_df, ("Id", "Label"))
+    edge_attrs = _attribute_columns(edges_df, ("Source", "Target", "weight"))
+    keys = [("label", "node", "label", "string")]
+    keys += [(f"n{i}", "node", name, kind) for i, (name, kind) in enumerate(node_attrs.items())]
+    keys += [("weight", "edge", "weight", "double")]
+    keys += [(f"e{i}", "edge", name, kind) for i, (name, kind) in enumerate(edge_attrs.items())]
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<graphml xmlns="{GRAPHML_NS}">\n')
+    for key, cls, name, kind in keys:
+        f.write(f'<key id="{key}" for="{cls}" attr.name="{xml_escape(name)}" attr.type="{kind}"/>\n')
+    f.write('<graph id="G" edgedefault="directed">\n')
+
+    def data(df, cols, prefix):
+        return [(f'<data key="{prefix}{i}">', df[c], "</data>") for i, c in enumerate(cols)]
+
+    _write_elements(
+        f, "node", len(nodes_df), {"id": nodes_df.get("Id")},
+        ([('<data key="label">', nodes_df["Label"], "</data>")] if "Label" in nodes_df else [])
+        + data(nodes_df, node_attrs, "n"),
+    )
+    _write_elements(
+        f, "edge", len(edges_df), {"source": edges_df.get("Source"), "target": edges_df.get("Target")},
+        ([('<data key="weight">', edges_df["weight"], "</data>")] if "weight" in edges_df else [])
+        + data(edges_df, edge_attrs, "e"),
+    )
+    f.write("</graph>\n</graphml>\n")
+
+
+GRAPH_WRITERS = {
+    ".gexf": write_gexf,
+    ".graphml": write_graphml,
+}
+
+
+# ------------------ top-level conversion ------------------
+
+# Output formats and the extension of their nodes/edges files. "gephi" and
+# "kumu" are CSVs with each tool's column names; the binary formats keep
+# Gephi's names; GEXF and GraphML hold the whole graph in one file.
+OUTPUT_FORMATS = {
+    "gephi": ".csv",
+    "kumu": ".csv",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+    "gexf": ".gexf",
+    "graphml": ".graphml",
+}
+
+CONTENT_TYPES = {
+    ".csv": "text/csv",
+    ".parquet": "application/vnd.apache.parquet",
+    ".arrow": "application/vnd.apache.arrow.file",
+    ".gexf": "application/gexf+xml",
+    ".graphml": "application/graphml+xml",
+}
+
+# Columns stored dictionary-encoded in the binary formats: a few distinct
+# values (types) or values repeated across many rows (node IDs in edges).
+CATEGORICAL_COLUMNS = ("Id", "Source", "Target", "type", "edge_type")
+
+
+def arrow_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    df as it should be stored in Parquet / Arrow: CATEGORICAL_COLUMNS as
+    categoricals (dictionary arrays), and attribute columns that mix types
+    (raw cells from the uploads) as the text the CSV would hold; missing
+    values stay null.
+    """
+    out = {}
+    for c in df.columns:
+        s = df[c]
+        if c in CATEGORICAL_COLUMNS:
+            s = s.astype("category")
+        elif s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) not in ("string", "empty"):
+            s = s.where(s.isna(), s.astype(str))
+        out[c] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def _replace_atomic(path: str, write):
+    """Call write(tmp) and move tmp over path, so a reader sees the old file or the new one."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def write_table_atomic(df: pd.DataFrame, path: str):
+    """Write df in the format its extension names, atomically."""
+    ext = os.path.splitext(path)[1]
+    if ext == ".parquet":
+        _replace_atomic(path, lambda tmp: arrow_frame(df).to_parquet(tmp, index=False, compression="zstd"))
+    elif ext == ".arrow":
+        # Feather v2 is the Arrow IPC file format
+        _replace_atomic(path, lambda tmp: arrow_frame(df).reset_index(drop=True).to_feather(tmp, compression="zstd"))
+    else:
+        _replace_atomic(path, lambda tmp: df.to_csv(tmp, index=False))
+
+
+def write_graph_atomic(nodes_df: pd.DataFrame, edges_df: pd.DataFrame, path: str):
+    """Write the whole graph as GEXF or GraphML (by extension), atomically."""
+    writer = GRAPH_WRITERS[os.path.splitext(path)[1]]
+
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            writer(nodes_df, edges_df, f)
+
+    _replace_atomic(path, write)
+
+
+def _no_progress(stage):
+    pass
+
+
+def convert_many(infiles, outdir=OUTPUT_FOLDER, fmt="gephi", mapping=None, graph_mode="org_event", src_col=None, dst_col=None, edge_label_col=None, stream=False, chunksize=CSV_CHUNK_ROWS, read_workers=None, progress=None, timer=None):
+    """
+    Convert files to graph format.
+    
+    Args:
+        infiles: list of file paths
+        outdir: output directory
+        fmt: output format, one of OUTPUT_FORMATS
+        mapping: optional column mapping dict
+        graph_mode: "org_event", "org_org", or "custom_ab"
+        src_col: source column for custom_ab mode
+        dst_col: target column for custom_ab mode
+        edge_label_col: edge label column for custom_ab mode
+        stream: build from CSV chunks instead of one merged DataFrame
+            (same output, memory bounded by chunksize rather than input size)
+        chunksize: rows per chunk when streaming
+        read_workers: processes used to parse the files (default READ_WORKERS)
+        progress: optional callback, called with each stage as it starts
+            ("read", "normalize", "build", "write")
+        timer: optional StageTimer recording the stages (its own progress
+            callback is used instead of `progress`)
+    """
+    if timer is None:
+        timer = StageTimer(progress)
+        try:
+            return convert_many(infiles, outdir, fmt, mapping, graph_mode, src_col, dst_col, edge_label_col,
+                                stream, chunksize, read_workers, timer=timer)
+        finally:
+            timer.summary()
+
+    if graph_mode == "custom_ab" and (not src_col or not dst_col):
+        raise RuntimeError("custom_ab mode requires src_col and dst_col")
+
+    if stream:
+        nodes_df, edges_df = stream_graph(
+            infiles, mapping, graph_mode,
+            src_col=src_col, dst_col=dst_col, edge_label_col=edge_label_col,
+            chunksize=chunksize, timer=timer,
+        )
+    else:
+        # map: every file (only the columns this graph mode reads) reduced
+        # to a partial aggregate, in parallel and/or from the cache
+        timer.start("read")
+        _check_paths(infiles)
+        aggregate, resolved, needed = resolve_aggregate(union_columns(infiles), graph_mode, mapping,
+                                                        src_col, dst_col, edge_label_col)
+        parts, rows, readers = map_files(infiles, aggregate, resolved, needed, workers=read_workers, timer=timer)
+        timer.note(readers=readers)
+        # reduce, then lay out the graph; rows_in counts rows of mergeable
+        # state (grouped keys, modes, summed edges)
+        timer.start("build", rows_in=sum(state_rows(p) for p in parts))
+        nodes_df, edges_df = aggregate(resolved, aggregate.combine(parts).tables).to_graph()
+    timer.rows_out(len(nodes_df) + len(edges_df))
+    return write_graph_outputs(nodes_df, edges_df, outdir, fmt, graph_mode, timer)
+
+
+def write_graph_outputs(nodes_df, edges_df, outdir, fmt="gephi", graph_mode="org_event", timer=None):
+    """
+    Write a built graph in format `fmt` into `outdir` (org_org keeps only
+    orgs and their connections). Returns (nodes_name, edges_name, n_nodes,
+    n_edges) like convert_many.
+    """
+    if graph_mode == "org_org":
+        # For org-org mode, we still use the same builder but might want to filter out event nodes
+        # Filter to only org nodes and org-org edges
+        nodes_df = nodes_df[nodes_df["type"] == "org"]
+        edges_df = edges_df[edges_df["edge_type"] == "connection"]
+
+    if timer is not None:
+        timer.start("write", rows_in=len(nodes_df) + len(edges_df))
+        timer.rows_out(len(nodes_df) + len(edges_df))
+    os.makedirs(outdir, exist_ok=True)
+
+    fmt = fmt.lower()
+    if OUTPUT_FORMATS.get(fmt) in GRAPH_WRITERS:
+        # one file holds both; it is the "nodes" and the "edges" download
+        name = f"graph{OUTPUT_FORMATS[fmt]}"
+        write_graph_atomic(nodes_df, edges_df, os.path.join(outdir, name))
+        return name, name, len(nodes_df), len(edges_df)
+
+    if fmt == "kumu":
+        nodes_out = nodes_df.rename(columns={"Id": "id"})
+        edges_out = edges_df.rename(columns={"Source": "from", "Target": "to"})
+        nodes_name, edges_name = "nodes_kumu.csv", "edges_kumu.csv"
+    elif fmt in ("parquet", "arrow"):
+        nodes_out, edges_out = nodes_df, edges_df
+        ext = OUTPUT_FORMATS[fmt]
+        nodes_name, edges_name = f"nodes{ext}", f"edges{ext}"
+    else:
+        nodes_out, edges_out = nodes_df, edges_df
+        nodes_name, edges_name = "nodes_gephi.csv", "edges_gephi.csv"
+
+    write_table_atomic(nodes_out, os.path.join(outdir, nodes_name))
+    write_table_atomic(edges_out, os.path.join(outdir, edges_name))
+
+    return nodes_name, edges_name, len(nodes_out), len(edges_out)
+
+
+# ------------------ compressed downloads ------------------
+#
+# Outputs are written once and downloaded many times, often over slow links.
+# Text outputs get zstd / gzip copies ("sidecars") next to them when they are
+# written; /download picks one by Accept-Encoding, serves byte ranges, and
+# answers a repeat request from its ETag alone.
+
+DOWNLOAD_CHUNK = 1 << 20
+
+# Content-Encoding -> sidecar suffix, in order of preference
+DOWNLOAD_ENCODINGS = {"zstd": ".zst", "gzip": ".gz"}
+
+# Outputs worth compressing (Parquet / Arrow are compressed already)
+COMPRESSIBLE_EXT = {".csv", ".gexf", ".graphml"}
+
+
+def _read_chunks(path: str):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(DOWNLOAD_CHUNK), b""):
+            yield block
+
+
+class _Collector:
+    """Write-only file object that keeps what is written until taken."""
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def take(self) -> bytes:
+        out = b"".join(self.parts)
+        self.parts.clear()
+        return out
+
+
+def encode_chunks(chunks, encoding: str):
+    """
+    Compress an iterable of byte strings with a Content-Encoding ("gzip" or
+    "zstd"), yielding output as it is produced. The same input always gives
+    the same bytes, so a sidecar and an on-the-fly copy share one ETag.
+    """
+    if encoding == "gzip":
+        z = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            out = z.compress(chunk)
+            if out:
+                yield out
+        yield z.flush()
+        return
+
+    import pyarrow as pa  # zstd codec; pyarrow is already needed for Parquet
+
+    sink = _Collector()
+    stream = pa.CompressedOutputStream(pa.PythonFile(sink, mode="w"), encoding)
+    for chunk in chunks:
+        stream.write(chunk)
+        out = sink.take()
+        if out:
+            yield out
+    stream.close()
+    yield sink.take()
+
+
+def precompress(folder: str, names) -> dict:
+    """
+    Describe the output files `names` in folder for /download: their SHA-256
+    (the strong ETag) and, for text files, the encodings of the compressed
+    sidecars written next to them.
+    """
+    etags, encodings = {}, {}
+    for name in dict.fromkeys(names):
+        path = os.path.join(folder, name)
+        etags[name] = file_digest(path)
+        if not PRECOMPRESS_DOWNLOADS or os.path.splitext(name)[1] not in COMPRESSIBLE_EXT:
+            continue
+        for encoding, suffix in DOWNLOAD_ENCODINGS.items():
+            def write(tmp, encoding=encoding):
+                with open(tmp, "wb") as f:
+                    for block in encode_chunks(_read_chunks(path), encoding):
+                        f.write(block)
+
+            _replace_atomic(path + suffix, write)
+        encodings[name] = list(DOWNLOAD_ENCODINGS)
+    return {"etags": etags, "encodings": encodings}
+
+
+def result_files(result: dict) -> list:
+    """Every file of a stored result: the outputs and their sidecars."""
+    names = list(dict.fromkeys(result["files"]))
+    for name, encodings in result.get("encodings", {}).items():
+        names += [name + DOWNLOAD_ENCODINGS[e] for e in encodings]
+    return names
+
+
+def negotiate_encoding(accept_encodings, ext: str):
+    """The Content-Encoding to send a file with, or None for identity."""
+    if ext not in COMPRESSIBLE_EXT:
+        return None
+    best, best_q = None, 0
+    for encoding in DOWNLOAD_ENCODINGS:
+        q = accept_encodings[encoding]
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+# ------------------ bundles ------------------
+#
+# A job's outputs plus a JSON manifest in one archive, streamed as it is
+# built: only a block of each file is in memory at a time.
+
+BUNDLE_MANIFEST = "manifest.json"
+
+
+def bundle_manifest(job_id: str, status: dict) -> dict:
+    """What a bundle holds and how it was made."""
+    result, settings = status["result"], status.get("settings", {})
+    nodes_name, edges_name = result["files"]
+    return {
+        "job_id": job_id,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(status["created"])),
+        "format": status.get("fmt"),
+        "graph_mode": settings.get("graph_mode"),
+        "mapping": settings.get("mapping"),
+        "columns": {k: settings.get(k) for k in ("src_col", "dst_col", "edge_label_col")},
+        "sources": status.get("sources", []),
+        "nodes": nodes_name,
+        "edges": edges_name,
+        "n_nodes": result["n_nodes"],
+        "n_edges": result["n_edges"],
+        "cached": result["cached"],
+        "timings": status.get("timings", {}),
+    }
+
+
+def iter_zip(folder: str, names, manifest: dict):
+    """Zip of the files `names` in folder plus the manifest, yielded as it is written."""
+    sink = _Collector()
+    with zipfile.ZipFile(sink, "w", allowZip64=True) as zf:
+        for name in dict.fromkeys(names):
+            path = os.path.join(folder, name)
+            info = zipfile.ZipInfo.from_file(path, name)
+            info.compress_type = (
+                zipfile.ZIP_DEFLATED if os.path.splitext(name)[1] in COMPRESSIBLE_EXT else zipfile.ZIP_STORED
+            )
+            with zf.open(info, "w", force_zip64=True) as out:
+                for block in _read_chunks(path):
+                    out.write(block)
+                    yield sink.take()
+        zf.writestr(BUNDLE_MANIFEST, json.dumps(manifest, indent=2), zipfile.ZIP_DEFLATED)
+    yield sink.take()
+
+
+def _iter_tar(folder: str, names, manifest: dict):
+    def member(name, size, mtime):
+        info = tarfile.TarInfo(name)
+        info.size, info.mtime, info.mode = size, int(mtime), 0o644
+        return info.tobuf(tarfile.PAX_FORMAT)
+
+    def padding(size):
+        return b"\0" * (-size % tarfile.BLOCKSIZE)
+
+    for name in dict.fromkeys(names):
+        path = os.path.join(folder, name)
+        st = os.stat(path)
+        yield member(name, st.st_size, st.st_mtime)
+        yield from _read_chunks(path)
+        yield padding(st.st_size)
+    data = json.dumps(manifest, indent=2).encode()
+    yield member(BUNDLE_MANIFEST, len(data), time.time())
+    yield data + padding(len(data))
+    yield b"\0" * (2 * tarfile.BLOCKSIZE)  # end of archive
+
+
+def iter_tar_zst(folder: str, names, manifest: dict):
+    """zstd-compressed tar of the files `names` in folder plus the manifest."""
+    return encode_chunks(_iter_tar(folder, names, manifest), "zstd")
+
+
+# download name -> (content type, writer)
+BUNDLES = {
+    "bundle.zip": ("application/zip", iter_zip),
+    "bundle.tar.zst": ("application/zstd", iter_tar_zst),
+}
+
+
+# ------------------ result cache ------------------
+#
+# Clicking Convert again with the same files and settings reruns nothing:
+# each result lives in outputs/results/<key>/ next to a manifest, where the
+# key hashes the inputs' contents and every setting that changes the output.
+
+RESULT_CACHE_VERSION = 3
+RESULT_MANIFEST = "result.json"
+
+
+def result_key(paths, fmt, mapping=None, graph_mode="org_event", src_col=None, dst_col=None, edge_label_col=None) -> str:
+    """Hash of what convert_many's output depends on (file order included)."""
+    spec = {
+        "version": RESULT_CACHE_VERSION,
+        "inputs": [file_digest(p) + os.path.splitext(p)[1].lower() for p in paths],
+        "fmt": fmt.lower(),
+        "mapping": mapping or {},
+        "graph_mode": graph_mode,
+        "columns": [src_col, dst_col, edge_label_col],
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    LRU of conversion outputs on disk, bounded by their total size. A
+    result directory only appears (by rename) once complete, so other
+    server processes can serve it too; its manifest's mtime is the LRU
+    clock. Hits and misses are counted per process.
+    """
+
+    def __init__(self, folder: str, max_bytes: int):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        METRICS.inc("converter_result_cache_requests_total", result="hit" if hit else "miss")
+
+    def get(self, key: str):
+        """The stored manifest for `key`, or None."""
+        manifest = os.path.join(self.folder, key, RESULT_MANIFEST)
+        try:
+            with open(manifest) as f:
+                result = json.load(f)
+            os.utime(manifest)
+        except (FileNotFoundError, ValueError):
+            self._count(False)
+            return None
+        self._count(True)
+        return result
+
+    def lookup(self, key: str, outdir: str):
+        """
+        Link the stored result for `key` into `outdir` and return its
+        manifest (output file names, node and edge counts), or None.
+        """
+        result = self.get(key) if self.max_bytes else None
+        if result is None:
+            return None
+        try:
+            _link_files(os.path.join(self.folder, key), outdir, result_files(result))
+        except FileNotFoundError:
+            return None  # evicted by another process just now
+        return dict(result, cached=True)
+
+    def store(self, key: str, infiles, outdir: str, fmt="gephi", **kwargs) -> dict:
+        """
+        convert_many(infiles, ...) into `outdir`, keeping the output as the
+        result for `key` if it fits in the budget (a zero budget keeps
+        nothing). Returns the manifest like lookup().
+        """
+        final = os.path.join(self.folder, key)
+        tmp = f"{final}.{os.getpid()}.{threading.get_ident()}.tmp"
+        kept = False
+        try:
+            nodes_name, edges_name, n_nodes, n_edges = convert_many(infiles, tmp, fmt, **kwargs)
+            result = {
+                "files": [nodes_name, edges_name],
+                "n_nodes": n_nodes,
+                "n_edges": n_edges,
+                **precompress(tmp, [nodes_name, edges_name]),
+            }
+            _link_files(tmp, outdir, result_files(result))
+            with open(os.path.join(tmp, RESULT_MANIFEST), "w") as f:
+                json.dump(result, f)
+            if sum(f.stat().st_size for f in os.scandir(tmp)) <= self.max_bytes:
+                try:
+                    os.rename(tmp, final)
+                    kept = True
+                except OSError:
+                    # the same conversion finished first elsewhere; keep that one
+                    pass
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        if kept:
+            self._evict(keep=key)
+        return dict(result, cached=False)
+
+    def _evict(self, keep: str):
+        entries = []
+        with os.scandir(self.folder) as it:
+            for e in it:
+                manifest = os.path.join(e.path, RESULT_MANIFEST)
+                if e.name.endswith(".tmp") or not os.path.exists(manifest):
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(e.path))
+                entries.append((os.stat(manifest).st_mtime_ns, size, e.name))
+        used = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if used <= self.max_bytes:
+                break
+            if name != keep:
+                shutil.rmtree(os.path.join(self.folder, name), ignore_errors=True)
+                used -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {"hits": hits, "misses": misses}
+
+
+RESULT_CACHE = ResultCache(os.path.join(OUTPUT_FOLDER, "results"), RESULT_CACHE_MB << 20)
+
+
+def _link_files(src_dir: str, dst_dir: str, names):
+    """Hard-link (or, across filesystems, copy) files into another folder."""
+    os.makedirs(dst_dir, exist_ok=True)
+    for name in dict.fromkeys(names):
+        src, dst = os.path.join(src_dir, name), os.path.join(dst_dir, name)
+        try:
+            os.link(src, dst)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            shutil.copyfile(src, dst)
+
+
+# ------------------ profiling ------------------
+#
+# A profiled job runs its conversion under cProfile (profile.pstats, for
+# pstats / snakeviz) while a sampling thread records the converting
+# thread's stack (profile.collapsed, one "outer;inner count" line per
+# stack, for flamegraph.pl or speedscope). Both stay in the job folder.
+
+PROFILE_FILES = {"profile.pstats": "application/octet-stream", "profile.collapsed": "text/plain"}
+PROFILE_SAMPLE_SECONDS = 0.005
+
+
+def is_admin(req) -> bool:
+    """Whether the request carries the CONVERTER_PROFILE_TOKEN bearer token."""
+    auth = req.headers.get("Authorization", "")
+    if not PROFILE_TOKEN or not auth.startswith("Bearer "):
+        return False
+    return hmac.compare_digest(auth[len("Bearer "):].strip().encode(), PROFILE_TOKEN.encode())
+
+
+def take_profile_slot() -> bool:
+    """
+    Claim one of the PROFILES_PER_HOUR profiled runs allowed in any hour.
+    The claims are shared by all server processes through a locked file.
+    """
+    import fcntl
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    path = os.path.join(CACHE_FOLDER, "profile_slots.json")
+    now = time.time()
+    with open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path) as f:
+                claims = [t for t in json.load(f) if now - t < 3600]
+        except (OSError, ValueError):
+            claims = []
+        if len(claims) >= PROFILES_PER_HOUR:
+            return False
+        claims.append(now)
+        with open(path + ".tmp", "w") as f:
+            json.dump(claims, f)
+        os.replace(path + ".tmp", path)
+    return True
+
+
+class StackSampler:
+    """Collapsed stacks of one thread, sampled every `interval` seconds from a helper thread."""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        labels = {}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code not in labels:
+                    name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    labels[code] = name.replace(";", ":")
+                stack.append(labels[code])
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, n in self.counts.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+class ConversionProfile:
+    """Profile the code run inside the `with` block into PROFILE_FILES in `folder`."""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+
+    def __enter__(self):
+        self.sampler = StackSampler(threading.get_ident()).__enter__()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.disable()
+        self.sampler.__exit__(*exc)
+        self.profiler.dump_stats(os.path.join(self.folder, "profile.pstats"))
+        self.sampler.write(os.path.join(self.folder, "profile.collapsed"))
+
+
+# ------------------ jobs ------------------
+#
+# Every /upload is a job with its own folder, outputs/jobs/<job_id>/, so two
+# conversions never write or serve the same file. Conversions run in a pool
+# of worker processes; a job reports its progress through status.json in its
+# folder, which any server process can read. A janitor thread removes jobs
+# (and temp results abandoned by a crash) after JOB_TTL_SECONDS.
+
+JOBS_FOLDER = os.path.join(OUTPUT_FOLDER, "jobs")
+JOB_STATUS = "status.json"
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def new_job():
+    """(job_id, folder) for a fresh job."""
+    job_id = uuid.uuid4().hex
+    folder = os.path.join(JOBS_FOLDER, job_id)
+    os.makedirs(folder)
+    return job_id, folder
+
+
+def job_folder(job_id: str):
+    """The folder of `job_id`, or None if it isn't a well-formed job ID."""
+    if not _JOB_ID_RE.match(job_id or ""):
+        return None
+    return os.path.join(JOBS_FOLDER, job_id)
+
+
+def read_job_status(folder: str):
+    try:
+        with open(os.path.join(folder, JOB_STATUS)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_job_status(folder: str, **fields) -> dict:
+    """Merge `fields` into a job's status; readers never see a partial file."""
+    status = read_job_status(folder) or {"created": time.time()}
+    status.update(fields, updated=time.time())
+    path = os.path.join(folder, JOB_STATUS)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(status, f)
+    os.replace(tmp, path)
+    return status
+
+
+def _run_job(folder, key, infiles, fmt, stream, settings, profile=False, project=None):
+    """
+    Body of a queued conversion, run in a job worker process. With
+    `project` (folder, source names) the files are added to that project.
+    """
+    def progress(stage):
+        write_job_status(folder, state="running", stage=stage)
+
+    job_id = os.path.basename(folder)
+    labels = {"graph_mode": _graph_mode_label(settings.get("graph_mode")), "format": fmt}
+    timer = StageTimer(progress)
+    try:
+        with ConversionProfile(folder) if profile else nullcontext():
+            if project:
+                project_dir, sources = project
+                result = update_project(project_dir, infiles, sources, folder, fmt, timer=timer)
+            else:
+                result = RESULT_CACHE.store(key, infiles, folder, fmt, stream=stream, timer=timer, **settings)
+    except Exception as e:
+        import traceback, sys
+        traceback.print_exc(file=sys.stderr)
+        error = f"{type(e).__name__}: {e}"
+        write_job_status(folder, state="failed", error=error, profile=list(PROFILE_FILES) if profile else [])
+        log_event("conversion_failed", logging.ERROR, job_id=job_id, error=error, **timer.summary())
+        METRICS.inc("converter_conversions_total", outcome="failed", **labels)
+    else:
+        summary = timer.summary()
+        # seconds spent in each stage
+        timings = {s["stage"]: round(s["wall_s"], 3) for s in summary["stages"]}
+        write_job_status(folder, state="done", stage="done", result=result, timings=timings, metrics=summary,
+                         profile=list(PROFILE_FILES) if profile else [])
+        log_event("conversion", job_id=job_id, format=fmt, stream=stream, files=len(infiles),
+                  n_nodes=result["n_nodes"], n_edges=result["n_edges"], **summary)
+        METRICS.inc("converter_conversions_total", outcome="done", **labels)
+        METRICS.observe("converter_conversion_duration_seconds", summary["wall_s"], **labels)
+        read = next((s for s in summary["stages"] if s["stage"] == "read"), {})
+        METRICS.inc("converter_input_rows_total", read.get("rows_out") or 0, **labels)
+        METRICS.inc("converter_input_bytes_total", sum(os.path.getsize(p) for p in infiles), **labels)
+        METRICS.inc("converter_output_nodes_total", result["n_nodes"], **labels)
+        METRICS.inc("converter_output_edges_total", result["n_edges"], **labels)
+    finally:
+        METRICS.flush()
+
+
+def _graph_mode_label(graph_mode) -> str:
+    # convert_many treats anything else as org_event; keeps label values bounded
+    mode = (graph_mode or "").lower().strip()
+    return mode if mode in ("org_org", "custom_ab") else "org_event"
+
+
+_job_pool = None
+_job_pool_lock = threading.Lock()
+
+
+def _job_finished(folder, future):
+    METRICS.inc("converter_conversions_in_flight", -1)
+    # a worker that died (e.g. OOM-killed) never got to record the failure
+    if future.exception() is not None:
+        if isinstance(future.exception(), BrokenProcessPool):
+            _drop_job_pool()
+        write_job_status(folder, state="failed", error="The conversion process died.")
+        status = read_job_status(folder) or {}
+        METRICS.inc("converter_conversions_total", outcome="died", format=status.get("fmt", ""),
+                    graph_mode=_graph_mode_label(status.get("settings", {}).get("graph_mode")))
+    METRICS.flush()
+
+
+def _drop_job_pool():
+    global _job_pool
+    with _job_pool_lock:
+        _job_pool = None
+
+
+def submit_job(folder, key, infiles, fmt, stream, settings, profile=False, project=None):
+    """
+    Queue a conversion whose output goes to the job folder `folder`
+    (profiled if `profile`; see _run_job for `project`).
+    """
+    global _job_pool
+    with _job_pool_lock:
+        if _job_pool is None:
+            _job_pool = ProcessPoolExecutor(
+                max_workers=max(1, JOB_WORKERS // WEB_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=JOB_MAX_TASKS or None,
+            )
+        pool = _job_pool
+    write_job_status(folder, state="queued", stage="queued")
+    try:
+        future = pool.submit(_run_job, folder, key, infiles, fmt, stream, settings, profile, project)
+    except BrokenProcessPool:
+        _drop_job_pool()
+        raise RuntimeError("The conversion workers are restarting; try again.")
+    METRICS.inc("converter_conversions_in_flight")
+    future.add_done_callback(lambda f: _job_finished(folder, f))
+
+
+def shutdown_pools(wait=True):
+    """
+    Stop this process's job and reader pools. With wait, queued and running
+    conversions finish first (used when a gunicorn worker is recycled).
+    """
+    global _job_pool, _read_pool
+    with _job_pool_lock:
+        job_pool, _job_pool = _job_pool, None
+    if job_pool is not None:
+        job_pool.shutdown(wait=wait)
+    with _read_pool_lock:
+        read_pool, _read_pool = _read_pool, None
+    if read_pool is not None:
+        read_pool.shutdown(wait=wait)
+
+
+def sweep_jobs(ttl=JOB_TTL_SECONDS):
+    """Remove job folders, and leftover temp results, older than `ttl` seconds."""
+    cutoff = time.time() - ttl
+    for folder, expired in ((JOBS_FOLDER, _JOB_ID_RE.match), (RESULT_CACHE.folder, lambda n: n.endswith(".tmp"))):
+        if not os.path.isdir(folder):
+            continue
+        with os.scandir(folder) as it:
+            for e in it:
+                try:
+                    stale = expired(e.name) and e.stat().st_mtime < cutoff
+                except FileNotFoundError:
+                    continue
+                if stale:
+                    shutil.rmtree(e.path, ignore_errors=True)
+
+
+_janitor = None
+_janitor_lock = threading.Lock()
+
+
+def _janitor_loop():
+    while True:
+        try:
+            sweep_jobs()
+        except Exception:
+            import traceback, sys
+            traceback.print_exc(file=sys.stderr)
+        time.sleep(JANITOR_INTERVAL_SECONDS)
+
+
+def start_janitor():
+    """
+    Start the sweeping thread once per server process. Called from the
+    request path rather than at import, so reader processes (which import
+    this module) don't run one.
+    """
+    global _janitor
+    with _janitor_lock:
+        if _janitor is None:
+            _janitor = threading.Thread(target=_janitor_loop, name="job-janitor", daemon=True)
+            _janitor.start()
+
+
+# ------------------ project graphs ------------------
+#
+# A project is a graph that grows one upload at a time. Its folder keeps
+# project.json (settings, file list, merged header, resolved columns) and
+# the combined aggregate of all its files (state-<n>.pkl). Adding files maps
+# only the new ones and merges their partial into the stored state, touching
+# just the groups they share with it - the same graph as converting every
+# file again. Only when the merged header changes how columns resolve (say,
+# the first file with a `sector` column) is the state rebuilt from the files
+# themselves, which all projects share in files/ under their digest.
+# Nothing but the converter writes the pickles, so loading them is safe.
+
+PROJECTS_FOLDER = os.path.join(OUTPUT_FOLDER, "projects")
+PROJECT_META = "project.json"
+PROJECT_FILES_FOLDER = os.path.join(PROJECTS_FOLDER, "files")
+# bump when the aggregate tables change; older states are rebuilt
+PROJECT_STATE_VERSION = 1
+PROJECT_SETTINGS = ("graph_mode", "mapping", "src_col", "dst_col", "edge_label_col")
+
+
+def project_folder(project_id: str):
+    """The folder of `project_id`, or None if it isn't a well-formed ID."""
+    if not _JOB_ID_RE.match(project_id or ""):
+        return None
+    return os.path.join(PROJECTS_FOLDER, project_id)
+
+
+def read_project(folder: str):
+    try:
+        with open(os.path.join(folder, PROJECT_META)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_project(folder: str, meta: dict):
+    path = os.path.join(folder, PROJECT_META)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, path)
+
+
+def create_project(settings: dict) -> str:
+    """A new, empty project converting with `settings` (PROJECT_SETTINGS)."""
+    settings = {k: settings.get(k) for k in PROJECT_SETTINGS}
+    if settings["graph_mode"] == "custom_ab" and (not settings["src_col"] or not settings["dst_col"]):
+        raise RuntimeError("custom_ab mode requires src_col and dst_col")
+    project_id = uuid.uuid4().hex
+    folder = project_folder(project_id)
+    os.makedirs(folder)
+    _write_project(folder, {
+        "project_id": project_id,
+        "created": time.time(),
+        "updated": time.time(),
+        "settings": settings,
+        "files": [],
+        "columns": [],
+        "resolved": None,
+        "state": None,
+        "state_version": PROJECT_STATE_VERSION,
+        "n_nodes": 0,
+        "n_edges": 0,
+    })
+    return project_id
+
+
+class project_lock:
+    """Exclusive lock on a project, across processes."""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+
+    def __enter__(self):
+        import fcntl
+        self.file = open(os.path.join(self.folder, ".lock"), "a")
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+
+def _store_project_file(path: str) -> str:
+    """Keep an upload in the shared project files; its name there."""
+    name = f"{file_digest(path)}{os.path.splitext(path)[1].lower()}"
+    dst = os.path.join(PROJECT_FILES_FOLDER, name)
+    if not os.path.exists(dst):
+        os.makedirs(PROJECT_FILES_FOLDER, exist_ok=True)
+        tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(path, tmp)
+        except OSError:
+            shutil.copyfile(path, tmp)
+        os.replace(tmp, dst)
+    return name
+
+
+def update_project(folder: str, infiles, sources, outdir: str, fmt="gephi", timer=None) -> dict:
+    """
+    Add `infiles` (uploaded as `sources`) to the project in `folder` and
+    write its whole graph to `outdir`. Reads only the new files unless the
+    columns resolve differently now. Returns a result like ResultCache.store.
+    """
+    timer = timer or StageTimer(sections=False)
+    with project_lock(folder):
+        meta = read_project(folder)
+        settings = meta["settings"]
+        timer.start("read")
+        _check_paths(infiles)
+
+        # keep the files, once however many projects add them: a later
+        # header change rebuilds from them
+        first_no = len(meta["files"])
+        added = [
+            {"name": name, "file": _store_project_file(path), "added": time.time()}
+            for path, name in zip(infiles, sources)
+        ]
+
+        columns = sorted(set(meta["columns"]) | set(union_columns(infiles)))
+        aggregate, resolved, needed = resolve_aggregate(columns, **settings)
+        incremental = (
+            meta["state"] is not None
+            and meta["state_version"] == PROJECT_STATE_VERSION
+            and same_resolution(meta["resolved"], resolved)
+        )
+        todo = added if incremental else meta["files"] + added
+        parts, rows, readers = map_files([os.path.join(PROJECT_FILES_FOLDER, entry["file"]) for entry in todo],
+                                         aggregate, resolved, needed, first_file=first_no if incremental else 0,
+                                         timer=timer)
+        timer.note(readers=readers)
+
+        timer.start("build")
+        total = aggregate.combine(parts)
+        if incremental:
+            total = merge_into(pd.read_pickle(os.path.join(folder, meta["state"])), total)
+        # the stored state was resolved against an older header
+        total = aggregate(resolved, total.tables)
+        nodes_df, edges_df = total.to_graph()
+        timer.rows_out(len(nodes_df) + len(edges_df))
+        nodes_name, edges_name, n_nodes, n_edges = write_graph_outputs(
+            nodes_df, edges_df, outdir, fmt, settings["graph_mode"], timer)
+
+        state = f"state-{first_no + len(added)}.pkl"
+        tmp = os.path.join(folder, f"{state}.{os.getpid()}.tmp")
+        pd.to_pickle(total, tmp)
+        os.replace(tmp, os.path.join(folder, state))
+
+        old_state = meta["state"]
+        meta.update(
+            files=meta["files"] + added,
+            columns=columns,
+            resolved=resolved,
+            state=state,
+            state_version=PROJECT_STATE_VERSION,
+            n_nodes=n_nodes,
+            n_edges=n_edges,
+            updated=time.time(),
+        )
+        _write_project(folder, meta)
+        if old_state and old_state != state:
+            try:
+                os.remove(os.path.join(folder, old_state))
+            except FileNotFoundError:
+                pass
+
+    return {
+        "files": [nodes_name, edges_name],
+        "n_nodes": n_nodes,
+        "n_edges": n_edges,
+        **precompress(outdir, [nodes_name, edges_name]),
+        "cached": False,
+        "project": {
+            "project_id": meta["project_id"],
+            "files": len(meta["files"]),
+            "rows_read": rows,
+            "rebuilt": not incremental and first_no > 0,
+        },
+    }
+
+
+# ------------------ Flask routes ------------------
+
+@bp.route("/download/<job_id>/<path:filename>")
+def download(job_id, filename):
+    """
+    An output file of a finished job. Text files go out zstd / gzip encoded
+    when the client accepts it - from the sidecar written at conversion
+    time, else compressed on the fly. Each encoding has its own strong ETag
+    (If-None-Match gets a 304 without touching the file), and stored files
+    serve byte ranges. bundle.zip / bundle.tar.zst stream all the outputs
+    and a manifest as one archive.
+    """
+    folder = job_folder(job_id)
+    status = read_job_status(folder) if folder else None
+    result = (status or {}).get("result")
+    if not result:
+        abort(404)
+    if filename in PROFILE_FILES:
+        if filename not in status.get("profile", []) or not is_admin(request):
+            abort(404)
+        return send_file(os.path.join(folder, filename), mimetype=PROFILE_FILES[filename], as_attachment=True)
+    if filename in BUNDLES:
+        mimetype, writer = BUNDLES[filename]
+        rv = Response(writer(folder, result["files"], bundle_manifest(job_id, status)), mimetype=mimetype)
+        rv.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return rv
+    if filename not in result["files"]:
+        abort(404)
+
+    path = os.path.join(folder, filename)
+    ext = os.path.splitext(filename)[1].lower()
+    mimetype = CONTENT_TYPES.get(ext, "application/octet-stream")
+    encoding = negotiate_encoding(request.accept_encodings, ext)
+    etag = result.get("etags", {}).get(filename) or file_digest(path)
+    if encoding:
+        etag = f"{etag}-{encoding}"
+    vary = {"Vary": "Accept-Encoding"} if ext in COMPRESSIBLE_EXT else {}
+
+    if request.if_none_match.contains_weak(etag):
+        rv = Response(status=304, headers=vary)
+        rv.set_etag(etag)
+        return rv
+
+    if not os.path.isfile(path):
+        abort(404)
+    if encoding is None or encoding in result.get("encodings", {}).get(filename, []):
+        sidecar = path + DOWNLOAD_ENCODINGS[encoding] if encoding else path
+        rv = send_file(sidecar, mimetype=mimetype, as_attachment=True, download_name=filename,
+                       etag=etag, conditional=True)
+    else:
+        rv = Response(encode_chunks(_read_chunks(path), encoding), mimetype=mimetype)
+        rv.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        rv.set_etag(etag)
+    if encoding:
+        rv.headers["Content-Encoding"] = encoding
+    rv.headers.update(vary)
+    return rv
+
+
+def _job_urls(job_id: str, result: dict) -> dict:
+    nodes_file, edges_file = result["files"]
+    return {
+        "nodes_url": f"{PUBLIC_URL}/download/{job_id}/{nodes_file}",
+        "edges_url": f"{PUBLIC_URL}/download/{job_id}/{edges_file}",
+        "bundle_url": f"{PUBLIC_URL}/download/{job_id}/bundle.zip",
+    }
+
+
+@bp.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Progress of a conversion: state (queued/running/done/failed) and stage."""
+    folder = job_folder(job_id)
+    status = read_job_status(folder) if folder else None
+    if status is None:
+        return jsonify({"error": f"Unknown job '{job_id}'."}), 404
+    status = {k: v for k, v in status.items() if k != "result"}
+    return jsonify(dict(status, job_id=job_id)), 200
+
+
+@bp.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    folder = job_folder(job_id)
+    status = read_job_status(folder) if folder else None
+    if status is None:
+        return jsonify({"error": f"Unknown job '{job_id}'."}), 404
+    if status["state"] == "failed":
+        return jsonify({"error": f"Conversion failed: {status.get('error')}", **_profile_urls(job_id, status)}), 500
+    if status["state"] != "done":
+        return jsonify({"job_id": job_id, "state": status["state"], "stage": status.get("stage")}), 202
+
+    result = status["result"]
+    msg = f"Converted ({result['n_nodes']} nodes, {result['n_edges']} edges) → format: {status['fmt'].upper()}"
+    return jsonify(dict(
+        _job_urls(job_id, result),
+        message=msg,
+        job_id=job_id,
+        cached=result["cached"],
+        metrics=status.get("metrics"),
+        **_profile_urls(job_id, status),
+        **({"project": result["project"]} if "project" in result else {}),
+    )), 200
+
+
+def _profile_urls(job_id: str, status: dict) -> dict:
+    # downloading them takes the admin token as well
+    names = status.get("profile")
+    return {"profile_urls": {n: f"{PUBLIC_URL}/download/{job_id}/{n}" for n in names}} if names else {}
+
+
+@bp.before_app_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@bp.after_app_request
+def _count_request(response):
+    # the time to build the response; a streamed body is still being sent
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    took = time.perf_counter() - g.get("request_started", time.perf_counter())
+    METRICS.inc("converter_http_requests_total", route=route, method=request.method, status=response.status_code)
+    METRICS.observe("converter_http_request_duration_seconds", took, route=route)
+    METRICS.start_flusher()
+    return response
+
+
+@bp.route("/metrics")
+def prometheus_metrics():
+    """Every server process's counters in the Prometheus text format."""
+    return Response(METRICS.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@bp.route("/cache/stats")
+def cache_stats():
+    return jsonify({"results": RESULT_CACHE.stats()}), 200
+
+
+@bp.route("/inspect", methods=["POST"])
+def inspect():
+    """
+    Inspect uploaded file and return column headers, a row count, a few
+    sample rows, a profile of each column and suggested mapping. Allows
+    frontend to build mapping UI dynamically.
+
+    The file is scanned as the request body streams in - nothing is saved:
+    CSV rows are counted from line breaks, .xlsx rows from the sheet's
+    dimensions, and the profile covers a bounded sample of the rows.
+    """
+    try:
+        boundary = request.mimetype_params.get("boundary") if request.mimetype == "multipart/form-data" else None
+        filename, scanner = (
+            scan_upload(request.stream, boundary.encode(), size=request.content_length) if boundary else (None, None)
+        )
+        if not filename:
+            return jsonify({"error": "No file uploaded."}), 400
+
+        ext = os.path.splitext(filename)[1].lower()
+        if scanner is None:
+            return jsonify({"error": f"Unsupported extension '{ext}'. Allowed: {sorted(ALLOWED_EXT)}"}), 415
+
+        return jsonify(scanner.result()), 200
+
+    except Exception as e:
+        import traceback, sys
         traceback.print_exc(file=sys.stderr)
         return jsonify({"error": f"Failed to inspect file: {type(e).__name__}: {e}"}), 500
 
 
-@app.route("/upload", methods=["POST"])
+@bp.route("/upload", methods=["POST"])
 def upload():
     try:
         fmt = (request.form.get("format") or "gephi").lower().strip()
-        if fmt not in {"gephi", "kumu"}:
+        if fmt not in OUTPUT_FORMATS:
             fmt = "gephi"
         
         # Get graph mode and mapping
@@ -798,37 +3974,164 @@ def upload():
         dst_col = request.form.get("dst_col")
         edge_label_col = request.form.get("edge_label_col")
 
-        files = request.files.getlist("files") or request.files.getlist("file")
-        files = [f for f in files if getattr(f, "filename", "")]
-        if not files:
-            return jsonify({"error": "No files uploaded. Use form-data with one or more 'files' parts."}), 400
-
-        saved_paths = []
-        for f in files:
-            raw = secure_filename(f.filename or "uploaded.csv")
-            ext = os.path.splitext(raw)[1].lower()
-            if ext not in ALLOWED_EXT:
-                return jsonify({"error": f"Unsupported extension for '{raw}'. Allowed: {sorted(ALLOWED_EXT)}"}), 415
-            save_path = _unique_path(UPLOAD_FOLDER, raw)
-            f.save(save_path)
-            saved_paths.append(save_path)
-
-        nodes_file, edges_file, n_nodes, n_edges = convert_many(
-            saved_paths, OUTPUT_FOLDER, fmt, 
-            mapping=mapping, 
+        # Optional low-memory mode for very large CSV uploads
+        stream = (request.form.get("stream") or "").lower().strip() in {"1", "true", "yes", "on"}
+
+        # Admin-only: run the conversion under the profiler (never from cache)
+        profile = (request.form.get("profile") or "").lower().strip() in {"1", "true", "yes", "on"}
+        if profile and not is_admin(request):
+            return jsonify({"error": "Profiling needs the admin token (Authorization: Bearer ...)."}), 403
+        if profile and not take_profile_slot():
+            return jsonify({"error": f"At most {PROFILES_PER_HOUR} profiled conversions per hour; try later."}), 429
+
+        timer = StageTimer(sections=False)
+        timer.start("save")
+        saved_paths, sources, error = _save_form_files()
+        if error:
+            return error
+
+        settings = dict(
+            mapping=mapping,
             graph_mode=graph_mode,
             src_col=src_col,
             dst_col=dst_col,
-            edge_label_col=edge_label_col
+            edge_label_col=edge_label_col,
         )
+        start_janitor()
+        job_id, job_path = new_job()
+        try:
+            timer.start("key")
+            key = result_key(saved_paths, fmt, **settings)
+            write_job_status(job_path, fmt=fmt, settings=settings, sources=sources)
+            timer.start("lookup")
+            result = None if profile else RESULT_CACHE.lookup(key, job_path)
+            if result is not None:
+                status = write_job_status(job_path, state="done", stage="done", result=result)
+            else:
+                timer.start("submit")
+                submit_job(job_path, key, saved_paths, fmt, stream, settings, profile=profile)
+                status = read_job_status(job_path)
+        except Exception:
+            shutil.rmtree(job_path, ignore_errors=True)
+            raise
+        # only the request's own steps: the conversion's stages are in the job's result
+        log_event("upload", job_id=job_id, format=fmt, graph_mode=graph_mode, stream=stream, profile=profile, files=len(sources),
+                  bytes=sum(os.path.getsize(p) for p in saved_paths), cached=result is not None,
+                  request_timing=timer.summary())
+
+        # the conversion runs in the background; poll status_url, then
+        # fetch result_url for the download links
+        return jsonify({
+            "job_id": job_id,
+            "state": status["state"],
+            "stage": status["stage"],
+            "status_url": f"{PUBLIC_URL}/jobs/{job_id}",
+            "result_url": f"{PUBLIC_URL}/jobs/{job_id}/result",
+        }), 202
+
+    except Exception as e:
+        import traceback, sys
+        traceback.print_exc(file=sys.stderr)
+        return jsonify({"error": f"Conversion failed: {type(e).__name__}: {e}"}), 500
 
-        msg = f"Converted ({n_nodes} nodes, {n_edges} edges) → format: {fmt.upper()}"
+
+def _save_form_files():
+    """(saved paths, secure names, None) for the request's files, or an error response third."""
+    files = request.files.getlist("files") or request.files.getlist("file")
+    files = [f for f in files if getattr(f, "filename", "")]
+    if not files:
+        return [], [], (jsonify({"error": "No files uploaded. Use form-data with one or more 'files' parts."}), 400)
+
+    saved_paths, sources = [], []
+    for f in files:
+        raw = secure_filename(f.filename or "uploaded.csv")
+        ext = os.path.splitext(raw)[1].lower()
+        if ext not in ALLOWED_EXT:
+            return [], [], (jsonify({"error": f"Unsupported extension for '{raw}'. Allowed: {sorted(ALLOWED_EXT)}"}), 415)
+        saved_paths.append(_save_upload(f, UPLOAD_FOLDER, raw))
+        sources.append(raw)
+    return saved_paths, sources, None
+
+
+@bp.route("/projects", methods=["POST"])
+def new_project():
+    """
+    Create a project: a graph that later uploads to /projects/<id>/files
+    extend. Takes the /upload form's graph_mode, mapping, src_col, dst_col
+    and edge_label_col.
+    """
+    try:
+        mapping_raw = request.form.get("mapping")
+        settings = {k: request.form.get(k) for k in PROJECT_SETTINGS}
+        settings["graph_mode"] = (settings["graph_mode"] or "org_event").lower().strip()
+        settings["mapping"] = json.loads(mapping_raw) if mapping_raw else None
+        project_id = create_project(settings)
+    except (ValueError, RuntimeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(_project_info(project_folder(project_id))), 201
+
+
+@bp.route("/projects/<project_id>")
+def project_status(project_id):
+    folder = project_folder(project_id)
+    meta = read_project(folder) if folder else None
+    if meta is None:
+        return jsonify({"error": f"Unknown project '{project_id}'."}), 404
+    return jsonify(_project_info(folder)), 200
+
+
+def _project_info(folder: str) -> dict:
+    meta = read_project(folder)
+    project_id = meta["project_id"]
+    return {
+        "project_id": project_id,
+        "settings": meta["settings"],
+        "files": [f["name"] for f in meta["files"]],
+        "n_nodes": meta["n_nodes"],
+        "n_edges": meta["n_edges"],
+        "updated": meta["updated"],
+        "files_url": f"{PUBLIC_URL}/projects/{project_id}/files",
+    }
+
+
+@bp.route("/projects/<project_id>/files", methods=["POST"])
+def add_project_files(project_id):
+    """
+    Add files to a project and convert its whole graph (as `format`). Runs
+    as a job like /upload; only the new files are read.
+    """
+    folder = project_folder(project_id)
+    meta = read_project(folder) if folder else None
+    if meta is None:
+        return jsonify({"error": f"Unknown project '{project_id}'."}), 404
+    try:
+        fmt = (request.form.get("format") or "gephi").lower().strip()
+        if fmt not in OUTPUT_FORMATS:
+            fmt = "gephi"
+        saved_paths, sources, error = _save_form_files()
+        if error:
+            return error
+
+        start_janitor()
+        job_id, job_path = new_job()
+        try:
+            write_job_status(job_path, fmt=fmt, settings=meta["settings"], sources=sources, project_id=project_id)
+            submit_job(job_path, None, saved_paths, fmt, False, meta["settings"], project=(folder, sources))
+            status = read_job_status(job_path)
+        except Exception:
+            shutil.rmtree(job_path, ignore_errors=True)
+            raise
+        log_event("project_upload", job_id=job_id, project_id=project_id, format=fmt, files=len(sources),
+                  bytes=sum(os.path.getsize(p) for p in saved_paths))
 
         return jsonify({
-            "message": msg,
-            "nodes_url": f"http://127.0.0.1:5002/download/{nodes_file}",
-            "edges_url": f"http://127.0.0.1:5002/download/{edges_file}",
-        }), 200
+            "job_id": job_id,
+            "project_id": project_id,
+            "state": status["state"],
+            "stage": status["stage"],
+            "status_url": f"{PUBLIC_URL}/jobs/{job_id}",
+            "result_url": f"{PUBLIC_URL}/jobs/{job_id}/result",
+        }), 202
 
     except Exception as e:
         import traceback, sys
@@ -836,9 +4139,36 @@ def upload():
         return jsonify({"error": f"Conversion failed: {type(e).__name__}: {e}"}), 500
 
 
+# ------------------ app factory ------------------
+
+def create_app() -> Flask:
+    """
+    The WSGI application. Production serves it with gunicorn (see
+    gunicorn.conf.py), which imports this module - and pandas - once in the
+    master and forks the workers from it.
+    """
+    app = Flask(__name__)
+
+    # CORS configuration for development - allow all origins
+    CORS(app, 
+         resources={r"/*": {
+             "origins": "*",
+             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+             "allow_headers": ["Content-Type", "Authorization"],
+             "supports_credentials": False
+         }}
+    )
+
+    app.register_blueprint(bp)
+    return app
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
-    # Use environment PORT for production (Render, Railway, etc.)
+    # Local development server; production runs `gunicorn -c gunicorn.conf.py`.
     # Falls back to 5002 for local development (avoiding macOS AirPlay conflict)
     port = int(os.environ.get("PORT", 5002))
-    debug_mode = os.environ.get("FLASK_ENV", "development") == "development"
+    debug_mode = os.environ.get("FLASK_ENV") == "development"
     app.run(host="0.0.0.0", port=port, debug=debug_mode)
@@ -0,0 +1,63 @@
+# backend/gunicorn.conf.py
+#
+# Production server for converter.py:
+#
+#   cd backend
+#   gunicorn -c gunicorn.conf.py
+#
+# Every setting can be overridden from the environment (or on the command
+# line, e.g. `--workers 8`).
+
+import multiprocessing
+import os
+
+wsgi_app = "converter:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', '5002')}"
+
+# Import converter.py (Flask, pandas, numpy, pyarrow) once in the master and
+# fork the workers from it: faster boots, and the read-only pages of those
+# libraries are shared between workers.
+preload_app = True
+
+# Preforked workers, each with a few threads. Requests are short - the
+# conversions themselves run in the workers' job pools, which share
+# CONVERTER_JOB_WORKERS processes between them - so threads mostly wait on
+# uploads and downloads.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+
+# No request-count recycling: a stock worker that hits max_requests closes
+# the keep-alive connections it has accepted but not read yet, and their
+# clients see a reset. The memory pandas fragments lives in the job
+# processes, which are replaced between conversions instead (see
+# CONVERTER_JOB_MAX_TASKS). Set GUNICORN_MAX_REQUESTS to turn it back on.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# Uploads of large files can take a while to arrive on slow links.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+# How long a stopped worker gets to finish its queued conversions.
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "300"))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # size this worker's job pool as its share of CONVERTER_JOB_WORKERS,
+    # whichever way the worker count was set
+    import converter
+
+    converter.WEB_WORKERS = server.cfg.workers
+
+
+def worker_exit(server, worker):
+    # let this worker's queued conversions finish instead of leaving their
+    # jobs "running" forever
+    import converter
+
+    converter.shutdown_pools(wait=True)
+    # the last few seconds of counters, since the periodic flush
+    converter.METRICS.flush()
@@ -0,0 +1,108 @@
+# backend/load_test.py
+#
+# Hammer a running converter with concurrent clients and report throughput
+# and latency, e.g. to compare the dev server against gunicorn:
+#
+#   python converter.py                                 # dev server, :5002
+#   python load_test.py --url http://127.0.0.1:5002
+#
+#   gunicorn -c gunicorn.conf.py                        # same port
+#   python load_test.py --url http://127.0.0.1:5002
+#
+# --mode inspect posts a file to /inspect (parsed in the request).
+# --mode convert posts it to /upload, polls the job and downloads the nodes
+# file - the full round trip the upload panel makes.
+
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+import urllib.request
+import uuid
+
+
+def multipart(field: str, path: str):
+    boundary = uuid.uuid4().hex
+    with open(path, "rb") as f:
+        payload = f.read()
+    body = b"".join([
+        f"--{boundary}\r\n".encode(),
+        f'Content-Disposition: form-data; name="{field}"; filename="{os.path.basename(path)}"\r\n'.encode(),
+        b"Content-Type: application/octet-stream\r\n\r\n",
+        payload,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ])
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def call(url: str, body=None, content_type=None):
+    req = urllib.request.Request(url, data=body)
+    if content_type:
+        req.add_header("Content-Type", content_type)
+    with urllib.request.urlopen(req, timeout=300) as resp:
+        return json.loads(resp.read()) if resp.headers.get_content_type() == "application/json" else resp.read()
+
+
+def inspect_once(base: str, form):
+    call(f"{base}/inspect", *form["file"])
+
+
+def convert_once(base: str, form):
+    job = call(f"{base}/upload", *form["files"])
+    while call(f"{base}/jobs/{job['job_id']}")["state"] not in ("done", "failed"):
+        time.sleep(0.05)
+    result = call(f"{base}/jobs/{job['job_id']}/result")
+    # the URLs carry the public host; fetch from the server under test
+    call(base + "/download/" + result["nodes_url"].split("/download/", 1)[1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Concurrent load test for converter.py.")
+    ap.add_argument("--url", default="http://127.0.0.1:5002")
+    ap.add_argument("--file", default=os.path.join("uploads", "EVT-2025-AICONF-150.csv"))
+    ap.add_argument("--mode", choices=("inspect", "convert"), default="inspect")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds")
+    args = ap.parse_args()
+
+    form = {"file": multipart("file", args.file), "files": multipart("files", args.file)}
+    once = inspect_once if args.mode == "inspect" else convert_once
+    once(args.url, form)  # warm up (and fill the server's caches)
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                once(args.url, form)
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.mode} x{args.concurrency} against {args.url} for {elapsed:.1f}s")
+    print(f"  completed  {len(latencies)}  ({len(latencies) / elapsed:.1f} req/s)")
+    print(f"  errors     {len(errors)}" + (f"  e.g. {errors[0]}" if errors else ""))
+    if latencies:
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"  latency    p50 {statistics.median(latencies) * 1000:.0f}ms  p95 {p95 * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
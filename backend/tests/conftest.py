@@ -0,0 +1,42 @@
+# backend/tests/conftest.py
+#
+# Run from the repository root or backend/:
+#
+#   python -m pytest backend/tests
+#
+# converter.py keeps its uploads/, outputs/ and cache/ folders relative to
+# the working directory, so the session runs in a scratch directory of its
+# own and never touches the real ones.
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(BACKEND, "tests", "fixtures")
+
+_WORKDIR = tempfile.mkdtemp(prefix="converter-tests-")
+os.chdir(_WORKDIR)
+os.environ.setdefault("CONVERTER_LOG_LEVEL", "WARNING")
+sys.path.insert(0, BACKEND)
+
+
+def fixture(name: str) -> str:
+    return os.path.join(FIXTURES, name)
+
+
+@pytest.fixture
+def workdir():
+    """The session's scratch directory (the converter's working directory)."""
+    return _WORKDIR
+
+
+def pytest_sessionfinish(session, exitstatus):
+    converter = sys.modules.get("converter")
+    if converter is not None:
+        converter.shutdown_pools()
+    os.chdir(BACKEND)
+    shutil.rmtree(_WORKDIR, ignore_errors=True)
@@ -0,0 +1,307 @@
+# backend/tests/reference.py
+#
+# Row-by-row reference versions of the graph builders: the original
+# (pre-vectorization) converter code, kept only to check the vectorized,
+# chunked and map-reduce paths against. One change from the original:
+# mapped columns are used everywhere their logical name is read.
+
+import json
+import os
+
+import pandas as pd
+
+from converter import canonical_key, first_non_empty, most_common_non_empty, norm_str, pretty_name, slug
+
+NODE_COLUMNS = [
+    "Id", "Label", "type",
+    "org_type", "org_sector",
+    "city", "state", "country",
+    "event_date", "event_id",
+]
+
+EDGE_COLUMNS = [
+    "Source", "Target", "edge_type",
+    "event_id", "event_date",
+    "connection_type", "description",
+    "weight",
+]
+
+
+def read_one(path: str) -> pd.DataFrame:
+    ext = os.path.splitext(path)[1].lower()
+    df = pd.read_csv(path) if ext == ".csv" else pd.read_excel(path)
+    df = df.rename(columns=lambda c: str(c).strip()).fillna("")
+    df["__source_file__"] = os.path.basename(path)
+    return df
+
+
+def merge_files(paths) -> pd.DataFrame:
+    frames = [read_one(p) for p in paths]
+    all_cols = set()
+    for f in frames:
+        all_cols |= set(f.columns)
+    frames = [f.reindex(columns=sorted(all_cols)).fillna("") for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def build_graph_from_responses(df: pd.DataFrame, mapping=None):
+    mapping = mapping or {}
+    fields = {k.lower(): v for k, v in mapping.items() if k != "extraAttrs"}
+    cols_lower = {c.lower(): c for c in df.columns}
+
+    def column(name):
+        user_col = fields.get(name)
+        if user_col and user_col in df.columns:
+            return user_col
+        return cols_lower.get(name)
+
+    def col(name, required=False):
+        c = column(name)
+        if c is not None:
+            return df[c].astype(str)
+        if required:
+            raise RuntimeError(f"Required column '{name}' not found. Available columns: {list(df.columns)}")
+        return pd.Series([""] * len(df))
+
+    def first_in(group, name):
+        c = column(name)
+        return first_non_empty(group[c]) if c else ""
+
+    org_name = col("orgname", required=True)
+    sector = col("sector")
+    event_id = col("eventid", required=True)
+    event_name = col("eventname", required=True)
+    event_date = col("eventdate", required=True)
+
+    org_key = org_name.apply(canonical_key)
+    event_key = pd.Series([canonical_key(eid) or canonical_key(ename) for eid, ename in zip(event_id, event_name)])
+
+    # ---------- event nodes ----------
+    event_rows = []
+    for key, group in df.groupby(event_key):
+        if not key:
+            continue
+        any_eid = first_in(group, "eventid")
+        any_name = first_in(group, "eventname")
+        event_rows.append((
+            f"evt_{slug(key)}", pretty_name(any_name or any_eid), "event",
+            "", "",
+            first_in(group, "addresscity"), first_in(group, "addressstate"), first_in(group, "addresscountry"),
+            first_in(group, "eventdate"), any_eid,
+        ))
+    event_df = pd.DataFrame(event_rows, columns=NODE_COLUMNS)
+
+    # ---------- sector nodes ----------
+    sector_key = sector.apply(lambda s: canonical_key(s) if norm_str(s) else "")
+    sector_rows = []
+    for key, group in df.groupby(sector_key):
+        if not key:
+            continue
+        sector_col = column("sector")
+        label = most_common_non_empty(group[sector_col].apply(norm_str)) if sector_col else key
+        if not label:
+            continue
+        sector_rows.append((f"sector_{slug(key)}", label, "sector", "", "", "", "", "", "", ""))
+    sector_df = pd.DataFrame(sector_rows, columns=NODE_COLUMNS)
+
+    # ---------- org nodes ----------
+    extra_attrs = mapping.get("extraAttrs", [])
+    org_rows = []
+    for key, group in df.groupby(org_key):
+        if not key:
+            continue
+
+        def mode(name):
+            c = column(name)
+            return most_common_non_empty(group[c]) if c else ""
+
+        row = [
+            f"org_{slug(key)}", pretty_name(mode("orgname") or key), "org",
+            "", mode("sector"),
+            mode("addresscity"), mode("addressstate"), mode("addresscountry"),
+            "", "",
+        ]
+        for attr in extra_attrs:
+            row.append(most_common_non_empty(group[attr]) if attr in df.columns and len(group) else "")
+        org_rows.append(tuple(row))
+
+    # ---------- attendance edges ----------
+    att_edges = [
+        {
+            "Source": f"org_{slug(ok)}", "Target": f"evt_{slug(ek)}", "edge_type": "attendance",
+            "event_id": norm_str(eid), "event_date": norm_str(edate),
+            "connection_type": "", "description": "", "weight": 1,
+        }
+        for ok, ek, eid, edate in zip(org_key, event_key, event_id, event_date)
+        if ok and ek
+    ]
+    if att_edges:
+        attendance_df = (
+            pd.DataFrame(att_edges)
+            .groupby(["Source", "Target", "edge_type", "event_id", "event_date"], dropna=False)["weight"]
+            .sum()
+            .reset_index()
+        )
+        attendance_df["connection_type"] = ""
+        attendance_df["description"] = ""
+    else:
+        attendance_df = pd.DataFrame(columns=EDGE_COLUMNS)
+
+    # ---------- event -> sector edges ----------
+    event_sector_edges = []
+    for (ek, sk), group in df.groupby([event_key, sector_key]):
+        if not ek or not sk:
+            continue
+        event_sector_edges.append({
+            "Source": f"evt_{slug(ek)}", "Target": f"sector_{slug(sk)}", "edge_type": "event_sector",
+            "event_id": first_in(group, "eventid"), "event_date": first_in(group, "eventdate"),
+            "connection_type": "", "description": "",
+            "weight": len(org_key.loc[group.index].unique()),
+        })
+    event_sector_df = pd.DataFrame(event_sector_edges) if event_sector_edges else pd.DataFrame(columns=EDGE_COLUMNS)
+
+    # ---------- sector -> org edges ----------
+    sector_org_edges = []
+    for (sk, ok), group in df.groupby([sector_key, org_key]):
+        if not sk or not ok:
+            continue
+        sector_org_edges.append({
+            "Source": f"sector_{slug(sk)}", "Target": f"org_{slug(ok)}", "edge_type": "sector_org",
+            "event_id": first_in(group, "eventid"), "event_date": first_in(group, "eventdate"),
+            "connection_type": "", "description": "",
+            "weight": len(group),
+        })
+    sector_org_df = pd.DataFrame(sector_org_edges) if sector_org_edges else pd.DataFrame(columns=EDGE_COLUMNS)
+
+    # ---------- connection edges ----------
+    conn_edges = []
+    connections_col = column("connections")
+    if connections_col:
+        for _, row in df.iterrows():
+            base_ok = canonical_key(row.get(column("orgname"), ""))
+            if not base_ok:
+                continue
+            raw = norm_str(row.get(connections_col, ""))
+            if not raw or raw == "[]":
+                continue
+            try:
+                data = json.loads(raw)
+            except Exception:
+                try:
+                    data = json.loads(json.loads(raw))
+                except Exception:
+                    continue
+            if isinstance(data, dict):
+                data = [data]
+            if not isinstance(data, list):
+                continue
+            for conn in data:
+                try:
+                    org2 = (
+                        conn.get("organization")
+                        or conn.get("orgName")
+                        or conn.get("connectionOrg")
+                        or conn.get("connectionOrganization")
+                        or conn.get("connection_organization")
+                    )
+                    if not org2:
+                        continue
+                    ok2 = canonical_key(org2)
+                    if not ok2:
+                        continue
+                    target_id = f"org_{slug(ok2)}"
+                    org_rows.append((target_id, pretty_name(org2), "org", "", "", "", "", "", "", "") + ("",) * len(extra_attrs))
+                    conn_edges.append({
+                        "Source": f"org_{slug(base_ok)}", "Target": target_id, "edge_type": "connection",
+                        "event_id": norm_str(row.get(column("eventid"), "")),
+                        "event_date": norm_str(row.get(column("eventdate"), "")),
+                        "connection_type": norm_str(conn.get("connectionType") or conn.get("type") or ""),
+                        "description": norm_str(conn.get("description") or conn.get("notes") or ""),
+                        "weight": 1,
+                    })
+                except Exception:
+                    continue
+    if conn_edges:
+        connection_df = (
+            pd.DataFrame(conn_edges)
+            .groupby(EDGE_COLUMNS[:-1], dropna=False)["weight"]
+            .sum()
+            .reset_index()
+        )
+    else:
+        connection_df = pd.DataFrame(columns=EDGE_COLUMNS)
+
+    if org_rows:
+        org_df = pd.DataFrame(org_rows, columns=NODE_COLUMNS + extra_attrs)
+        agg = {c: first_non_empty for c in NODE_COLUMNS[1:] + extra_attrs}
+        agg["type"] = "first"
+        org_df = org_df.groupby("Id", as_index=False).agg(agg)
+    else:
+        org_df = pd.DataFrame(columns=NODE_COLUMNS)
+
+    nodes_df = pd.concat([event_df, sector_df, org_df], ignore_index=True)
+    edges_df = pd.concat([attendance_df, event_sector_df, sector_org_df, connection_df], ignore_index=True)
+    return nodes_df, edges_df
+
+
+def build_custom_edge_graph(df: pd.DataFrame, src_col: str, dst_col: str, edge_label_col: str = None, mapping=None):
+    mapping = mapping or {}
+    sources = df[src_col].astype(str).apply(norm_str)
+    targets = df[dst_col].astype(str).apply(norm_str)
+    if edge_label_col and edge_label_col in df.columns:
+        edge_labels = df[edge_label_col].astype(str).apply(norm_str)
+    else:
+        edge_labels = pd.Series([""] * len(df))
+
+    extra_attrs = mapping.get("extraAttrs", [])
+    node_rows = []
+    for name in [n for n in pd.concat([sources, targets]).unique() if n]:
+        is_source = name in sources.values
+        is_target = name in targets.values
+        row = {
+            "Id": f"node_{slug(canonical_key(name))}",
+            "Label": pretty_name(name),
+            "type": "both" if is_source and is_target else "source" if is_source else "target",
+        }
+        for attr in extra_attrs:
+            if attr in df.columns:
+                matches = df[(sources == name) | (targets == name)][attr]
+                row[attr] = first_non_empty(matches) if len(matches) > 0 else ""
+        node_rows.append(row)
+    nodes_df = pd.DataFrame(node_rows)
+
+    edge_rows = [
+        {
+            "Source": f"node_{slug(canonical_key(src))}",
+            "Target": f"node_{slug(canonical_key(dst))}",
+            "edge_type": norm_str(label) if label else "connection",
+            "weight": 1,
+        }
+        for src, dst, label in zip(sources, targets, edge_labels)
+        if src and dst
+    ]
+    if edge_rows:
+        edges_df = pd.DataFrame(edge_rows).groupby(["Source", "Target", "edge_type"], dropna=False)["weight"].sum().reset_index()
+    else:
+        edges_df = pd.DataFrame(columns=["Source", "Target", "edge_type", "weight"])
+    return nodes_df, edges_df
+
+
+def convert_many(infiles, outdir, fmt="gephi", mapping=None, graph_mode="org_event", src_col=None, dst_col=None, edge_label_col=None):
+    df = merge_files(infiles)
+    if graph_mode == "custom_ab":
+        nodes_df, edges_df = build_custom_edge_graph(df, src_col, dst_col, edge_label_col, mapping)
+    else:
+        nodes_df, edges_df = build_graph_from_responses(df, mapping)
+        if graph_mode == "org_org":
+            nodes_df = nodes_df[nodes_df["type"] == "org"]
+            edges_df = edges_df[edges_df["edge_type"] == "connection"]
+
+    os.makedirs(outdir, exist_ok=True)
+    if fmt == "kumu":
+        nodes_df = nodes_df.rename(columns={"Id": "id"})
+        edges_df = edges_df.rename(columns={"Source": "from", "Target": "to"})
+    names = (f"nodes_{fmt}.csv", f"edges_{fmt}.csv")
+    nodes_df.to_csv(os.path.join(outdir, names[0]), index=False)
+    edges_df.to_csv(os.path.join(outdir, names[1]), index=False)
+    return names
@@ -0,0 +1,153 @@
+# backend/tests/test_caches.py
+
+import os
+
+import pandas as pd
+import pytest
+
+import converter
+from conftest import fixture
+
+
+def _frame(n: int) -> pd.DataFrame:
+    return pd.DataFrame({"a": [f"value {i}" for i in range(n)]})
+
+
+def _age(path: str, seconds: int):
+    os.utime(path, (seconds, seconds))
+
+
+# ------------------ parse cache ------------------
+
+def test_memory_lru_evicts_least_recently_used(tmp_path):
+    size = converter.ParseCache._size(_frame(100))
+    cache = converter.ParseCache(str(tmp_path), disk_bytes=0, mem_bytes=2 * size)
+    cache.put("a", _frame(100))
+    cache.put("b", _frame(100))
+    assert cache.get("a") is not None  # now b is the least recently used
+    cache.put("c", _frame(100))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_memory_skips_frames_over_budget(tmp_path):
+    cache = converter.ParseCache(str(tmp_path), disk_bytes=0, mem_bytes=converter.ParseCache._size(_frame(10)))
+    cache.put("small", _frame(10))
+    cache.put("big", _frame(1000))
+    assert cache.get("big") is None
+    assert cache.get("small") is not None
+
+
+def test_disk_lru_evicts_oldest_touched(tmp_path):
+    cache = converter.ParseCache(str(tmp_path), disk_bytes=1 << 30, mem_bytes=0)
+    cache.put("a", _frame(1000))
+    cache.put("b", _frame(1000))
+    paths = {e.name.split(".")[0]: e.path for e in os.scandir(tmp_path)}
+    _age(paths["a"], 1000)
+    _age(paths["b"], 2000)
+    assert cache.get("a") is not None  # touched: b is the oldest now
+
+    cache.disk_bytes = sum(os.path.getsize(p) for p in paths.values())
+    cache.put("c", _frame(1000))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_disk_drops_entries_over_budget(tmp_path):
+    cache = converter.ParseCache(str(tmp_path), disk_bytes=100, mem_bytes=0)
+    cache.put("big", _frame(1000))
+    assert cache.get("big") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_partial_cache_round_trip(tmp_path):
+    cols = converter.resolve_custom_columns(["x", "y"], "x", "y")
+    part = converter.CustomEdgeAggregate.from_frame(pd.DataFrame({"x": ["a", "b"], "y": ["b", "c"]}), cols)
+    cache = converter.PartialCache(str(tmp_path), disk_bytes=1 << 20, mem_bytes=0)
+    cache.put("k", (part, 2))
+    cached, rows = cache.get("k")
+    assert rows == 2
+    assert cached.to_graph()[1].equals(part.to_graph()[1])
+
+
+# ------------------ projected reads ------------------
+
+@pytest.fixture
+def parse_cache(monkeypatch, tmp_path):
+    cache = converter.ParseCache(str(tmp_path / "parsed"), disk_bytes=1 << 30, mem_bytes=1 << 30)
+    monkeypatch.setattr(converter, "PARSE_CACHE", cache)
+    return cache
+
+
+def test_parse_key_depends_on_column_set_only():
+    path = fixture("spring.csv")
+    assert converter.parse_key(path, ["orgName", "Sector"]) == converter.parse_key(path, [" Sector", "orgName "])
+    assert converter.parse_key(path, ["orgName"]) != converter.parse_key(path, ["orgName", "Sector"])
+    assert converter.parse_key(path, ["orgName"]) != converter.parse_key(path)
+
+
+@pytest.mark.parametrize("name", ["spring.csv", "workshop.xlsx"])
+def test_projected_reads_hit_only_the_same_columns(parse_cache, name):
+    path = fixture(name)
+    first = converter.read_one(path, usecols=["orgName", "Sector"])
+    assert first.attrs["reader"] != "cache"
+    assert list(first.columns) == ["orgName", "Sector", "__source_file__"]
+
+    again = converter.read_one(path, usecols=["Sector", "orgName"])
+    assert again.attrs["reader"] == "cache"
+    assert again.equals(first)
+
+    other = converter.read_one(path, usecols=["orgName"])
+    assert other.attrs["reader"] != "cache"
+    assert list(other.columns) == ["orgName", "__source_file__"]
+
+
+def test_projection_from_cached_whole_sheet(parse_cache):
+    path = fixture("workshop.xlsx")
+    whole = converter.read_one(path)
+    projected = converter.read_one(path, usecols=["eventName", "orgName"])
+    assert projected.attrs["reader"] == "cache"
+    assert projected.equals(whole[["orgName", "eventName", "__source_file__"]])
+
+
+# ------------------ result cache ------------------
+
+def _entry_size(cache, key: str) -> int:
+    return sum(e.stat().st_size for e in os.scandir(os.path.join(cache.folder, key)))
+
+
+@pytest.fixture
+def results(tmp_path):
+    os.makedirs(tmp_path / "results")
+    return converter.ResultCache(str(tmp_path / "results"), 1 << 30)
+
+
+def test_result_cache_hit_after_store(results, tmp_path):
+    stored = results.store("a", [fixture("spring.csv")], str(tmp_path / "job1"))
+    assert stored["cached"] is False
+    hit = results.lookup("a", str(tmp_path / "job2"))
+    assert hit == dict(stored, cached=True)
+    assert (tmp_path / "job2" / "nodes_gephi.csv").read_bytes() == (tmp_path / "job1" / "nodes_gephi.csv").read_bytes()
+    assert results.stats() == {"hits": 1, "misses": 0}
+
+
+def test_result_cache_evicts_least_recently_used(results, tmp_path):
+    results.store("a", [fixture("spring.csv")], str(tmp_path / "job1"))
+    results.store("b", [fixture("autumn.csv")], str(tmp_path / "job2"))
+    _age(os.path.join(results.folder, "a", converter.RESULT_MANIFEST), 1000)
+    _age(os.path.join(results.folder, "b", converter.RESULT_MANIFEST), 2000)
+    assert results.lookup("a", str(tmp_path / "job3")) is not None  # touched: b is the oldest now
+
+    results.max_bytes = _entry_size(results, "a") + _entry_size(results, "b")
+    results.store("c", [fixture("autumn.csv")], str(tmp_path / "job4"))
+    assert sorted(os.listdir(results.folder)) == ["a", "c"]
+
+
+@pytest.mark.parametrize("budget", [0, 100])
+def test_result_cache_skips_results_over_budget(results, tmp_path, budget):
+    results.max_bytes = budget
+    stored = results.store("a", [fixture("spring.csv")], str(tmp_path / "job"))
+    # the job still gets its files, the cache keeps nothing
+    assert (tmp_path / "job" / stored["files"][0]).exists()
+    assert os.listdir(results.folder) == []
+    assert results.lookup("a", str(tmp_path / "job2")) is None
@@ -0,0 +1,99 @@
+# backend/tests/test_jobs.py
+#
+# /upload -> /jobs/<id> -> /jobs/<id>/result through the Flask test
+# client, with the conversions running in the real job pool.
+
+import io
+import os
+import time
+
+import pytest
+
+import converter
+from conftest import fixture
+
+
+@pytest.fixture
+def client(monkeypatch, workdir):
+    # send_file resolves the relative outputs/ paths against the app's root
+    monkeypatch.setattr(converter.app, "root_path", workdir)
+    return converter.app.test_client()
+
+
+def _upload(client, name: str, data: bytes, **form):
+    r = client.post("/upload", data={"files": (io.BytesIO(data), name), **form})
+    assert r.status_code == 202, r.get_json()
+    return r.get_json()
+
+
+def _wait(client, job_id: str, timeout=60) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = client.get(f"/jobs/{job_id}").get_json()
+        if status["state"] in ("done", "failed"):
+            return status
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} still {status['state']} after {timeout}s")
+
+
+def test_upload_poll_result(client):
+    with open(fixture("spring.csv"), "rb") as f:
+        data = f.read()
+    # unique bytes: never served from the result cache of an earlier test
+    data += f"\nUnique Org {time.time_ns()},,,,,,E9,Unique,,,,\n".encode()
+
+    job = _upload(client, "spring.csv", data, format="kumu")
+    assert job["state"] in ("queued", "running")
+    assert job["status_url"].endswith(f"/jobs/{job['job_id']}")
+
+    status = _wait(client, job["job_id"])
+    assert status["state"] == "done" and status["stage"] == "done"
+    assert "result" not in status
+    assert [s["stage"] for s in status["metrics"]["stages"]] == ["read", "normalize", "build", "write"]
+
+    result = client.get(f"/jobs/{job['job_id']}/result")
+    assert result.status_code == 200
+    body = result.get_json()
+    assert body["cached"] is False
+    assert body["nodes_url"].endswith(f"/download/{job['job_id']}/nodes_kumu.csv")
+    nodes = client.get(f"/download/{job['job_id']}/nodes_kumu.csv")
+    assert nodes.status_code == 200
+    assert nodes.get_data(as_text=True).startswith("id,Label,type")
+
+    # the same upload again is answered from the result cache
+    again = _upload(client, "spring.csv", data, format="kumu")
+    assert again["state"] == "done"
+    assert client.get(f"/jobs/{again['job_id']}/result").get_json()["cached"] is True
+
+
+def test_failing_job(client):
+    job = _upload(client, "bad.csv", b"x,y\n1,2\n")
+    status = _wait(client, job["job_id"])
+    assert status["state"] == "failed"
+    assert "Required column 'orgname' not found" in status["error"]
+
+    result = client.get(f"/jobs/{job['job_id']}/result")
+    assert result.status_code == 500
+    assert result.get_json()["error"].startswith("Conversion failed: RuntimeError")
+
+
+def test_unknown_job(client):
+    assert client.get("/jobs/" + "0" * 32).status_code == 404
+    assert client.get("/jobs/not-a-job-id/result").status_code == 404
+
+
+def test_expired_job_is_swept(client):
+    with open(fixture("autumn.csv"), "rb") as f:
+        job = _upload(client, "autumn.csv", f.read())
+    assert _wait(client, job["job_id"])["state"] == "done"
+
+    folder = converter.job_folder(job["job_id"])
+    converter.sweep_jobs(ttl=3600)
+    assert os.path.isdir(folder)
+
+    hours_ago = time.time() - 2 * 3600
+    os.utime(folder, (hours_ago, hours_ago))
+    converter.sweep_jobs(ttl=3600)
+    assert not os.path.exists(folder)
+    assert client.get(f"/jobs/{job['job_id']}").status_code == 404
+    assert client.get(f"/download/{job['job_id']}/nodes_gephi.csv").status_code == 404
@@ -0,0 +1,68 @@
+# backend/tests/test_mapping.py
+
+import pandas as pd
+import pytest
+
+import converter
+from conftest import fixture
+
+# the spring fixture's columns under other names, and the mapping the
+# upload panel would send for them
+RENAMED = {
+    "orgName": "Organization",
+    "eventId": "Conference ID",
+    "eventName": "Conference",
+    "eventDate": "Date",
+    "Sector": "Industry",
+    "addressCity": "Town",
+    "connections": "Links",
+}
+MAPPING = {
+    "orgName": "Organization",
+    "eventId": "Conference ID",
+    "eventName": "Conference",
+    "eventDate": "Date",
+    "sector": "Industry",
+    "addressCity": "Town",
+    "connections": "Links",
+}
+
+
+def _spring() -> pd.DataFrame:
+    return pd.read_csv(fixture("spring.csv"), dtype=str, keep_default_na=False)
+
+
+def test_mapping_keys_are_case_insensitive():
+    cols = converter.resolve_response_columns(list(RENAMED.values()), MAPPING)
+    assert cols["mapped"] == {
+        "orgname": "Organization",
+        "sector": "Industry",
+        "eventid": "Conference ID",
+        "eventname": "Conference",
+        "eventdate": "Date",
+    }
+    assert cols["raw"]["orgname"] == "Organization"
+    assert cols["raw"]["addresscity"] == "Town"
+    assert cols["raw"]["connections"] == "Links"
+
+
+@pytest.mark.parametrize("extra", [{}, {"extraAttrs": ["Role"]}])
+def test_mapped_upload_matches_default_headers(extra):
+    df = _spring()
+    nodes, edges = converter.build_graph_from_responses(df.copy(), extra or None)
+    mapped_nodes, mapped_edges = converter.build_graph_from_responses(df.rename(columns=RENAMED), {**MAPPING, **extra})
+
+    pd.testing.assert_frame_equal(mapped_nodes, nodes)
+    pd.testing.assert_frame_equal(mapped_edges, edges)
+    assert (edges["edge_type"] == "connection").any()
+
+
+def test_mapped_files_convert_like_default_headers(tmp_path):
+    plain, renamed = tmp_path / "plain.csv", tmp_path / "renamed.csv"
+    _spring().to_csv(plain, index=False)
+    _spring().rename(columns=RENAMED).to_csv(renamed, index=False)
+
+    converter.convert_many([str(plain)], str(tmp_path / "plain"))
+    converter.convert_many([str(renamed)], str(tmp_path / "renamed"), mapping=MAPPING)
+    for name in ("nodes_gephi.csv", "edges_gephi.csv"):
+        assert (tmp_path / "renamed" / name).read_bytes() == (tmp_path / "plain" / name).read_bytes()
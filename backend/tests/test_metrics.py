@@ -0,0 +1,38 @@
+# backend/tests/test_metrics.py
+
+import os
+
+import converter
+
+
+def _files(folder) -> list:
+    return sorted(n for n in os.listdir(folder) if n.endswith(".json")) if os.path.isdir(folder) else []
+
+
+def test_requests_count_in_memory_until_a_flush(monkeypatch, tmp_path):
+    registry = converter.MetricsRegistry(str(tmp_path))
+    monkeypatch.setattr(converter, "METRICS", registry)
+    monkeypatch.setattr(registry, "start_flusher", lambda: None)
+    client = converter.app.test_client()
+
+    for _ in range(3):
+        assert client.get("/jobs/" + "0" * 32).status_code == 404
+    assert _files(tmp_path) == []
+
+    # a scrape publishes its own process's counters first
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'converter_http_requests_total{method="GET",route="/jobs/<job_id>",status="404"} 3' in text
+    assert len(_files(tmp_path)) == 1
+
+
+def test_flush_writes_only_after_changes(tmp_path):
+    registry = converter.MetricsRegistry(str(tmp_path))
+    registry.flush()
+    assert _files(tmp_path) == []
+
+    registry.inc("converter_conversions_in_flight")
+    registry.flush()
+    path = os.path.join(tmp_path, _files(tmp_path)[0])
+    os.utime(path, (1000, 1000))
+    registry.flush()
+    assert os.path.getmtime(path) == 1000
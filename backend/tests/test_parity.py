@@ -0,0 +1,119 @@
+# backend/tests/test_parity.py
+#
+# The vectorized keys, the grouped builders, the chunked (stream) reader
+# and the map-reduce path over several files all have to reproduce the
+# row-by-row reference output byte for byte.
+
+import pandas as pd
+import pytest
+
+import converter
+import reference
+from conftest import fixture
+
+MESSY = pd.Series([
+    "Acme Corp", "ACME CORP", " acme  corp. ", "Beta-Labs", "", "   ", "Ünïcode Org",
+    "NaN", "123", "Delta_Inc", "a\tb\nc", "E 2", "e-2", "  UPPER CASE  ",
+])
+
+CASES = [
+    ["spring.csv"],
+    ["autumn.csv"],
+    ["workshop.xlsx"],
+    ["spring.csv", "autumn.csv", "workshop.xlsx"],
+    ["workshop.xlsx", "autumn.csv", "spring.csv"],
+]
+
+MAPPINGS = [
+    None,
+    {"extraAttrs": ["Role", "Team", "missing"]},
+    {"sector": "Role", "extraAttrs": ["Team"]},
+]
+
+CUSTOM = [
+    ("orgName", "eventName", None, None),
+    ("orgName", "eventId", "Role", {"extraAttrs": ["Team", "eventDate"]}),
+]
+
+CONVERSIONS = [
+    dict(fmt="gephi"),
+    dict(fmt="gephi", mapping={"extraAttrs": ["Role"], "sector": "Role"}),
+    dict(fmt="kumu", graph_mode="org_org"),
+    dict(fmt="gephi", graph_mode="custom_ab", src_col="orgName", dst_col="eventName", edge_label_col="Role",
+         mapping={"extraAttrs": ["Team"]}),
+]
+
+
+def _csv(frames):
+    return tuple(f.to_csv(index=False) for f in frames)
+
+
+def _files(names):
+    return [fixture(n) for n in names]
+
+
+@pytest.fixture
+def no_caches(monkeypatch, tmp_path):
+    """Every file parsed and mapped afresh (in this process)."""
+    monkeypatch.setattr(converter, "PARSE_CACHE", converter.ParseCache(str(tmp_path / "parsed"), 0, 0))
+    monkeypatch.setattr(converter, "PARTIAL_CACHE", converter.PartialCache(str(tmp_path / "partials"), 0, 0))
+
+
+def test_vectorized_keys_match_scalar_helpers():
+    assert list(converter.norm_strs(MESSY)) == [converter.norm_str(v) for v in MESSY]
+    keys = converter.canonical_keys(MESSY)
+    assert list(keys) == [converter.canonical_key(v) for v in MESSY]
+    assert list(converter.key_ids(keys, "org")) == [f"org_{converter.slug(k)}" if k else "" for k in keys]
+    assert list(converter.pretty_names(MESSY)) == [converter.pretty_name(v) for v in MESSY]
+
+
+@pytest.mark.parametrize("names", CASES)
+@pytest.mark.parametrize("mapping", MAPPINGS)
+def test_build_graph_from_responses(names, mapping):
+    merged = reference.merge_files(_files(names))
+    expected = _csv(reference.build_graph_from_responses(merged.copy(), mapping))
+    assert _csv(converter.build_graph_from_responses(merged.copy(), mapping)) == expected
+
+
+@pytest.mark.parametrize("names", CASES)
+@pytest.mark.parametrize("src, dst, label, mapping", CUSTOM)
+def test_build_custom_edge_graph(names, src, dst, label, mapping):
+    merged = reference.merge_files(_files(names))
+    expected = _csv(reference.build_custom_edge_graph(merged.copy(), src, dst, label, mapping))
+    assert _csv(converter.build_custom_edge_graph(merged.copy(), src, dst, label, mapping)) == expected
+
+
+def _outputs(outdir, names):
+    return [(outdir / n).read_bytes() for n in names]
+
+
+@pytest.mark.parametrize("names", CASES[2:])
+@pytest.mark.parametrize("kwargs", CONVERSIONS)
+@pytest.mark.parametrize("variant", [
+    dict(),
+    dict(stream=True, chunksize=17),
+    dict(read_workers=2),
+])
+def test_convert_many(no_caches, tmp_path, names, kwargs, variant):
+    files = _files(names)
+    written = reference.convert_many(files, str(tmp_path / "ref"), **kwargs)
+    expected = _outputs(tmp_path / "ref", written)
+
+    got = converter.convert_many(files, str(tmp_path / "new"), **kwargs, **variant)
+    assert got[:2] == written
+    assert _outputs(tmp_path / "new", written) == expected
+
+
+def test_convert_many_from_cached_partials(monkeypatch, tmp_path):
+    monkeypatch.setattr(converter, "PARSE_CACHE", converter.ParseCache(str(tmp_path / "parsed"), 0, 0))
+    monkeypatch.setattr(converter, "PARTIAL_CACHE", converter.PartialCache(str(tmp_path / "partials"), 1 << 20, 1 << 20))
+    files = _files(CASES[3])
+    written = reference.convert_many(files, str(tmp_path / "ref"))
+    expected = _outputs(tmp_path / "ref", written)
+
+    # the second run maps nothing: every partial comes from the cache
+    timer = converter.StageTimer()
+    for run in ("cold", "warm"):
+        converter.convert_many(files, str(tmp_path / run), timer=timer if run == "warm" else None)
+        assert _outputs(tmp_path / run, written) == expected
+    assert timer.summary()["readers"] == ["partial"] * len(files)
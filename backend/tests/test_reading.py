@@ -0,0 +1,44 @@
+# backend/tests/test_reading.py
+
+import pytest
+
+import converter
+from conftest import fixture
+
+
+@pytest.mark.parametrize("name", ["spring.csv", "autumn.csv", "workshop.xlsx", "titled.xlsx"])
+def test_read_header_matches_read_one(name):
+    assert converter.read_header(fixture(name)) == list(converter.read_one(fixture(name)).columns)
+
+
+def test_union_columns_does_not_parse_workbooks(monkeypatch):
+    def no_parse(*args, **kwargs):
+        raise AssertionError("header discovery parsed a whole file")
+
+    monkeypatch.setattr(converter, "_parse", no_parse)
+    columns = converter.union_columns([fixture("workshop.xlsx"), fixture("autumn.csv")])
+    assert "orgName" in columns and "Team" in columns
+
+
+def test_xlsx_width():
+    assert converter.xlsx_width(fixture("workshop.xlsx")) == 10
+    # a title row over wider data: the width comes from the data
+    assert converter.xlsx_width(fixture("titled.xlsx")) == 5
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_workbooks_are_parsed_once_and_projected(monkeypatch, tmp_path, stream):
+    monkeypatch.setattr(converter, "PARSE_CACHE", converter.ParseCache(str(tmp_path / "parsed"), 0, 0))
+    monkeypatch.setattr(converter, "PARTIAL_CACHE", converter.PartialCache(str(tmp_path / "partials"), 0, 0))
+    parses = []
+    parse = converter._parse
+
+    def recorded(path, ext, usecols=None):
+        df, reader = parse(path, ext, usecols)
+        parses.append(list(df.columns))
+        return df, reader
+
+    monkeypatch.setattr(converter, "_parse", recorded)
+    converter.convert_many([fixture("workshop.xlsx")], str(tmp_path / "out"), stream=stream)
+    assert len(parses) == 1
+    assert "Role" not in parses[0] and "orgName" in parses[0]
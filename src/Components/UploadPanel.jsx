@@ -11,6 +11,7 @@ export default function UploadPanel() {
   const [message, setMessage] = useState("");
   const [nodesUrl, setNodesUrl] = useState("");
   const [edgesUrl, setEdgesUrl] = useState("");
+  const [bundleUrl, setBundleUrl] = useState("");
   const [busy, setBusy] = useState(false);
 
   // New state for enhanced features
@@ -80,42 +81,43 @@ export default function UploadPanel() {
     }
   };
 
-  // Inspect CSV headers using FileReader
+  // Inspect headers with the backend /inspect endpoint, which also
+  // suggests a mapping from the column contents
   const inspectFileHeaders = async (file) => {
-    if (file.name.toLowerCase().endsWith('.csv')) {
-      // Use Papa Parse for CSV
-      Papa.parse(file, {
-        preview: 1,
-        complete: (results) => {
-          if (results.data && results.data[0]) {
-            setCsvColumns(results.data[0]);
-            setShowMappingWizard(true);
-            initializeMapping(results.data[0]);
-          }
-        },
-        error: (error) => {
-          console.error("Error parsing CSV:", error);
-        }
-      });
-    } else {
-      // For Excel files, use backend /inspect endpoint
-      const formData = new FormData();
-      formData.append("file", file);
+    const formData = new FormData();
+    formData.append("file", file);
 
-      try {
-        const { data } = await axios.post(`${NETWORK_API}/inspect`, formData);
-        setCsvColumns(data.columns || []);
-        setShowMappingWizard(true);
-        initializeMapping(data.columns || []);
-      } catch (error) {
-        console.error("Error inspecting file:", error);
+    try {
+      const { data } = await axios.post(`${NETWORK_API}/inspect`, formData);
+      setCsvColumns(data.columns || []);
+      setShowMappingWizard(true);
+      initializeMapping(data.columns || [], data.suggested_mapping);
+    } catch (error) {
+      console.error("Error inspecting file:", error);
+      if (file.name.toLowerCase().endsWith('.csv')) {
+        // Fall back to reading the CSV header with Papa Parse
+        Papa.parse(file, {
+          preview: 1,
+          complete: (results) => {
+            if (results.data && results.data[0]) {
+              setCsvColumns(results.data[0]);
+              setShowMappingWizard(true);
+              initializeMapping(results.data[0]);
+            }
+          },
+          error: (error) => {
+            console.error("Error parsing CSV:", error);
+          }
+        });
+      } else {
         setMessage("Could not read file headers. Proceeding without mapping.");
       }
     }
   };
 
-  // Initialize mapping with smart defaults
-  const initializeMapping = (columns) => {
+  // Initialize mapping with smart defaults, overridden by the backend's
+  // suggestions (which also look at the column contents) where it has one
+  const initializeMapping = (columns, suggested) => {
     const defaultMapping = {};
     const lowerCols = columns.map(c => c.toLowerCase());
 
@@ -143,7 +145,7 @@ export default function UploadPanel() {
       }
     });
 
-    setMapping(defaultMapping);
+    setMapping({ ...defaultMapping, ...(suggested || {}) });
   };
 
   // Toggle form selection - DISABLED (forms sidebar commented out)
@@ -163,6 +165,7 @@ export default function UploadPanel() {
   const clearPreviews = () => {
     setNodesUrl("");
     setEdgesUrl("");
+    setBundleUrl("");
     setNodesPreview(null);
     setEdgesPreview(null);
   };
@@ -195,6 +198,18 @@ export default function UploadPanel() {
     }
   };
 
+  // Poll a queued conversion until it finishes, then fetch its download links
+  const waitForJob = async (jobId) => {
+    for (;;) {
+      const { data: status } = await axios.get(`${NETWORK_API}/jobs/${jobId}`);
+      if (status.state === "done" || status.state === "failed") break;
+      setMessage(`Converting… (${status.stage})`);
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+    const { data } = await axios.get(`${NETWORK_API}/jobs/${jobId}/result`);
+    return data;
+  };
+
   // Handle upload and conversion
   const handleUpload = async () => {
     if (!files.length) {
@@ -234,14 +249,16 @@ export default function UploadPanel() {
     clearPreviews();
 
     try {
-      const { data } = await axios.post(`${NETWORK_API}/upload`, formData, {
+      const { data: job } = await axios.post(`${NETWORK_API}/upload`, formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
         },
       });
+      const data = await waitForJob(job.job_id);
       setMessage(data.message || "Conversion successful!");
       setNodesUrl(data.nodes_url);
       setEdgesUrl(data.edges_url);
+      setBundleUrl(data.bundle_url);
 
       // Fetch preview data
       if (data.nodes_url && data.edges_url) {
@@ -699,6 +716,16 @@ export default function UploadPanel() {
                 </svg>
                 Download Edges
               </a>
+              {bundleUrl && (
+                <a href={bundleUrl} download className="download-btn">
+                  <svg width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="currentColor" strokeWidth="2">
+                    <path d="M21 15v4a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2v-4"></path>
+                    <polyline points="7 10 12 15 17 10"></polyline>
+                    <line x1="12" y1="15" x2="12" y2="3"></line>
+                  </svg>
+                  Download All (.zip)
+                </a>
+              )}
             </div>
           )}
 